@@ -10,13 +10,8 @@ logger = get_logger('app')
 # 初始化数据库
 db = SQLAlchemy()
 
-def create_app():
-    """创建并配置Flask应用"""
-    app = Flask(__name__, template_folder='../templates', static_folder='../static')
-    
-    # 配置
-    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-key-for-testing')
-    
+def get_database_uri():
+    """数据库URI：环境变量 SQLALCHEMY_DATABASE_URI，默认为 data/puzzle_data.db"""
     # 确保数据库URI使用正确的路径格式
     db_uri = os.environ.get('SQLALCHEMY_DATABASE_URI')
     if not db_uri:
@@ -29,7 +24,16 @@ def create_app():
         db_path = os.path.normpath(db_path)
         db_uri = f'sqlite:///{db_path}'
         logger.info(f"Resolved init database path: {db_path}")
+    return db_uri
+
+def create_app():
+    """创建并配置Flask应用"""
+    app = Flask(__name__, template_folder='../templates', static_folder='../static')
     
+    # 配置
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-key-for-testing')
+    
+    db_uri = get_database_uri()
     app.config['SQLALCHEMY_DATABASE_URI'] = db_uri
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
@@ -38,6 +42,9 @@ def create_app():
     
     # 确保数据目录存在
     with app.app_context():
+        # 配置SQLite连接参数（WAL、忙等待超时）
+        from app.utils.sqlite import configure_sqlite_engine
+        configure_sqlite_engine(db.engine)
         
         try:
             # 确保数据目录存在
@@ -73,12 +80,37 @@ def create_app():
                     logger.error(f"Database directory is not writable: {db_dir}")
                     raise PermissionError(f"Database directory is not writable: {db_dir}")
             
+            # 导入模型，确保create_all能创建所有表
+            from app import models  # noqa: F401
+
             # 创建所有表
             db.create_all()
             logger.info("Database tables created successfully")
+
+            # 为旧数据库补加新增的列
+            from app.utils.sqlite import add_missing_columns
+            add_missing_columns(db.engine, db.metadata.sorted_tables)
         except Exception as e:
             logger.error(f"Error creating database tables: {db_uri}")
             # log_exception(logger, "Error creating database tables")
+
+        # 创建全文搜索索引及同步触发器
+        try:
+            from app.services.search_index import search_index
+            search_index.ensure(db.engine)
+        except Exception:
+            log_exception(logger, "Error creating search index")
+
+        # 构建随机采样索引
+        from app.config import SAMPLING_INDEX_CONFIG
+        if SAMPLING_INDEX_CONFIG.get('ENABLED', True):
+            try:
+                from app.services.sampling_index import sampling_index
+                sampling_index.build(db.session)
+            except Exception:
+                log_exception(logger, "Error building sampling index")
+            finally:
+                db.session.remove()
     
     # 注册上下文处理器
     from datetime import datetime
@@ -7,17 +7,23 @@ import logging
 # 日志配置
 LOG_LEVEL = logging.INFO
 LOG_DIR = os.path.join(os.getcwd(), 'logs')
+# 所有模块共享的日志文件
+LOG_FILE_NAME = 'puzzle.log'
+# 高频警告（如拒绝非本地请求）的采样窗口（秒），0表示不采样
+LOG_SAMPLE_INTERVAL = 60
 
 # 本地网络IP地址列表
 # 支持以下格式：
 # 1. 精确IP地址，如 '127.0.0.1'
-# 2. 正则表达式模式，如 '^192\.168\.1\.\d+$'
+# 2. CIDR网段，如 '10.0.0.0/8'
+# 3. 正则表达式模式，如 '^192\.168\.1\.\d+$'
 LOCAL_NETWORK_IPS = [
     "127.0.0.1",  # localhost IPv4
     "::1",  # localhost IPv6
     # 添加更多本地网络IP地址或模式
     # 例如：
-    # '^10\.\d+\.\d+\.\d+$',  # 10.x.x.x 网段
+    # '10.0.0.0/8',  # 10.x.x.x 网段（CIDR）
+    # '^10\.\d+\.\d+\.\d+$',  # 10.x.x.x 网段（正则）
     # '^172\.(1[6-9]|2\d|3[0-1])\.\d+\.\d+$',  # 172.16.0.0 - 172.31.255.255 网段
     r"^192.168.\d+.\d+$",  # 192.168.x.x 网段
     # r"^30.210.\d+.\d+$",  # 30.210.x.x 网段
@@ -39,4 +45,207 @@ LLM_CONFIG = {
     },
     # 默认参数
     "DEFAULT_PARAMS": {"temperature": 0.7, "max_tokens": 1000, "top_p": 0.9},
+    # API端点（可指向本地代理或测试桩）
+    "API_URLS": {
+        "deepseek": "https://api.deepseek.com/v1/chat/completions",
+        "openrouter": "https://openrouter.ai/api/v1/chat/completions",
+        "qianwen": "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation",
+    },
+    # HTTP连接池、超时与重试
+    "HTTP": {
+        # 每个服务保持的长连接数
+        "POOL_SIZE": 20,
+        # 建立连接和读取响应的超时时间（秒）
+        "CONNECT_TIMEOUT": 5,
+        "READ_TIMEOUT": 120,
+        # 遇到429/503或请求发出前的连接错误时的最大重试次数（读取超时不重试）
+        "MAX_RETRIES": 3,
+        # 指数退避的基础时间和上限（秒），实际等待时间带随机抖动
+        "BACKOFF_BASE": 0.5,
+        "BACKOFF_MAX": 10,
+    },
+    # 批量请求（/api/llm/batch）
+    "BATCH": {
+        # 模型组（group:xxx）和未配置并发上限的服务的批量请求共享的线程池大小
+        "MAX_WORKERS": 40,
+        # 单个批量请求最多包含的提示数
+        "MAX_PROMPTS": 50,
+        # 每个服务同时进行的上游请求数上限，也是该服务批量请求线程池的大小（各服务互不占用线程），
+        # 不宜超过 HTTP.POOL_SIZE，否则超出的连接无法复用
+        "PROVIDER_CONCURRENCY": {"deepseek": 20, "openrouter": 20, "qianwen": 10},
+    },
+    # 等价模型组路由：模型名传 "group:组名" 时在组内按延迟和健康状况选择服务
+    "ROUTING": {
+        # 等价模型组，组内模型应能互相替代
+        "GROUPS": {
+            "default": ["deepseek-chat", "qianwen-plus", "openrouter:openai/gpt-4o"],
+        },
+        # 每个服务统计最近多少次调用的延迟和错误率
+        "WINDOW": 30,
+        # 是否对慢请求发出对冲请求
+        "HEDGE": True,
+        # 主请求超过多少秒未返回时向第二个服务发出对冲请求；为None时使用主服务的p95延迟
+        "HEDGE_AFTER": None,
+        # 使用p95延迟作为阈值时的下限（秒）
+        "HEDGE_MIN": 1.0,
+        # 连续失败多少次后熔断，以及熔断持续时间（秒）
+        "FAILURE_THRESHOLD": 5,
+        "OPEN_SECONDS": 30,
+        # 路由器发出上游请求的线程池大小
+        "MAX_WORKERS": 16,
+    },
+    # 生成入库流水线（/api/llm/pipeline）
+    "PIPELINE": {
+        # 单次请求最多生成的条目数
+        "MAX_COUNT": 200,
+        # 每轮向模型请求的条目数上限
+        "BATCH_SIZE": 20,
+        # 每解析出多少个条目写入一次数据库
+        "INSERT_CHUNK": 10,
+        # 最多请求轮数，以及连续多少轮没有新条目时放弃
+        "MAX_ROUNDS": 10,
+        "MAX_IDLE_ROUNDS": 2,
+        # 提示模型避开的已见问题数
+        "AVOID_LIMIT": 50,
+        "TEMPERATURE": 0.9,
+        "MAX_TOKENS": 4000,
+    },
+    # 响应缓存：相同的 (model, messages, temperature, max_tokens, top_p) 直接返回缓存结果
+    # 请求中传 "cache": false 可跳过缓存
+    "CACHE": {
+        "ENABLED": True,
+        # 内存LRU的最大条目数
+        "MEMORY_ENTRIES": 256,
+        # SQLite持久缓存文件
+        "DB_PATH": os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "llm_cache.db"),
+        # 缓存有效期（秒）
+        "TTL": 24 * 3600,
+        # 持久缓存内容的总大小上限（字节），超出时淘汰最久未访问的条目
+        "MAX_DB_BYTES": 50 * 1024 * 1024,
+    },
+}
+
+# 随机采样索引配置（/api/random）
+SAMPLING_INDEX_CONFIG = {
+    # 是否在启动时构建进程内采样索引，关闭后回退到 ORDER BY RANDOM()
+    "ENABLED": True,
+    # 采样前增量同步新条目的最小间隔（秒）
+    "REFRESH_INTERVAL": 1.0,
+}
+
+# 全文搜索配置（/api/search 和浏览页搜索框）
+SEARCH_CONFIG = {
+    # 是否使用FTS5 trigram 索引，关闭后回退到 LIKE 扫描
+    "ENABLED": True,
+    # bm25 相关度中问题列和答案列的权重
+    "QUESTION_WEIGHT": 2.0,
+    "ANSWER_WEIGHT": 1.0,
+    # 按相关度排序的最大匹配数，超过时按ID顺序返回（常见词计算全部得分的开销与匹配数成正比）
+    "MAX_RANKED": 10000,
+    # 查询字符串的最大长度
+    "MAX_QUERY_LENGTH": 100,
+}
+
+# 近似重复检测配置（MinHash + LSH）
+NEAR_DUPLICATE_CONFIG = {
+    # 规范化文本的字符n-gram长度
+    "NGRAM": 2,
+    # 签名长度（哈希函数个数），BANDS 个band平分，每个band NUM_PERM / BANDS 行
+    # 16 x 4 时估计相似度约0.5以上的条目才会成为候选，再按 THRESHOLD 确认
+    "NUM_PERM": 64,
+    "BANDS": 16,
+    # 估计的Jaccard相似度达到该值视为近似重复
+    "THRESHOLD": 0.8,
+    # 生成哈希函数的随机种子，修改后需用 tools/near_duplicates.py --rebuild 重算签名
+    "SEED": 1,
+    # /api/add 写入前的近似重复检查：off 不检查，flag 照常写入并在结果中标出，reject 不写入
+    # 开启后所有写入路径同时保存新条目的签名；已有条目的签名用 tools/near_duplicates.py 生成
+    "ADD_CHECK": "off",
+}
+
+# SQLite连接配置
+SQLITE_CONFIG = {
+    # WAL模式下读操作不会被写事务阻塞
+    "JOURNAL_MODE": "WAL",
+    # 等待写锁的超时时间（毫秒）
+    "BUSY_TIMEOUT_MS": 5000,
+}
+
+# 批量导入配置（/api/import）
+INGEST_CONFIG = {
+    # 每个事务写入的条目数
+    "CHUNK_SIZE": 1000,
+    # 客户端可指定的最大块大小
+    "MAX_CHUNK_SIZE": 10000,
+    # 每个进度消息中最多返回的失败明细数
+    "MAX_REPORTED_ERRORS": 20,
+}
+
+# API密钥缓存配置
+API_KEY_CACHE_CONFIG = {
+    # 有效密钥的缓存时间（秒）。缓存在每个进程内各自维护，管理页面禁用或删除密钥时只清除
+    # 处理该请求的进程中的缓存；多进程部署时，其他进程最多在TTL后才拒绝该密钥
+    "TTL": 60,
+    # 无效密钥的缓存时间（秒）
+    "NEGATIVE_TTL": 5,
+    # last_used_at 和请求计数批量写回的间隔（秒），同时清理过期的缓存条目
+    "FLUSH_INTERVAL": 10,
+    # 缓存的最大条目数，超出时淘汰最早写入的条目；条目数达到一半后不再缓存无效密钥
+    "MAX_ENTRIES": 10000,
+}
+
+# 限流配置（令牌桶）
+RATE_LIMIT_CONFIG = {
+    "ENABLED": True,
+    # 令牌桶状态存储：memory 为进程内，sqlite 可在多个工作进程间共享
+    "STORE": "memory",
+    "DB_PATH": os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "rate_limits.db"),
+    # 本地网络请求不需要API密钥，也不限流
+    "EXEMPT_LOCAL": True,
+    # 端点到路由类别的映射，键为端点名或蓝图名，未列出的端点属于 default
+    "ROUTE_CLASSES": {
+        "api.get_random_entries": "read",
+        "api.list_entries": "read",
+        "api.search_entries": "read",
+        "api.add_entry": "write",
+        "api.import_entries": "write",
+        # llm.* 类型的任务另外扣除 llm 类别的令牌
+        "api.submit_job": "write",
+        "api.cancel_job": "write",
+        "api.get_job": "read",
+        "api.get_job_result": "read",
+        "llm": "llm",
+    },
+    # 每个API密钥在每个路由类别上的令牌桶：CAPACITY 为突发上限（至少为1），RATE 为每秒补充的令牌数（必须为正数）
+    "LIMITS": {
+        "default": {"CAPACITY": 60, "RATE": 1.0},
+        "read": {"CAPACITY": 120, "RATE": 10.0},
+        "write": {"CAPACITY": 20, "RATE": 0.5},
+        "llm": {"CAPACITY": 10, "RATE": 0.2},
+    },
+    # 发往各LLM服务的请求令牌桶，所有调用方共享
+    "PROVIDER_LIMITS": {
+        "deepseek": {"CAPACITY": 60, "RATE": 20.0},
+        "openrouter": {"CAPACITY": 60, "RATE": 20.0},
+        "qianwen": {"CAPACITY": 30, "RATE": 10.0},
+    },
+    # 服务令牌不足时最多等待的时间（秒），超过则直接报错
+    "PROVIDER_MAX_WAIT": 10,
+}
+
+# 后台任务队列配置
+JOB_QUEUE_CONFIG = {
+    # 执行任务的工作线程数
+    "WORKERS": 4,
+    # 任务表中排队中的任务数上限（所有进程合计），超过时拒绝提交
+    "MAX_PENDING": 1000,
+    # 已结束的任务保留天数，启动时清理
+    "KEEP_DAYS": 7,
+    # 是否在服务进程（run.py）中启动工作线程；create_app() 本身从不启动，
+    # init_db.py、migrate_db.py 和 tools/ 下的脚本不会执行或改动任务
+    "START_WORKERS": True,
+    # 运行中任务的心跳间隔（秒），同时检查其他进程遗留的中断任务
+    "HEARTBEAT_INTERVAL": 30,
+    # 心跳超过该时间（秒）未更新的运行中任务视为所属进程已退出，标记为失败
+    "STALE_AFTER": 120,
 }
@@ -3,3 +3,6 @@
 """
 from app.models.data_entry import DataEntry
 from app.models.api_key import ApiKey
+from app.models.job import Job
+from app.models.import_state import ImportState
+from app.models.entry_signature import EntrySignature, LshBucket
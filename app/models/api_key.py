@@ -16,6 +16,7 @@ class ApiKey(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_used_at = db.Column(db.DateTime)
+    request_count = db.Column(db.Integer, default=0)
 
     @staticmethod
     def generate_key():
@@ -8,6 +8,14 @@ from app import db
 class DataEntry(db.Model):
     """数据条目模型，用于存储谜语、笑话和成语"""
     __tablename__ = 'data_entries'
+    __table_args__ = (
+        # 按类别浏览/分页：WHERE category = ? ORDER BY created_at DESC, id DESC
+        db.Index('ix_data_entries_category_created_at_id', 'category', 'created_at', 'id'),
+        # 不限类别浏览/分页：ORDER BY created_at DESC, id DESC
+        db.Index('ix_data_entries_created_at_id', 'created_at', 'id'),
+        # 按类别计数和按ID扫描（随机采样回退路径、采样索引构建）
+        db.Index('ix_data_entries_category_id', 'category', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     question = db.Column(db.Text, nullable=False)
@@ -0,0 +1,27 @@
+"""
+近似重复检测的签名模型
+"""
+from app import db
+
+class EntrySignature(db.Model):
+    """条目规范化文本的MinHash签名"""
+    __tablename__ = 'entry_signatures'
+
+    entry_id = db.Column(db.Integer, primary_key=True)
+    # uint32 数组的字节序列；规范化后为空的条目签名为空，不参与比较
+    signature = db.Column(db.LargeBinary, nullable=False)
+
+    def __repr__(self):
+        return f'<EntrySignature {self.entry_id}>'
+
+class LshBucket(db.Model):
+    """LSH分桶：签名的每个band哈希为一个桶键，同桶的条目为近似重复候选"""
+    __tablename__ = 'lsh_buckets'
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    # 按桶键查询候选条目：WHERE band_key IN (...)
+    band_key = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    entry_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+    def __repr__(self):
+        return f'<LshBucket {self.band_key}: {self.entry_id}>'
@@ -0,0 +1,21 @@
+"""
+语料导入状态模型
+"""
+from datetime import datetime
+from app import db
+
+class ImportState(db.Model):
+    """记录每个语料文件已导入的位置，增量导入时只解析其后追加的记录"""
+    __tablename__ = 'import_state'
+
+    path = db.Column(db.String(500), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    mtime = db.Column(db.Float, nullable=False)
+    # 最后一条完整记录（含分隔行）之后的字节偏移
+    offset = db.Column(db.BigInteger, nullable=False)
+    # 文件开头和偏移之前各一小段内容的哈希，用于发现被截断或改写的文件
+    fingerprint = db.Column(db.String(32), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ImportState {self.path}: {self.offset}/{self.size}>'
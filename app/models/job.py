@@ -0,0 +1,60 @@
+"""
+后台任务模型
+"""
+import json
+import uuid
+from datetime import datetime
+from app import db
+
+class Job(db.Model):
+    """后台任务，记录在数据库中以便重启后继续执行未开始的任务"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # 启动时按提交顺序恢复未执行的任务：WHERE status = ? ORDER BY created_at
+        db.Index('ix_jobs_status_created_at', 'status', 'created_at'),
+    )
+
+    # 任务状态
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(10), nullable=False, default=PENDING)
+    payload = db.Column(db.Text, nullable=False)
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    api_key_id = db.Column(db.Integer)
+    # 执行任务的进程及其最近一次心跳，只有心跳过期的运行中任务才会被判定为中断
+    owner = db.Column(db.String(64))
+    heartbeat_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<Job {self.id}: {self.kind} {self.status}>'
+
+    @staticmethod
+    def generate_id():
+        """生成任务ID"""
+        return uuid.uuid4().hex
+
+    def to_dict(self, include_result=False):
+        """转换为响应格式"""
+        data = {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+        if include_result:
+            data['result'] = json.loads(self.result) if self.result else None
+        return data
@@ -4,6 +4,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from app import db
 from app.models import ApiKey
+from app.services.api_key_cache import api_key_cache
 from app.utils.auth import local_access_only
 
 # 创建蓝图
@@ -25,6 +26,7 @@ def create_api_key():
     
     db.session.add(new_key)
     db.session.commit()
+    api_key_cache.invalidate(new_key.key)
     
     flash('New API key created successfully', 'success')
     return redirect(url_for('admin.list_api_keys'))
@@ -37,6 +39,7 @@ def toggle_api_key(key_id):
     key.is_active = not key.is_active
     
     db.session.commit()
+    api_key_cache.invalidate(key.key)
     
     status = 'activated' if key.is_active else 'deactivated'
     flash(f'API key {status} successfully', 'success')
@@ -1,11 +1,21 @@
 """
 API路由模块
 """
-from flask import Blueprint, request, jsonify
+import io
+import gzip
+import json
+from flask import Blueprint, Response, g, request, jsonify, url_for, stream_with_context
 from app import db
-from app.models import DataEntry
-from app.utils.auth import require_api_key
+from app.config import INGEST_CONFIG, SEARCH_CONFIG, NEAR_DUPLICATE_CONFIG
+from app.models import DataEntry, Job
+from app.services.bulk_ingest import bulk_ingest, find_existing_hashes, VALID_CATEGORIES
+from app.services.job_queue import job_queue, JobQueueFull, UnknownJobKind, InvalidJobPayload
+from app.services.near_duplicates import near_duplicate_index
+from app.services.sampling_index import sampling_index
+from app.services.search_index import search_index
+from app.utils.auth import require_api_key, charge_rate_limit
 from app.utils.logger import get_logger, log_exception
+from app.utils.pagination import keyset_paginate, InvalidCursorError
 
 # 获取当前模块的日志记录器
 logger = get_logger()
@@ -19,6 +29,17 @@ def get_random_entries(count):
     """获取随机条目"""
     category = request.args.get('category')
 
+    if sampling_index.built:
+        # 从采样索引中抽取ID，再通过一次 IN 查询取回条目
+        sampling_index.refresh(db.session)
+        ids = sampling_index.sample(count, category)
+        if not ids:
+            return jsonify([])
+
+        entries = {entry.id: entry for entry in DataEntry.query.filter(DataEntry.id.in_(ids)).all()}
+        random_entries = [entries[entry_id] for entry_id in ids if entry_id in entries]
+        return jsonify([serialize_entry(entry) for entry in random_entries])
+
     query = DataEntry.query
     if category:
         query = query.filter_by(category=category)
@@ -35,18 +56,78 @@ def get_random_entries(count):
         # SQLite特定的随机排序
         random_entries = query.order_by(db.func.random()).limit(count).all()
 
-        result = [{
-            'id': entry.id,
-            'question': entry.question,
-            'answer': entry.answer,
-            'category': entry.category,
-            'created_at': entry.created_at.isoformat()
-        } for entry in random_entries]
+        result = [serialize_entry(entry) for entry in random_entries]
 
         return jsonify(result)
     else:
         return jsonify([])
 
+@api_bp.route('/entries', methods=['GET'])
+@require_api_key
+def list_entries():
+    """按创建时间倒序分页列出条目，使用不透明游标翻页"""
+    category = request.args.get('category')
+    cursor = request.args.get('cursor')
+    limit = request.args.get('limit', 20, type=int)
+    limit = max(1, min(limit, 100))
+
+    query = DataEntry.query
+    if category:
+        query = query.filter_by(category=category)
+
+    try:
+        page = keyset_paginate(query, cursor=cursor, per_page=limit)
+    except InvalidCursorError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'entries': [serialize_entry(entry) for entry in page['items']],
+        'next': page['next'],
+        'prev': page['prev'],
+        # 采样索引中的条目数即为总数（无需 COUNT(*)）
+        'total': sampling_index.size(category) if sampling_index.built else None
+    })
+
+@api_bp.route('/search', methods=['GET'])
+@require_api_key
+def search_entries():
+    """全文搜索问题和答案，按相关度排序，使用不透明游标翻页"""
+    query = request.args.get('q', '').strip()
+    category = request.args.get('category')
+    cursor = request.args.get('cursor')
+    limit = request.args.get('limit', 20, type=int)
+    limit = max(1, min(limit, 100))
+
+    if not query:
+        return jsonify({'error': 'Missing query parameter: q'}), 400
+    max_length = SEARCH_CONFIG.get('MAX_QUERY_LENGTH', 100)
+    if len(query) > max_length:
+        return jsonify({'error': f'Query too long (max {max_length} characters)'}), 400
+    if category and category not in VALID_CATEGORIES:
+        return jsonify({'error': 'Invalid category. Must be one of: riddle, joke, idiom, brain_teaser'}), 400
+
+    try:
+        result = search_index.search(db.session, query, category=category, cursor=cursor, limit=limit)
+    except InvalidCursorError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'entries': [{**serialize_entry(entry), 'score': score} for entry, score in result['items']],
+        'next': result['next'],
+        'mode': result['mode'],
+        'ranked': result['ranked']
+    })
+
+def serialize_entry(entry):
+    """将条目转换为API响应格式"""
+    return {
+        'id': entry.id,
+        'question': entry.question,
+        'answer': entry.answer,
+        'category': entry.category,
+        'created_at': entry.created_at.isoformat()
+    }
+
 @api_bp.route('/add', methods=['POST'])
 @require_api_key
 def add_entry():
@@ -54,12 +135,147 @@ def add_entry():
     data = request.get_json()
 
     # 确保数据是列表格式
-    if not data or not isinstance(data, list):
-        return jsonify({'error': '请求数据必须是条目数组'}), 400
+    error = validate_entries_payload(data)
+    if error:
+        return jsonify({'error': error}), 400
+
+    # 作为后台任务执行
+    if request.args.get('async', type=int):
+        return submit_job_response('entries.add', data)
 
     # 批量添加
     return add_multiple_entries(data)
 
+def validate_entries_payload(data):
+    """校验批量添加的请求数据，返回错误信息或None"""
+    if not data or not isinstance(data, list):
+        return '请求数据必须是条目数组'
+    return None
+
+@api_bp.route('/import', methods=['POST'])
+@require_api_key
+def import_entries():
+    """
+    流式导入NDJSON条目
+
+    请求体为 application/x-ndjson，每行一个条目，支持分块传输和gzip压缩（Content-Encoding: gzip）。
+    按块去重、插入并提交，每提交一块就向客户端返回一行NDJSON进度，最后返回汇总。
+    """
+    if request.mimetype != 'application/x-ndjson':
+        return jsonify({'error': 'Content-Type must be application/x-ndjson'}), 415
+
+    default_chunk_size = INGEST_CONFIG.get('CHUNK_SIZE', 1000)
+    chunk_size = request.args.get('chunk_size', default_chunk_size, type=int)
+    if chunk_size <= 0:
+        chunk_size = default_chunk_size
+    chunk_size = min(chunk_size, INGEST_CONFIG.get('MAX_CHUNK_SIZE', 10000))
+    max_errors = INGEST_CONFIG.get('MAX_REPORTED_ERRORS', 20)
+
+    stream = io.BufferedReader(request.stream)
+    if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+
+    def generate():
+        totals = {'lines': 0, 'inserted': 0, 'duplicates': 0, 'failed': 0, 'chunks': 0}
+        chunk = []
+        errors = []
+
+        def flush():
+            ingested = {'inserted': [], 'duplicates': []}
+            if chunk:
+                ingested = bulk_ingest(db.session, chunk)
+                db.session.commit()
+            progress = {
+                'chunk': totals['chunks'] + 1,
+                'inserted': len(ingested['inserted']),
+                'duplicates': len(ingested['duplicates']),
+                'failed': len(errors),
+                'errors': errors[:max_errors]
+            }
+            totals['chunks'] += 1
+            totals['inserted'] += progress['inserted']
+            totals['duplicates'] += progress['duplicates']
+            totals['failed'] += progress['failed']
+            progress['lines'] = totals['lines']
+            chunk.clear()
+            errors.clear()
+            return json.dumps(progress, ensure_ascii=False) + '\n'
+
+        try:
+            for line_no, entry, error in iter_ndjson(stream):
+                totals['lines'] = line_no
+                if error is None:
+                    item, error = validate_entry(entry)
+                if error:
+                    errors.append({'line': line_no, 'reason': error})
+                else:
+                    chunk.append(item)
+                if len(chunk) + len(errors) >= chunk_size:
+                    yield flush()
+            if chunk or errors:
+                yield flush()
+        except Exception as e:
+            db.session.rollback()
+            log_exception(logger, "Failed to import NDJSON entries")
+            yield json.dumps({'error': f'Import aborted: {str(e)}', **totals}, ensure_ascii=False) + '\n'
+            return
+
+        if totals['inserted']:
+            # 将新条目同步到随机采样索引
+            sampling_index.refresh(db.session, force=True)
+        yield json.dumps({'done': True, **totals}, ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def iter_ndjson(stream):
+    """
+    逐行解析NDJSON流
+
+    Yields:
+        (行号, 解析后的对象, 错误原因) 元组，解析成功时错误原因为None
+    """
+    for line_no, raw_line in enumerate(stream, 1):
+        line = raw_line.strip()
+        if not line:
+            continue
+        try:
+            yield line_no, json.loads(line), None
+        except ValueError as e:
+            yield line_no, None, f'Invalid JSON: {str(e)}'
+
+def validate_entry(entry):
+    """
+    校验并规范化单个提交的条目
+
+    Returns:
+        (item, reason) 元组，校验失败时item为None，reason为失败原因
+    """
+    # 检查新格式（问题/答案）
+    if not isinstance(entry, dict) or not ('question' in entry and 'answer' in entry and 'category' in entry):
+        return None, 'Missing required fields'
+
+    if not all(isinstance(entry[field], str) for field in ('question', 'answer', 'category')):
+        return None, 'Question, answer and category must be strings'
+
+    question = entry['question'].strip()
+    answer = entry['answer'].strip()
+    category = entry['category'].lower()
+
+    # 验证字段
+    if not question or not answer:
+        return None, 'Question and answer cannot be empty'
+
+    # 验证类别
+    if category not in VALID_CATEGORIES:
+        return None, 'Invalid category. Must be one of: riddle, joke, idiom, brain_teaser'
+
+    return {
+        'question': question,
+        'answer': answer,
+        'category': category,
+        'entry': entry
+    }, None
+
 def add_multiple_entries(entries):
     """批量添加多个条目"""
     if not entries:
@@ -71,101 +287,190 @@ def add_multiple_entries(entries):
         'duplicates': []
     }
 
+    try:
+        ingest_entries(entries, results)
+    except Exception as e:
+        db.session.rollback()
+        # 记录异常信息，包括完整的堆栈跟踪
+        log_exception(logger, "Failed to commit batch entries via API")
+        return jsonify({
+            'error': f'Failed to add entries: {str(e)}',
+            'partial_results': results
+        }), 500
+
+    # 返回结果
+    return jsonify(results), 201
+
+def run_add_entries_job(entries):
+    """后台任务：批量添加条目，返回与 /api/add 相同格式的结果"""
+    results = {
+        'success': [],
+        'failed': [],
+        'duplicates': []
+    }
+    ingest_entries(entries, results)
+    return results
+
+def ingest_entries(entries, results):
+    """
+    校验、去重并批量写入条目，结果写入results的 success/failed/duplicates，
+    开启近似重复检查时还有 near_duplicates
+
+    写入失败时抛出异常，由调用方回滚
+    """
+    # 校验条目，合格的交给批量写入引擎统一去重和插入
+    valid_entries = []
     for entry in entries:
-        # 检查新格式（问题/答案）
-        if 'question' in entry and 'answer' in entry and 'category' in entry:
-            question = entry['question'].strip()
-            answer = entry['answer'].strip()
-            category = entry['category'].lower()
-
-            # 验证字段
-            if not question or not answer:
-                results['failed'].append({
-                    'entry': entry,
-                    'reason': 'Question and answer cannot be empty'
-                })
-                continue
-        else:
+        item, reason = validate_entry(entry)
+        if reason:
             results['failed'].append({
                 'entry': entry,
-                'reason': 'Missing required fields'
+                'reason': reason
             })
             continue
+        valid_entries.append(item)
 
-        # 验证类别
-        if category not in ['riddle', 'joke', 'idiom', 'brain_teaser']:
-            results['failed'].append({
-                'entry': entry,
-                'reason': 'Invalid category. Must be one of: riddle, joke, idiom, brain_teaser'
-            })
-            continue
+    if not valid_entries:
+        return
 
-        # 生成哈希用于去重
-        content_hash = DataEntry.generate_hash(question, answer)
+    near_duplicate_check = NEAR_DUPLICATE_CONFIG.get("ADD_CHECK", "off")
+    if near_duplicate_check != 'off':
+        valid_entries = check_near_duplicates(valid_entries, results, reject=near_duplicate_check == 'reject')
+        if not valid_entries:
+            return
 
-        # 检查条目是否已存在
-        existing_entry = DataEntry.query.filter_by(content_hash=content_hash).first()
-        if existing_entry:
-            results['duplicates'].append({
-                'entry': entry,
-                'existing_id': existing_entry.id
-            })
-            continue
+    ingested = bulk_ingest(db.session, valid_entries)
+    db.session.commit()
 
-        # 创建新条目
-        new_entry = DataEntry(
-            question=question,
-            answer=answer,
-            category=category,
-            content_hash=content_hash
-        )
+    results['success'] = [{
+        'id': row['id'],
+        'question': row['question'],
+        'answer': row['answer'],
+        'category': row['category'],
+        'created_at': row['created_at'].isoformat()
+    } for row in ingested['inserted']]
+    results['duplicates'] = [{
+        'entry': duplicate['item']['entry'],
+        'existing_id': duplicate['existing_id']
+    } for duplicate in ingested['duplicates']]
 
-        try:
-            db.session.add(new_entry)
-            # 先不提交，等所有条目处理完再一次性提交
-        except Exception as e:
-            results['failed'].append({
-                'entry': entry,
-                'reason': str(e)
-            })
-            continue
+    # 将新条目同步到随机采样索引
+    if results['success']:
+        sampling_index.refresh(db.session, force=True)
 
-        # 添加到成功列表（暂时没有ID，提交后再更新）
-        results['success'].append({
-            'temp_index': len(results['success']),
-            'question': question,
-            'answer': answer,
-            'category': category
-        })
+def check_near_duplicates(items, results, reject=False):
+    """
+    检查与已有条目或本批之前条目近似重复的条目，结果写入results的 near_duplicates
 
-    # 如果有成功添加的条目，提交事务
-    if results['success']:
-        try:
-            db.session.commit()
-
-            # 查询刚刚添加的条目，获取它们的ID
-            for i, entry in enumerate(results['success']):
-                # 使用哈希查找刚添加的条目
-                content_hash = DataEntry.generate_hash(entry['question'], entry['answer'])
-                db_entry = DataEntry.query.filter_by(content_hash=content_hash).first()
-
-                if db_entry:
-                    # 更新成功列表中的条目，添加ID和创建时间
-                    results['success'][i] = {
-                        'id': db_entry.id,
-                        'question': db_entry.question,
-                        'answer': db_entry.answer,
-                        'category': db_entry.category,
-                        'created_at': db_entry.created_at.isoformat()
-                    }
-        except Exception as e:
-            db.session.rollback()
-            # 记录异常信息，包括完整的堆栈跟踪
-            log_exception(logger, "Failed to commit batch entries via API")
-            return jsonify({
-                'error': f'Failed to add entries: {str(e)}',
-                'partial_results': results
-            }), 500
+    完全相同的条目不算近似重复，仍由批量写入引擎作为 duplicates 报告。
+    只与已有签名的条目比较；新条目的签名由写入路径保存，已有条目的签名由 tools/near_duplicates.py 补算，
+    请求中不补算。
 
-    # 返回结果
-    return jsonify(results), 201
+    Returns:
+        需要写入的条目；reject 为True时去掉近似重复的条目
+    """
+    matches = near_duplicate_index.check(db.session, items)
+    hashes = [DataEntry.generate_hash(item['question'], item['answer']) for item in items]
+    existing = find_existing_hashes(db.session, set(hashes))
+
+    results['near_duplicates'] = []
+    accepted = []
+    seen = set()
+    for item, content_hash, match in zip(items, hashes, matches):
+        exact = content_hash in existing or content_hash in seen
+        seen.add(content_hash)
+        if match and not exact:
+            near_duplicate = {
+                'entry': item['entry'],
+                'similarity': round(match['similarity'], 3),
+                'rejected': reject
+            }
+            if 'similar_id' in match:
+                near_duplicate['similar_id'] = match['similar_id']
+            else:
+                near_duplicate['similar_entry'] = items[match['similar_index']]['entry']
+            results['near_duplicates'].append(near_duplicate)
+            if reject:
+                continue
+        accepted.append(item)
+    return accepted
+
+job_queue.register('entries.add', run_add_entries_job, validate=validate_entries_payload)
+
+def submit_job_response(kind, payload):
+    """提交后台任务并返回202响应，包含任务ID和查询地址"""
+    try:
+        job_id = job_queue.submit(kind, payload, api_key_id=g.get('api_key_id'))
+    except (UnknownJobKind, InvalidJobPayload) as e:
+        return jsonify({'error': str(e)}), 400
+    except JobQueueFull as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+
+    return jsonify({
+        'job_id': job_id,
+        'status': Job.PENDING,
+        'status_url': url_for('api.get_job', job_id=job_id),
+        'result_url': url_for('api.get_job_result', job_id=job_id)
+    }), 202, {'Location': url_for('api.get_job', job_id=job_id)}
+
+def get_own_job(job_id):
+    """获取当前调用方可见的任务：API密钥只能访问自己提交的任务，本地请求可以访问全部任务"""
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return None
+    api_key_id = g.get('api_key_id')
+    if api_key_id is not None and job.api_key_id != api_key_id:
+        return None
+    return job
+
+@api_bp.route('/jobs', methods=['POST'])
+@require_api_key
+def submit_job():
+    """
+    提交后台任务
+
+    请求体为 {"kind": "entries.add" 或 "llm.generate", "payload": ...}，
+    payload 与对应同步接口（/api/add、/api/llm/generate）的请求体相同
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data.get('kind'):
+        return jsonify({'error': '请求数据必须包含 kind 和 payload'}), 400
+    # LLM任务与 /api/llm/* 共用 llm 类别的令牌桶，不能借 write 类别绕过
+    if str(data['kind']).startswith('llm.'):
+        limited = charge_rate_limit('llm')
+        if limited:
+            return limited
+    return submit_job_response(data['kind'], data.get('payload'))
+
+@api_bp.route('/jobs/<job_id>', methods=['GET'])
+@require_api_key
+def get_job(job_id):
+    """查询任务状态"""
+    job = get_own_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@api_bp.route('/jobs/<job_id>/result', methods=['GET'])
+@require_api_key
+def get_job_result(job_id):
+    """获取任务结果，任务尚未结束时返回202"""
+    job = get_own_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status not in Job.FINISHED_STATES:
+        return jsonify(job.to_dict()), 202
+    return jsonify(job.to_dict(include_result=True))
+
+@api_bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+@require_api_key
+def cancel_job(job_id):
+    """取消尚未开始执行的任务"""
+    job = get_own_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if not job_queue.cancel(job_id):
+        db.session.refresh(job)
+        return jsonify({'error': f'Job is already {job.status}', **job.to_dict()}), 409
+    db.session.refresh(job)
+    return jsonify(job.to_dict())
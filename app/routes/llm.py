@@ -1,13 +1,53 @@
 """
 LLM相关路由模块
 """
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash
+import json
+from flask import Blueprint, Response, render_template, request, jsonify, redirect, url_for, flash, stream_with_context
 from app.utils.auth import require_api_key, local_access_only
 from app.config import LLM_CONFIG
+from app.services.job_queue import job_queue
 
 # 创建蓝图
 llm_bp = Blueprint('llm', __name__)
 
+# 内容生成接口的系统提示，指导模型生成结构化内容
+GENERATE_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "你是一个内容生成助手，擅长生成结构化的内容。请严格按照用户指定的格式生成内容，不要添加额外的解释或说明。"
+}
+
+def validate_flags(data, *names):
+    """校验布尔字段（如 stream、cache）必须是JSON布尔值，返回错误信息或None"""
+    for name in names:
+        if name in data and not isinstance(data[name], bool):
+            return f'{name} 必须是布尔值 true 或 false'
+    return None
+
+def sse_response(chunks):
+    """
+    将增量片段以Server-Sent Events形式转发给客户端
+    
+    每个片段为一个 data 事件，正常结束时发送 done 事件，出错时发送 error 事件
+    """
+    def generate():
+        try:
+            for chunk in chunks:
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            error = json.dumps({'error': f'LLM流式响应失败: {str(e)}'}, ensure_ascii=False)
+            yield f"event: error\ndata: {error}\n\n"
+        finally:
+            # 客户端断开时关闭上游连接
+            if hasattr(chunks, 'close'):
+                chunks.close()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @llm_bp.route('/models', methods=['GET'])
 @require_api_key
 def list_llm_models():
@@ -49,6 +89,9 @@ def llm_chat():
         # 验证必要字段
         if 'messages' not in data or not isinstance(data['messages'], list) or not data['messages']:
             return jsonify({'error': '消息列表不能为空'}), 400
+        error = validate_flags(data, 'stream', 'cache')
+        if error:
+            return jsonify({'error': error}), 400
         
         # 导入LLM服务
         from app.services.llm_service import chat_completion
@@ -59,15 +102,23 @@ def llm_chat():
         max_tokens = data.get('max_tokens', LLM_CONFIG.get('DEFAULT_PARAMS', {}).get('max_tokens', 1000))
         top_p = data.get('top_p', LLM_CONFIG.get('DEFAULT_PARAMS', {}).get('top_p', 0.9))
         
+        stream = data.get('stream', False)
+        cache = data.get('cache', True)
+        
         # 调用LLM服务
         result = chat_completion(
             messages=data['messages'],
             model=model,
             temperature=temperature,
             max_tokens=max_tokens,
-            top_p=top_p
+            top_p=top_p,
+            stream=stream,
+            cache=cache
         )
         
+        if stream:
+            return sse_response(result)
+        
         return jsonify(result)
     except ImportError as e:
         return jsonify({'error': f'LLM服务模块加载失败: {str(e)}'}), 500
@@ -78,6 +129,139 @@ def llm_chat():
 @require_api_key
 def llm_generate():
     """LLM内容生成接口 - 简化版，只需要提供提示文本"""
+    try:
+        # 检查LLM功能是否启用
+        if not LLM_CONFIG.get('ENABLED', False):
+            return jsonify({'error': 'LLM功能未启用'}), 403
+        
+        # 获取请求数据
+        data = request.get_json()
+        error = validate_generate_payload(data)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        # 作为后台任务执行，立即返回任务ID
+        if data.get('async') or request.args.get('async', type=int):
+            from app.routes.api import submit_job_response
+            return submit_job_response('llm.generate', data)
+        
+        # 导入LLM服务
+        from app.services.llm_service import chat_completion
+        
+        request_kwargs = build_generate_request(data)
+        stream = data.get('stream', False)
+        
+        # 调用LLM服务
+        result = chat_completion(stream=stream, **request_kwargs)
+        
+        if stream:
+            return sse_response(result)
+        
+        # 简化响应
+        return jsonify(simplify_generate_result(result, request_kwargs['model']))
+    except ImportError as e:
+        return jsonify({'error': f'LLM服务模块加载失败: {str(e)}'}), 500
+    except Exception as e:
+        return jsonify({'error': f'LLM生成请求失败: {str(e)}'}), 500
+
+def validate_generate_payload(data):
+    """校验 /generate 的请求数据，返回错误信息或None"""
+    if not data or not isinstance(data, dict):
+        return '请求数据无效'
+    
+    # 验证必要字段
+    if 'prompt' not in data or not data['prompt']:
+        return '提示文本不能为空'
+    return validate_flags(data, 'stream', 'cache')
+
+def build_generate_request(data):
+    """将 /generate 的请求数据转换为 chat_completion 的参数（不含 stream）"""
+    # 获取参数
+    model = data.get('model', LLM_CONFIG.get('DEFAULT_MODEL', 'deepseek-chat'))
+    temperature = data.get('temperature', LLM_CONFIG.get('DEFAULT_PARAMS', {}).get('temperature', 0.7))
+    # 增加默认的max_tokens，以支持生成更多内容
+    max_tokens = data.get('max_tokens', LLM_CONFIG.get('DEFAULT_PARAMS', {}).get('max_tokens', 2000))
+    top_p = data.get('top_p', LLM_CONFIG.get('DEFAULT_PARAMS', {}).get('top_p', 0.9))
+    
+    # 构建消息，添加系统提示
+    messages = [
+        GENERATE_SYSTEM_MESSAGE,
+        {"role": "user", "content": data['prompt']}
+    ]
+    
+    return {
+        'messages': messages,
+        'model': model,
+        'temperature': temperature,
+        'max_tokens': max_tokens,
+        'top_p': top_p,
+        'cache': data.get('cache', True)
+    }
+
+def simplify_generate_result(result, model):
+    """将完整响应简化为 {'text', 'model'}，无法识别的格式原样返回"""
+    if 'choices' in result and len(result['choices']) > 0 and 'message' in result['choices'][0]:
+        return {
+            'text': result['choices'][0]['message'].get('content', ''),
+            'model': result.get('model', model)
+        }
+    return result
+
+def run_generate_job(data):
+    """后台任务：执行一次 /generate 请求，返回与同步接口相同格式的结果"""
+    if not LLM_CONFIG.get('ENABLED', False):
+        raise RuntimeError('LLM功能未启用')
+    
+    from app.services.llm_service import chat_completion
+    
+    request_kwargs = build_generate_request(data)
+    return simplify_generate_result(chat_completion(**request_kwargs), request_kwargs['model'])
+
+job_queue.register('llm.generate', run_generate_job, validate=validate_generate_payload)
+
+def build_batch_request(item, defaults):
+    """
+    将批量接口中的单个元素转换为 chat_completion 的参数
+    
+    元素可以是提示文本，或包含 prompt/messages 及可选 model/temperature/max_tokens/top_p 的对象
+    
+    Returns:
+        (参数字典, 错误信息) 元组，成功时错误信息为None
+    """
+    if isinstance(item, str):
+        item = {'prompt': item}
+    if not isinstance(item, dict):
+        return None, '元素必须是提示文本或对象'
+    
+    if item.get('messages'):
+        if not isinstance(item['messages'], list):
+            return None, '消息列表格式无效'
+        messages = item['messages']
+    elif item.get('prompt'):
+        messages = [GENERATE_SYSTEM_MESSAGE, {"role": "user", "content": item['prompt']}]
+    else:
+        return None, '提示文本不能为空'
+    error = validate_flags(item, 'cache')
+    if error:
+        return None, error
+    
+    request_kwargs = {key: item.get(key, value) for key, value in defaults.items()}
+    request_kwargs['messages'] = messages
+    return request_kwargs, None
+
+def batch_result(index, result, error, model):
+    """将单个批量结果转换为响应格式"""
+    if error is not None:
+        return {'index': index, 'error': str(error)}
+    text = ''
+    if 'choices' in result and len(result['choices']) > 0 and 'message' in result['choices'][0]:
+        text = result['choices'][0]['message'].get('content', '')
+    return {'index': index, 'text': text, 'model': result.get('model', model)}
+
+@llm_bp.route('/batch', methods=['POST'])
+@require_api_key
+def llm_batch():
+    """批量LLM生成接口 - 并发执行多个提示，按提交顺序返回结果，或在每个提示完成时流式返回"""
     try:
         # 检查LLM功能是否启用
         if not LLM_CONFIG.get('ENABLED', False):
@@ -89,52 +273,142 @@ def llm_generate():
             return jsonify({'error': '请求数据无效'}), 400
         
         # 验证必要字段
-        if 'prompt' not in data or not data['prompt']:
-            return jsonify({'error': '提示文本不能为空'}), 400
+        prompts = data.get('prompts')
+        if not isinstance(prompts, list) or not prompts:
+            return jsonify({'error': '提示列表不能为空'}), 400
+        max_prompts = LLM_CONFIG.get('BATCH', {}).get('MAX_PROMPTS', 50)
+        if len(prompts) > max_prompts:
+            return jsonify({'error': f'单次最多提交 {max_prompts} 个提示'}), 400
+        error = validate_flags(data, 'stream', 'cache')
+        if error:
+            return jsonify({'error': error}), 400
         
         # 导入LLM服务
-        from app.services.llm_service import chat_completion
-        
-        # 获取参数
-        model = data.get('model', LLM_CONFIG.get('DEFAULT_MODEL', 'deepseek-chat'))
-        temperature = data.get('temperature', LLM_CONFIG.get('DEFAULT_PARAMS', {}).get('temperature', 0.7))
-        # 增加默认的max_tokens，以支持生成更多内容
-        max_tokens = data.get('max_tokens', LLM_CONFIG.get('DEFAULT_PARAMS', {}).get('max_tokens', 2000))
-        top_p = data.get('top_p', LLM_CONFIG.get('DEFAULT_PARAMS', {}).get('top_p', 0.9))
+        from app.services.llm_service import iter_batch_completion
         
-        # 构建系统提示，指导模型生成结构化内容
-        system_message = {
-            "role": "system",
-            "content": "你是一个内容生成助手，擅长生成结构化的内容。请严格按照用户指定的格式生成内容，不要添加额外的解释或说明。"
+        # 获取参数，单个元素中的同名字段优先
+        default_params = LLM_CONFIG.get('DEFAULT_PARAMS', {})
+        defaults = {
+            'model': data.get('model', LLM_CONFIG.get('DEFAULT_MODEL', 'deepseek-chat')),
+            'temperature': data.get('temperature', default_params.get('temperature', 0.7)),
+            'max_tokens': data.get('max_tokens', default_params.get('max_tokens', 2000)),
+            'top_p': data.get('top_p', default_params.get('top_p', 0.9)),
+            'cache': data.get('cache', True),
         }
         
-        # 构建消息，添加系统提示
-        messages = [
-            system_message,
-            {"role": "user", "content": data['prompt']}
-        ]
+        requests_list = []
+        for index, item in enumerate(prompts):
+            request_kwargs, error = build_batch_request(item, defaults)
+            if error:
+                return jsonify({'error': f'第 {index + 1} 个提示无效: {error}'}), 400
+            requests_list.append(request_kwargs)
         
-        # 调用LLM服务
-        result = chat_completion(
-            messages=messages,
-            model=model,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            top_p=top_p
-        )
+        results = iter_batch_completion(requests_list)
         
-        # 简化响应
-        if 'choices' in result and len(result['choices']) > 0 and 'message' in result['choices'][0]:
-            return jsonify({
-                'text': result['choices'][0]['message'].get('content', ''),
-                'model': result.get('model', model)
-            })
+        if data.get('stream', False):
+            # 按完成顺序逐个推送，客户端按 index 还原顺序
+            return sse_response(
+                batch_result(index, result, error, requests_list[index]['model'])
+                for index, result, error in results
+            )
         
-        return jsonify(result)
+        ordered = [None] * len(requests_list)
+        for index, result, error in results:
+            ordered[index] = batch_result(index, result, error, requests_list[index]['model'])
+        failed = sum(1 for item in ordered if 'error' in item)
+        
+        return jsonify({
+            'results': ordered,
+            'succeeded': len(ordered) - failed,
+            'failed': failed
+        })
     except ImportError as e:
         return jsonify({'error': f'LLM服务模块加载失败: {str(e)}'}), 500
     except Exception as e:
-        return jsonify({'error': f'LLM生成请求失败: {str(e)}'}), 500
+        return jsonify({'error': f'LLM批量请求失败: {str(e)}'}), 500
+
+def validate_pipeline_payload(data):
+    """校验 /pipeline 的请求数据，返回错误信息或None"""
+    from app.services.bulk_ingest import VALID_CATEGORIES
+    
+    if not data or not isinstance(data, dict):
+        return '请求数据无效'
+    if data.get('category') not in VALID_CATEGORIES:
+        return f'类别无效，可选值: {", ".join(VALID_CATEGORIES)}'
+    count = data.get('count')
+    max_count = LLM_CONFIG.get('PIPELINE', {}).get('MAX_COUNT', 200)
+    if not isinstance(count, int) or isinstance(count, bool) or not 1 <= count <= max_count:
+        return f'count 必须是 1 到 {max_count} 之间的整数'
+    return validate_flags(data, 'stream')
+
+def iter_pipeline(data):
+    """按请求数据运行生成入库流水线，产出进度事件和汇总事件"""
+    from app import db
+    from app.services.llm_pipeline import run_pipeline
+    
+    model = data.get('model', LLM_CONFIG.get('DEFAULT_MODEL', 'deepseek-chat'))
+    return run_pipeline(db.session, data['category'], data['count'], model)
+
+def run_pipeline_job(data):
+    """后台任务：运行生成入库流水线，返回汇总和新增的条目"""
+    if not LLM_CONFIG.get('ENABLED', False):
+        raise RuntimeError('LLM功能未启用')
+    
+    entries = []
+    summary = None
+    for event in iter_pipeline(data):
+        if event.get('done'):
+            summary = event
+        else:
+            entries.extend(event['entries'])
+    return {**summary, 'entries': entries}
+
+job_queue.register('llm.pipeline', run_pipeline_job, validate=validate_pipeline_payload)
+
+@llm_bp.route('/pipeline', methods=['POST'])
+@require_api_key
+def llm_pipeline():
+    """
+    生成入库流水线接口 - 为指定类别生成 count 个新的不重复条目并直接写入数据库
+    
+    请求体为 {"category": "riddle", "count": 20, "model": "...", "stream": false, "async": false}。
+    stream=true 时以Server-Sent Events推送每次写入的进度，async=true 时作为后台任务执行
+    """
+    try:
+        # 检查LLM功能是否启用
+        if not LLM_CONFIG.get('ENABLED', False):
+            return jsonify({'error': 'LLM功能未启用'}), 403
+        
+        # 获取请求数据
+        data = request.get_json()
+        error = validate_pipeline_payload(data)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        if data.get('async') or request.args.get('async', type=int):
+            from app.routes.api import submit_job_response
+            return submit_job_response('llm.pipeline', data)
+        
+        if data.get('stream', False):
+            return sse_response(iter_pipeline(data))
+        
+        return jsonify(run_pipeline_job(data))
+    except ImportError as e:
+        return jsonify({'error': f'LLM服务模块加载失败: {str(e)}'}), 500
+    except Exception as e:
+        return jsonify({'error': f'LLM生成入库失败: {str(e)}'}), 500
+
+@llm_bp.route('/stats', methods=['GET'])
+@local_access_only
+def llm_stats():
+    """获取各服务的请求、重试、连接池、响应缓存和路由统计"""
+    try:
+        # 导入LLM服务
+        from app.services.llm_service import get_stats, get_cache_stats, get_routing_stats
+        
+        return jsonify({'providers': get_stats(), 'cache': get_cache_stats(), 'routing': get_routing_stats()})
+    except ImportError as e:
+        return jsonify({'error': f'LLM服务模块加载失败: {str(e)}'}), 500
 
 # LLM管理界面
 @llm_bp.route('/dashboard', methods=['GET'])
@@ -4,8 +4,12 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from app import db
 from app.models import DataEntry
+from app.services.bulk_ingest import bulk_ingest
+from app.services.sampling_index import sampling_index
+from app.services.search_index import search_index
 from app.utils.auth import local_access_only
 from app.utils.logger import get_logger, log_exception
+from app.utils.pagination import keyset_paginate, InvalidCursorError
 
 # 获取当前模块的日志记录器
 logger = get_logger()
@@ -24,17 +28,43 @@ def index():
 def browse():
     """浏览数据条目"""
     category = request.args.get('category')
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
+    search = request.args.get('q', '').strip()
     per_page = 20
 
+    if search:
+        return browse_search(search, category, cursor, per_page)
+
     query = DataEntry.query
     if category:
         query = query.filter_by(category=category)
 
-    pagination = query.order_by(DataEntry.created_at.desc()).paginate(page=page, per_page=per_page)
-    entries = pagination.items
-
-    return render_template('browse.html', entries=entries, pagination=pagination, category=category)
+    try:
+        pagination = keyset_paginate(query, cursor=cursor, per_page=per_page)
+    except InvalidCursorError:
+        flash('无效的分页游标，已返回第一页', 'warning')
+        return redirect(url_for('main.browse', category=category))
+    entries = pagination['items']
+
+    # 采样索引中的条目数即为总数（无需 COUNT(*)）
+    total = sampling_index.size(category) if sampling_index.built else None
+
+    return render_template('browse.html', entries=entries, pagination=pagination, category=category, total=total,
+                           search=None)
+
+def browse_search(search, category, cursor, per_page):
+    """浏览页的搜索结果，按相关度排序，只能向后翻页"""
+    try:
+        result = search_index.search(db.session, search, category=category, cursor=cursor, limit=per_page)
+    except InvalidCursorError:
+        flash('无效的分页游标，已返回第一页', 'warning')
+        return redirect(url_for('main.browse', category=category, q=search))
+
+    entries = [entry for entry, _ in result['items']]
+    # 搜索结果只有向后的游标，首页链接即返回第一页
+    pagination = {'items': entries, 'next': result['next'], 'prev': bool(cursor)}
+    return render_template('browse.html', entries=entries, pagination=pagination, category=category,
+                           total=None, search=search)
 
 @main_bp.route('/add', methods=['GET', 'POST'])
 @local_access_only
@@ -71,9 +101,8 @@ def process_batch_entries(request):
     # 分割多个条目
     items = batch_entries.split('---')
 
-    success_count = 0
-    duplicate_count = 0
     failed_count = 0
+    parsed_entries = []
 
     for item in items:
         item = item.strip()
@@ -94,39 +123,31 @@ def process_batch_entries(request):
             failed_count += 1
             continue
 
-        # 生成哈希用于去重
-        content_hash = DataEntry.generate_hash(question, answer)
-
-        # 检查条目是否已存在
-        existing_entry = DataEntry.query.filter_by(content_hash=content_hash).first()
-        if existing_entry:
-            duplicate_count += 1
-            continue
-
-        # 创建新条目
-        new_entry = DataEntry(
-            question=question,
-            answer=answer,
-            category=category,
-            content_hash=content_hash
-        )
-
-        try:
-            db.session.add(new_entry)
-            success_count += 1
-        except Exception as e:
-            log_exception(logger, f"Error adding batch entry: {str(e)}")
-            failed_count += 1
+        parsed_entries.append({
+            'question': question,
+            'answer': answer,
+            'category': category
+        })
 
-    # 提交事务
-    if success_count > 0:
+    # 批量去重并插入
+    success_count = 0
+    duplicate_count = 0
+    if parsed_entries:
         try:
+            ingested = bulk_ingest(db.session, parsed_entries)
             db.session.commit()
-            flash(f'成功添加 {success_count} 个条目！{duplicate_count} 个重复，{failed_count} 个失败。', 'success')
+            success_count = len(ingested['inserted'])
+            duplicate_count = len(ingested['duplicates'])
         except Exception as e:
             db.session.rollback()
             log_exception(logger, "Error committing batch entries")
             flash(f'提交批量条目时出错: {str(e)}', 'error')
+            return redirect(url_for('main.browse'))
+
+    if success_count > 0:
+        # 将新条目同步到随机采样索引
+        sampling_index.refresh(db.session, force=True)
+        flash(f'成功添加 {success_count} 个条目！{duplicate_count} 个重复，{failed_count} 个失败。', 'success')
     else:
         if duplicate_count > 0:
             flash(f'未添加任何条目。{duplicate_count} 个重复，{failed_count} 个失败。', 'warning')
@@ -0,0 +1,191 @@
+"""
+API密钥缓存模块 - 认证读路径不再访问数据库写路径
+
+- 有效密钥缓存在内存中（带TTL），无效密钥短时间负缓存
+- 缓存条目数有上限：超出时淘汰最早写入的条目，接近上限时不再缓存无效密钥，过期条目定期清理
+- 管理界面修改密钥时主动失效
+- last_used_at 和请求计数先在内存中累积，由后台线程按固定间隔批量写回
+"""
+
+import atexit
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, func
+
+from app.utils.logger import get_logger, log_exception
+
+logger = get_logger('api_key_cache')
+
+
+class ApiKeyCache:
+    """带TTL的API密钥校验缓存和使用情况写回缓冲"""
+
+    def __init__(self, ttl: float = 60.0, negative_ttl: float = 5.0, flush_interval: float = 10.0,
+                 max_entries: int = 10000):
+        """
+        初始化缓存
+
+        Args:
+            ttl: 有效密钥的缓存时间（秒）
+            negative_ttl: 无效密钥的缓存时间（秒）
+            flush_interval: 使用情况写回数据库的间隔（秒），同时清理过期条目
+            max_entries: 缓存的最大条目数
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.flush_interval = flush_interval
+        self.max_entries = max_entries
+        # key -> (api_key_id 或 None, 过期时间)，按写入顺序排列
+        self._entries: "OrderedDict[str, Tuple[Optional[int], float]]" = OrderedDict()
+        # api_key_id -> (最后使用时间, 累计请求数)
+        self._usage: Dict[int, Tuple[datetime, int]] = {}
+        # 每次失效递增，避免失效前发起的查询把旧结果写回缓存
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._app = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def verify(self, key: str) -> Optional[int]:
+        """
+        校验API密钥
+
+        Args:
+            key: 请求携带的密钥
+
+        Returns:
+            有效且启用的密钥ID，无效时返回None
+        """
+        now = time.monotonic()
+        cached = self._entries.get(key)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+
+        from app.models import ApiKey
+        generation = self._generation
+        row = ApiKey.query.with_entities(ApiKey.id).filter_by(key=key, is_active=True).first()
+        key_id = row[0] if row else None
+        expires_at = now + (self.ttl if key_id is not None else self.negative_ttl)
+        with self._lock:
+            if generation != self._generation:
+                return key_id
+            # 随机的无效密钥不应挤占缓存：接近上限时只缓存有效密钥
+            if key_id is None and len(self._entries) >= self.max_entries // 2:
+                self._entries.pop(key, None)
+                return key_id
+            self._entries[key] = (key_id, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return key_id
+
+    def prune(self) -> int:
+        """
+        删除已过期的缓存条目
+
+        Returns:
+            删除的条目数
+        """
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._entries.items() if expires_at <= now]
+            for key in expired:
+                del self._entries[key]
+        return len(expired)
+
+    def invalidate(self, key: Optional[str] = None):
+        """
+        使缓存失效
+
+        只作用于当前进程；其他进程中的缓存条目在TTL到期后才重新查询数据库
+
+        Args:
+            key: 要失效的密钥，为空时清空全部缓存
+        """
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def record_usage(self, key_id: int):
+        """记录一次密钥使用，稍后批量写回"""
+        now = datetime.utcnow()
+        with self._lock:
+            _, count = self._usage.get(key_id, (now, 0))
+            self._usage[key_id] = (now, count + 1)
+
+    def flush(self) -> int:
+        """
+        将累积的使用情况以一次批量UPDATE写回数据库
+
+        Returns:
+            写回的密钥数量
+        """
+        with self._lock:
+            usage, self._usage = self._usage, {}
+        if not usage or self._app is None:
+            return 0
+
+        from app import db
+        from app.models import ApiKey
+
+        table = ApiKey.__table__
+        statement = table.update() \
+            .where(table.c.id == bindparam('b_id')) \
+            .values(last_used_at=bindparam('b_last_used_at'),
+                    request_count=func.coalesce(table.c.request_count, 0) + bindparam('b_count'))
+        rows = [{'b_id': key_id, 'b_last_used_at': last_used_at, 'b_count': count}
+                for key_id, (last_used_at, count) in usage.items()]
+
+        try:
+            with self._app.app_context():
+                db.session.execute(statement, rows)
+                db.session.commit()
+        except Exception:
+            log_exception(logger, "Failed to flush API key usage")
+            # 写回失败时把数据合并回缓冲区，下次重试
+            with self._lock:
+                for key_id, (last_used_at, count) in usage.items():
+                    pending_last_used, pending_count = self._usage.get(key_id, (last_used_at, 0))
+                    self._usage[key_id] = (max(last_used_at, pending_last_used), count + pending_count)
+            return 0
+        return len(rows)
+
+    def start(self, app):
+        """启动后台写回线程，进程退出时写回剩余数据；只在服务进程（run.py）中调用"""
+        self._app = app
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='api-key-usage-flusher', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """停止后台线程并写回剩余数据"""
+        self._stop.set()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.prune()
+            self.flush()
+
+
+def _create_default_cache() -> ApiKeyCache:
+    from app.config import API_KEY_CACHE_CONFIG
+    return ApiKeyCache(
+        ttl=API_KEY_CACHE_CONFIG.get("TTL", 60.0),
+        negative_ttl=API_KEY_CACHE_CONFIG.get("NEGATIVE_TTL", 5.0),
+        flush_interval=API_KEY_CACHE_CONFIG.get("FLUSH_INTERVAL", 10.0),
+        max_entries=API_KEY_CACHE_CONFIG.get("MAX_ENTRIES", 10000),
+    )
+
+
+# 默认实例
+api_key_cache = _create_default_cache()
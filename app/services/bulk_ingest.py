@@ -0,0 +1,121 @@
+"""
+批量写入模块 - 基于集合的条目去重与插入
+
+一次批量写入只需要：
+- 对整批条目计算哈希，并在批内去重
+- 按块执行少量 content_hash IN (...) 查询找出已存在的条目
+- 用一次 executemany 插入新条目，并根据rowid区间得到新ID
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import text
+
+from app.models import DataEntry
+from app.services.near_duplicates import near_duplicate_index
+
+# 有效类别
+VALID_CATEGORIES = ('riddle', 'joke', 'idiom', 'brain_teaser')
+
+# 每个 IN 查询的参数个数，低于旧版SQLite的999个变量上限
+HASH_LOOKUP_CHUNK_SIZE = 500
+
+
+def find_existing_hashes(session, hashes: Iterable[str]) -> Dict[str, int]:
+    """
+    分块查询已存在的内容哈希
+
+    Args:
+        session: SQLAlchemy会话
+        hashes: 内容哈希序列
+
+    Returns:
+        {content_hash: entry_id} 字典
+    """
+    hashes = list(hashes)
+    existing = {}
+    for start in range(0, len(hashes), HASH_LOOKUP_CHUNK_SIZE):
+        chunk = hashes[start:start + HASH_LOOKUP_CHUNK_SIZE]
+        rows = session.query(DataEntry.content_hash, DataEntry.id) \
+            .filter(DataEntry.content_hash.in_(chunk)).all()
+        existing.update(rows)
+    return existing
+
+
+def insert_rows(session, rows: List[Dict[str, Any]]) -> List[int]:
+    """
+    用一次 executemany 插入条目并返回新ID
+
+    SQLite在写事务内串行分配 max(rowid)+1，因此一次 executemany 得到的ID
+    是以 last_insert_rowid() 结尾的连续区间。
+    开启写入时签名时，同时保存新条目的近似重复签名。
+
+    Args:
+        session: SQLAlchemy会话
+        rows: 包含 question/answer/category/content_hash/created_at 的字典列表
+
+    Returns:
+        与rows顺序一致的新ID列表
+    """
+    if not rows:
+        return []
+
+    # 签名在插入之前计算，不延长写锁的持有时间
+    signatures = near_duplicate_index.compute_rows(rows) if near_duplicate_index.sign_on_write else None
+
+    connection = session.connection()
+    connection.execute(DataEntry.__table__.insert(), rows)
+    last_id = connection.execute(text('SELECT last_insert_rowid()')).scalar()
+    first_id = last_id - len(rows) + 1
+    entry_ids = list(range(first_id, last_id + 1))
+    if signatures is not None:
+        near_duplicate_index.add(session, entry_ids, signatures)
+    return entry_ids
+
+
+def bulk_ingest(session, items: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    批量去重并插入已校验的条目，不提交事务
+
+    Args:
+        session: SQLAlchemy会话
+        items: 包含 question/answer/category 的字典列表
+
+    Returns:
+        {'inserted': [...], 'duplicates': [...]}，保持输入顺序：
+        - inserted 中每项为插入的行，附带 id 和 created_at
+        - duplicates 中每项为 {'item': 原条目, 'existing_id': 已存在或批内首个条目的ID}
+    """
+    hashed = [(item, DataEntry.generate_hash(item['question'], item['answer'])) for item in items]
+    existing = find_existing_hashes(session, {content_hash for _, content_hash in hashed})
+
+    now = datetime.utcnow()
+    rows = []
+    batch_index = {}
+    duplicate_refs = []
+    for item, content_hash in hashed:
+        if content_hash in existing:
+            duplicate_refs.append((item, existing[content_hash], None))
+        elif content_hash in batch_index:
+            # 批内重复，指向本批第一次出现的条目（插入后才有ID）
+            duplicate_refs.append((item, None, batch_index[content_hash]))
+        else:
+            batch_index[content_hash] = len(rows)
+            rows.append({
+                'question': item['question'],
+                'answer': item['answer'],
+                'category': item['category'],
+                'content_hash': content_hash,
+                'created_at': now
+            })
+
+    for row, entry_id in zip(rows, insert_rows(session, rows)):
+        row['id'] = entry_id
+
+    duplicates = [{
+        'item': item,
+        'existing_id': existing_id if row_index is None else rows[row_index]['id']
+    } for item, existing_id, row_index in duplicate_refs]
+
+    return {'inserted': rows, 'duplicates': duplicates}
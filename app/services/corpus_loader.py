@@ -0,0 +1,348 @@
+"""
+语料加载模块 - 流式解析 origin_data 格式的文本文件并批量写入数据库
+
+文件格式为以 --- 行分隔的记录：
+    问题：<问题，可跨行>
+    答案:<答案>
+    注释:<可选注释>
+    ---
+
+- 按行缓冲读取，内存占用与文件大小无关
+- 大文件按记录边界切分成若干区间，由多个进程并行解析和计算哈希
+- 主进程按块在内存中去重、查询已存在的哈希，用 executemany 插入并逐块提交
+- 每个文件导入后记录大小、修改时间和最后一条完整记录之后的偏移，增量导入时只解析追加的部分
+"""
+
+import os
+import re
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.models import DataEntry, ImportState
+from app.services.bulk_ingest import find_existing_hashes, insert_rows
+from app.utils.logger import get_logger
+
+logger = get_logger('corpus_loader')
+
+# 文件名到类别的映射
+CATEGORY_MAPPING = {
+    "riddle.txt": "riddle",
+    "joke.txt": "joke",
+    "idiom.txt": "idiom",
+    "brain_teaser.txt": "brain_teaser"
+}
+
+# 每个解析任务处理的字节数
+PARSE_UNIT_BYTES = 4 * 1024 * 1024
+
+# 读取缓冲区大小
+READ_BUFFER_BYTES = 1024 * 1024
+
+# 计算文件指纹时读取的开头和偏移之前的字节数
+FINGERPRINT_BYTES = 4096
+
+# 答案保留其后的注释行，与旧版加载器生成的内容和哈希一致
+RECORD_PATTERN = re.compile(r'问题：(.*?)[\r\n]+答案:(.*)', re.DOTALL)
+
+
+def is_separator(line: bytes) -> bool:
+    """是否为记录分隔行"""
+    return line.strip() == b'---'
+
+
+def parse_record(raw: bytes) -> Optional[Tuple[str, str]]:
+    """
+    解析一条记录
+
+    Returns:
+        (问题, 答案) 元组，无法解析或内容为空时返回None
+    """
+    # 与文本模式读取一致，统一换行符
+    record = raw.decode('utf-8', errors='replace').replace('\r\n', '\n').replace('\r', '\n').strip()
+    if not record:
+        return None
+    match = RECORD_PATTERN.match(record)
+    if not match:
+        return None
+    question, answer = match.group(1).strip(), match.group(2).strip()
+    if not question or not answer:
+        return None
+    return question, answer
+
+
+def iter_records(path: str, start: int = 0,
+                 end: Optional[int] = None) -> Iterator[Tuple[Optional[Tuple[str, str]], bytes, Optional[int]]]:
+    """
+    逐条读取文件中 [start, end) 区间内的记录
+
+    start 必须位于记录开头（文件开头或分隔行之后）。
+
+    Yields:
+        (解析结果, 原始记录, 结束偏移) 元组。解析结果为None表示记录无法解析；
+        结束偏移为分隔行之后的位置，文件末尾没有分隔行的记录为None；空记录不产出
+    """
+    with open(path, 'rb', buffering=READ_BUFFER_BYTES) as f:
+        f.seek(start)
+        position = start
+        lines: List[bytes] = []
+        for line in f:
+            if end is not None and position >= end:
+                break
+            position += len(line)
+            if is_separator(line):
+                if lines:
+                    raw = b''.join(lines)
+                    lines = []
+                    if raw.strip():
+                        yield parse_record(raw), raw, position
+                continue
+            lines.append(line)
+        if lines:
+            raw = b''.join(lines)
+            if raw.strip():
+                yield parse_record(raw), raw, None
+
+
+def split_ranges(path: str, unit_bytes: int = PARSE_UNIT_BYTES, start: int = 0,
+                 size: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    把文件的 [start, size) 部分按记录边界切分为大约 unit_bytes 大小的区间
+
+    从每个预定切分点向后找到下一个分隔行，在其之后切分，只需读取少量行。
+    """
+    if size is None:
+        size = os.path.getsize(path)
+    if start >= size:
+        return []
+    boundaries = [start]
+    with open(path, 'rb') as f:
+        target = start + unit_bytes
+        while target < size:
+            f.seek(target)
+            # 丢弃切分点所在的不完整行
+            f.readline()
+            position = f.tell()
+            for line in iter(f.readline, b''):
+                position += len(line)
+                if is_separator(line):
+                    break
+            if position >= size:
+                break
+            boundaries.append(position)
+            target = position + unit_bytes
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def parse_range(path: str, start: int, end: int) -> Dict[str, Any]:
+    """
+    解析文件的一个区间并计算内容哈希（在工作进程中执行）
+
+    Returns:
+        {'path', 'rows': [(question, answer, content_hash)], 'skipped', 'samples', 'offset'}，
+        offset 为区间内最后一条完整记录之后的位置
+    """
+    rows = []
+    skipped = 0
+    samples = []
+    offset = start
+    for parsed, raw, record_end in iter_records(path, start, end):
+        if record_end is not None:
+            offset = record_end
+        if parsed is None:
+            skipped += 1
+            if len(samples) < 3:
+                samples.append(raw.decode('utf-8', errors='replace').strip()[:50])
+            continue
+        question, answer = parsed
+        rows.append((question, answer, DataEntry.generate_hash(question, answer)))
+    return {'path': path, 'rows': rows, 'skipped': skipped, 'samples': samples, 'offset': offset}
+
+
+def find_corpus_files(data_dir: str) -> List[Tuple[str, str]]:
+    """
+    列出数据目录中可识别的语料文件
+
+    Returns:
+        [(文件路径, 类别)]，按文件大小降序，让大文件先开始解析
+    """
+    if not os.path.isdir(data_dir):
+        return []
+    files = [(os.path.join(data_dir, filename), category)
+             for filename, category in CATEGORY_MAPPING.items()
+             if os.path.isfile(os.path.join(data_dir, filename))]
+    return sorted(files, key=lambda item: os.path.getsize(item[0]), reverse=True)
+
+
+def fingerprint(path: str, offset: int) -> str:
+    """文件开头和 offset 之前各 FINGERPRINT_BYTES 字节的哈希，追加内容不会改变它"""
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        digest.update(f.read(min(FINGERPRINT_BYTES, offset)))
+        tail_start = max(0, offset - FINGERPRINT_BYTES)
+        f.seek(tail_start)
+        digest.update(f.read(offset - tail_start))
+    return digest.hexdigest()
+
+
+def plan_file(session, path: str, incremental: bool) -> Dict[str, Any]:
+    """
+    决定文件从哪里开始解析
+
+    - 大小和修改时间都未变：跳过
+    - 文件变大且已导入部分的指纹不变：从上次的偏移继续
+    - 没有导入记录、被截断或被改写：从头完整校验（已存在的条目按哈希去重）
+
+    Returns:
+        {'mode': 'unchanged' | 'append' | 'full', 'start', 'size', 'mtime'}
+    """
+    stat = os.stat(path)
+    plan = {'mode': 'full', 'start': 0, 'size': stat.st_size, 'mtime': stat.st_mtime}
+    if not incremental:
+        return plan
+    state = session.get(ImportState, os.path.abspath(path))
+    if state is None:
+        return plan
+    if state.size == stat.st_size and state.mtime == stat.st_mtime:
+        return {**plan, 'mode': 'unchanged', 'start': stat.st_size}
+    if stat.st_size > state.size and fingerprint(path, state.offset) == state.fingerprint:
+        return {**plan, 'mode': 'append', 'start': state.offset}
+    logger.info(f"{path} 已被截断或改写，完整校验")
+    return plan
+
+
+def save_state(session, path: str, size: int, mtime: float, offset: int):
+    """记录文件的导入位置并提交"""
+    key = os.path.abspath(path)
+    state = session.get(ImportState, key) or ImportState(path=key)
+    state.size = size
+    state.mtime = mtime
+    state.offset = offset
+    state.fingerprint = fingerprint(path, offset)
+    session.add(state)
+    session.commit()
+
+
+def iter_parsed_units(plans: List[Dict[str, Any]], workers: int,
+                      unit_bytes: int = PARSE_UNIT_BYTES) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any], bool]]:
+    """
+    并行解析所有文件的待导入部分，按提交顺序产出 (文件计划, 解析结果, 是否为该文件的最后一个区间)
+
+    同时在途的解析任务不超过 workers * 2 个，内存占用与语料总大小无关。
+    """
+    units = []
+    for plan in plans:
+        ranges = split_ranges(plan['path'], unit_bytes, plan['start'], plan['size'])
+        for index, (start, end) in enumerate(ranges):
+            units.append((plan, start, end, index == len(ranges) - 1))
+    workers = min(workers, len(units))
+    if workers <= 1:
+        for plan, start, end, last in units:
+            yield plan, parse_range(plan['path'], start, end), last
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        window = workers * 2
+        pending = []
+        for plan, start, end, last in units:
+            pending.append((plan, executor.submit(parse_range, plan['path'], start, end), last))
+            if len(pending) >= window:
+                plan_done, future, last_done = pending.pop(0)
+                yield plan_done, future.result(), last_done
+        for plan_done, future, last_done in pending:
+            yield plan_done, future.result(), last_done
+
+
+def ingest_chunk(session, chunk: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """
+    在内存中对一块行去重，跳过数据库中已存在的哈希，插入其余行并提交
+
+    Returns:
+        (新增数, 重复数)
+    """
+    unique = {}
+    for row in chunk:
+        unique.setdefault(row['content_hash'], row)
+    existing = find_existing_hashes(session, unique.keys())
+    rows = [row for content_hash, row in unique.items() if content_hash not in existing]
+    insert_rows(session, rows)
+    session.commit()
+    return len(rows), len(chunk) - len(rows)
+
+
+def load_corpus(session, data_dir: str, chunk_size: int = 1000, workers: Optional[int] = None,
+                unit_bytes: int = PARSE_UNIT_BYTES, incremental: bool = False) -> Dict[str, Any]:
+    """
+    流式加载数据目录中的所有语料文件
+
+    Args:
+        session: SQLAlchemy会话
+        data_dir: 语料目录
+        chunk_size: 每个事务写入的条目数
+        workers: 解析进程数，默认为CPU核数；1表示在当前进程中解析
+        unit_bytes: 每个解析任务处理的字节数
+        incremental: 是否根据导入状态只解析上次导入之后追加的记录
+
+    Returns:
+        {'files', 'parsed', 'inserted', 'duplicates', 'skipped', 'seconds', 'records_per_second',
+         'categories', 'modes'}，modes 为各文件的导入方式
+    """
+    start_time = time.perf_counter()
+    files = find_corpus_files(data_dir)
+    plans = [{**plan_file(session, path, incremental), 'path': path, 'category': category}
+             for path, category in files]
+    # 计划阶段只读取了导入状态，结束读事务以免长时间持有快照
+    session.commit()
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    stats = {'files': len(files), 'parsed': 0, 'inserted': 0, 'duplicates': 0, 'skipped': 0}
+    categories: Dict[str, int] = {}
+    modes = {os.path.basename(plan['path']): plan['mode'] for plan in plans}
+    offsets = {plan['path']: plan['start'] for plan in plans}
+    now = datetime.utcnow()
+    chunk: List[Dict[str, Any]] = []
+
+    def flush():
+        inserted, duplicates = ingest_chunk(session, chunk)
+        stats['inserted'] += inserted
+        stats['duplicates'] += duplicates
+        chunk.clear()
+
+    for plan, result, last in iter_parsed_units(plans, workers, unit_bytes):
+        category = plan['category']
+        stats['skipped'] += result['skipped']
+        for sample in result['samples']:
+            logger.warning(f"无法解析条目: {sample}...")
+        categories[category] = categories.get(category, 0) + len(result['rows'])
+        for question, answer, content_hash in result['rows']:
+            chunk.append({
+                'question': question,
+                'answer': answer,
+                'category': category,
+                'content_hash': content_hash,
+                'created_at': now
+            })
+            if len(chunk) >= chunk_size:
+                flush()
+        stats['parsed'] += len(result['rows'])
+        offsets[plan['path']] = max(offsets[plan['path']], result['offset'])
+        if last:
+            # 文件的所有条目提交后才记录导入位置，中途失败时下次从旧位置重新导入
+            if chunk:
+                flush()
+            save_state(session, plan['path'], plan['size'], plan['mtime'], offsets[plan['path']])
+    if chunk:
+        flush()
+
+    seconds = time.perf_counter() - start_time
+    stats.update({
+        'seconds': seconds,
+        'records_per_second': stats['parsed'] / seconds if seconds > 0 else 0.0,
+        'categories': categories,
+        'modes': modes
+    })
+    return stats
@@ -0,0 +1,289 @@
+"""
+后台任务队列 - 把耗时的生成和导入工作移出HTTP请求线程
+
+- 提交时只写入一行任务记录并放入内存队列，立即返回任务ID
+- 固定数量的工作线程按提交顺序执行任务，结果和错误写回任务表
+- 任务记录保存在应用数据库中，重启后继续执行尚未开始的任务
+- 工作线程只在服务进程中由 start() 启动，create_app() 不启动，脚本进程不会执行任务
+- 运行中的任务记录执行进程并定期更新心跳，只有心跳过期（进程已退出）的任务才标记为中断
+"""
+
+import os
+import json
+import uuid
+import queue
+import atexit
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from app.utils.logger import get_logger, log_exception
+
+logger = get_logger('job_queue')
+
+
+class JobQueueFull(Exception):
+    """排队中的任务数已达上限"""
+    pass
+
+
+class UnknownJobKind(ValueError):
+    """未注册的任务类型"""
+    pass
+
+
+class InvalidJobPayload(ValueError):
+    """任务参数未通过校验"""
+    pass
+
+
+class JobQueue:
+    """基于任务表的进程内任务队列"""
+
+    def __init__(self, workers: int = 4, max_pending: int = 1000, keep_days: int = 7,
+                 heartbeat_interval: float = 30, stale_after: float = 120):
+        """
+        Args:
+            workers: 工作线程数
+            max_pending: 任务表中排队任务数的上限
+            keep_days: 已结束任务的保留天数
+            heartbeat_interval: 运行中任务的心跳间隔（秒）
+            stale_after: 心跳超过该时间（秒）未更新的运行中任务视为已中断
+        """
+        self.workers = workers
+        self.max_pending = max_pending
+        self.keep_days = keep_days
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        # 执行任务的进程标识，启动时生成，写入所执行任务的 owner 列
+        self.owner: Optional[str] = None
+        self._stopping = threading.Event()
+        self._handlers: Dict[str, Callable[[Any], Any]] = {}
+        self._validators: Dict[str, Callable[[Any], Optional[str]]] = {}
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._app = None
+        self._threads = []
+
+    def register(self, kind: str, handler: Callable[[Any], Any],
+                 validate: Optional[Callable[[Any], Optional[str]]] = None):
+        """
+        注册任务类型
+
+        Args:
+            kind: 任务类型名
+            handler: 在应用上下文中执行的处理函数，参数为提交时的payload，返回值需可JSON序列化
+            validate: 提交时校验payload的函数，返回错误信息或None
+        """
+        self._handlers[kind] = handler
+        if validate is not None:
+            self._validators[kind] = validate
+
+    def submit(self, kind: str, payload: Any, api_key_id: Optional[int] = None) -> str:
+        """
+        提交任务
+
+        Returns:
+            任务ID
+
+        Raises:
+            UnknownJobKind: 任务类型未注册
+            InvalidJobPayload: payload 未通过校验
+            JobQueueFull: 排队中的任务数已达上限
+        """
+        if kind not in self._handlers:
+            raise UnknownJobKind(f'Unknown job kind: {kind}')
+        validate = self._validators.get(kind)
+        error = validate(payload) if validate else None
+        if error:
+            raise InvalidJobPayload(error)
+        from app import db
+        from app.models import Job
+
+        # 按任务表计数：其他进程提交的任务和本进程未启动工作线程时提交的任务不在内存队列中
+        if Job.query.filter_by(status=Job.PENDING).count() >= self.max_pending:
+            raise JobQueueFull(f'Too many pending jobs ({self.max_pending})')
+
+        job = Job(id=Job.generate_id(), kind=kind, status=Job.PENDING,
+                  payload=json.dumps(payload, ensure_ascii=False), api_key_id=api_key_id)
+        db.session.add(job)
+        db.session.commit()
+        self._queue.put(job.id)
+        return job.id
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        取消尚未开始执行的任务
+
+        Returns:
+            是否取消成功；任务已开始或已结束时返回False
+        """
+        from app import db
+        from app.models import Job
+
+        cancelled = Job.query.filter_by(id=job_id, status=Job.PENDING).update(
+            {'status': Job.CANCELLED, 'finished_at': datetime.utcnow()}
+        )
+        db.session.commit()
+        return cancelled == 1
+
+    def pending_count(self) -> int:
+        """任务表中等待执行的任务数（所有进程）"""
+        from app.models import Job
+        return Job.query.filter_by(status=Job.PENDING).count()
+
+    def start(self, app):
+        """
+        恢复未执行的任务并启动工作线程和心跳线程
+
+        只应在处理请求的服务进程中调用（见 run.py），不在 create_app() 中调用
+        """
+        self._app = app
+        if self._threads:
+            return
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._stopping.clear()
+        with app.app_context():
+            try:
+                self._recover()
+            except Exception:
+                log_exception(logger, "Failed to recover pending jobs")
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'job-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True)
+        heartbeat.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """通知工作线程在当前任务结束后退出，未执行的任务留在任务表中等待下次启动"""
+        self._stopping.set()
+        for _ in self._threads:
+            self._queue.put(None)
+
+    def _recover(self):
+        """启动时清理过期任务，标记被中断的任务，并把未执行的任务重新放入队列"""
+        from app import db
+        from app.models import Job
+
+        now = datetime.utcnow()
+        Job.query.filter(Job.status.in_(Job.FINISHED_STATES),
+                         Job.finished_at < now - timedelta(days=self.keep_days)).delete(synchronize_session=False)
+        db.session.commit()
+        interrupted = self._fail_stale()
+
+        pending = [row[0] for row in Job.query.with_entities(Job.id)
+                   .filter_by(status=Job.PENDING).order_by(Job.created_at).all()]
+        for job_id in pending:
+            self._queue.put(job_id)
+        db.session.remove()
+        if pending or interrupted:
+            logger.info(f"恢复 {len(pending)} 个未执行的任务，{interrupted} 个被中断的任务标记为失败")
+
+    def _fail_stale(self) -> int:
+        """
+        把心跳过期的运行中任务标记为失败
+
+        其他存活进程正在执行的任务会持续更新心跳，不受影响；
+        已退出进程的任务可能已产生部分副作用，不自动重试
+
+        Returns:
+            标记为失败的任务数
+        """
+        from app import db
+        from app.models import Job
+
+        now = datetime.utcnow()
+        deadline = now - timedelta(seconds=self.stale_after)
+        interrupted = Job.query.filter(
+            Job.status == Job.RUNNING,
+            db.func.coalesce(Job.heartbeat_at, Job.started_at, Job.created_at) < deadline
+        ).update({'status': Job.FAILED, 'error': 'Interrupted by application restart', 'finished_at': now},
+                 synchronize_session=False)
+        db.session.commit()
+        return interrupted
+
+    def _heartbeat(self):
+        """定期更新本进程运行中任务的心跳，并清理其他已退出进程遗留的任务"""
+        from app import db
+        from app.models import Job
+
+        while not self._stopping.wait(self.heartbeat_interval):
+            with self._app.app_context():
+                try:
+                    Job.query.filter_by(owner=self.owner, status=Job.RUNNING).update(
+                        {'heartbeat_at': datetime.utcnow()}, synchronize_session=False
+                    )
+                    db.session.commit()
+                    interrupted = self._fail_stale()
+                    if interrupted:
+                        logger.info(f"{interrupted} 个心跳过期的任务标记为失败")
+                except Exception:
+                    db.session.rollback()
+                    log_exception(logger, "Failed to update job heartbeats")
+                finally:
+                    db.session.remove()
+
+    def _claim(self, job_id: str):
+        """把任务从pending原子地改为running，返回任务；已被取消或被其他进程领取时返回None"""
+        from app import db
+        from app.models import Job
+
+        now = datetime.utcnow()
+        claimed = Job.query.filter_by(id=job_id, status=Job.PENDING).update(
+            {'status': Job.RUNNING, 'started_at': now, 'owner': self.owner, 'heartbeat_at': now}
+        )
+        db.session.commit()
+        return db.session.get(Job, job_id) if claimed == 1 else None
+
+    def _execute(self, job_id: str):
+        from app import db
+
+        job = self._claim(job_id)
+        if job is None:
+            return
+        handler = self._handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise UnknownJobKind(f'Unknown job kind: {job.kind}')
+            result = handler(json.loads(job.payload))
+            job.result = json.dumps(result, ensure_ascii=False)
+            job.status = job.SUCCEEDED
+        except Exception as e:
+            db.session.rollback()
+            log_exception(logger, f"Job {job_id} ({job.kind}) failed")
+            job.error = str(e)
+            job.status = job.FAILED
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+    def _run(self):
+        from app import db
+
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            with self._app.app_context():
+                try:
+                    self._execute(job_id)
+                except Exception:
+                    log_exception(logger, f"Failed to run job {job_id}")
+                finally:
+                    db.session.remove()
+
+
+def _create_default_queue() -> JobQueue:
+    from app.config import JOB_QUEUE_CONFIG
+    return JobQueue(
+        workers=JOB_QUEUE_CONFIG.get("WORKERS", 4),
+        max_pending=JOB_QUEUE_CONFIG.get("MAX_PENDING", 1000),
+        keep_days=JOB_QUEUE_CONFIG.get("KEEP_DAYS", 7),
+        heartbeat_interval=JOB_QUEUE_CONFIG.get("HEARTBEAT_INTERVAL", 30),
+        stale_after=JOB_QUEUE_CONFIG.get("STALE_AFTER", 120),
+    )
+
+
+# 默认实例
+job_queue = _create_default_queue()
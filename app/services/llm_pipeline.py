@@ -0,0 +1,223 @@
+"""
+LLM生成入库流水线 - 让模型按JSON格式生成条目，边接收边解析、去重并写入数据库
+
+- 提示模型每行输出一个 {"question": "...", "answer": "..."} 对象
+- 流式接收时逐个提取完整的JSON对象，不等待整段输出结束
+- 解析出的条目按小块交给 bulk_ingest 按 content_hash 去重并插入
+- 新条目数未达到目标时继续请求，并把本次已见过的问题告诉模型以减少重复
+"""
+
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.services.bulk_ingest import bulk_ingest, VALID_CATEGORIES
+from app.utils.logger import get_logger
+
+logger = get_logger('llm_pipeline')
+
+# 各类别的名称，以及 question/answer 字段在该类别中的含义
+CATEGORY_PROMPTS = {
+    'riddle': ('谜语', '谜面', '谜底'),
+    'joke': ('笑话', '问题或铺垫', '答案或笑点'),
+    'idiom': ('成语', '成语本身', '成语的含义'),
+    'brain_teaser': ('脑筋急转弯', '问题', '答案'),
+}
+
+
+class JSONObjectStream:
+    """
+    从增量到达的文本中提取完整的顶层JSON对象
+
+    只跟踪花括号深度和字符串状态，对象之外的内容（数组括号、逗号、代码块标记、说明文字）
+    都会被忽略，因此模型输出JSON Lines、JSON数组或带代码块的JSON都能解析。
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        # 花括号配对但无法解析的片段数
+        self.malformed = 0
+
+    def feed(self, text: str) -> List[Any]:
+        """
+        输入新到达的文本
+
+        Returns:
+            本次输入后新完成的JSON对象列表
+        """
+        objects = []
+        for char in text:
+            if self._depth == 0:
+                if char == '{':
+                    self._buffer = [char]
+                    self._depth = 1
+                continue
+
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        objects.append(json.loads(''.join(self._buffer)))
+                    except ValueError:
+                        self.malformed += 1
+                    self._buffer = []
+        return objects
+
+
+def build_messages(category: str, count: int, avoid: List[str]) -> List[Dict[str, str]]:
+    """构建要求模型按JSON Lines格式生成条目的消息"""
+    label, question_hint, answer_hint = CATEGORY_PROMPTS[category]
+    prompt = (
+        f'请生成{count}个有趣的{label}。输出格式要求：\n'
+        f'1. 每行一个JSON对象，格式为 {{"question": "...", "answer": "..."}}\n'
+        f'2. question 为{question_hint}，answer 为{answer_hint}\n'
+        f'3. 不要编号，不要使用代码块，不要输出JSON以外的任何内容'
+    )
+    if avoid:
+        prompt += '\n4. 不要与以下已有内容重复：\n' + '\n'.join(f'- {question}' for question in avoid)
+    return [
+        {"role": "system", "content": "你是一个内容生成助手，只输出符合要求的JSON Lines，每行一个JSON对象。"},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def to_item(obj: Any, category: str) -> Tuple[Optional[Dict[str, str]], Optional[str]]:
+    """
+    将模型输出的对象规范化为待写入的条目
+
+    Returns:
+        (条目, 错误原因) 元组
+    """
+    if not isinstance(obj, dict):
+        return None, 'not an object'
+    question, answer = obj.get('question'), obj.get('answer')
+    if not isinstance(question, str) or not isinstance(answer, str):
+        return None, 'question and answer must be strings'
+    question, answer = question.strip(), answer.strip()
+    if not question or not answer:
+        return None, 'question and answer cannot be empty'
+    return {'question': question, 'answer': answer, 'category': category}, None
+
+
+def serialize_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """将插入的行转换为响应格式"""
+    return {
+        'id': row['id'],
+        'question': row['question'],
+        'answer': row['answer'],
+        'category': row['category'],
+        'created_at': row['created_at'].isoformat()
+    }
+
+
+def run_pipeline(session, category: str, target: int, model: str,
+                 config: Optional[Dict[str, Any]] = None, chat_completion=None) -> Iterator[Dict[str, Any]]:
+    """
+    生成并写入target个新条目
+
+    每写入一块就提交事务并产出一个进度事件，最后产出汇总事件（含 'done': True）。
+    LLM调用失败时抛出异常，已提交的条目保留。
+
+    Args:
+        session: SQLAlchemy会话
+        category: 条目类别
+        target: 需要新增的条目数
+        model: 模型名称
+        config: 覆盖 LLM_CONFIG['PIPELINE'] 的参数
+        chat_completion: 聊天完成函数，默认使用LLM服务的默认实例
+
+    Yields:
+        进度事件 {'round', 'inserted', 'duplicates', 'total', 'entries'} 和汇总事件
+    """
+    if category not in VALID_CATEGORIES:
+        raise ValueError(f'Invalid category: {category}')
+    if chat_completion is None:
+        from app.services.llm_service import chat_completion
+    from app.config import LLM_CONFIG
+    config = {**LLM_CONFIG.get('PIPELINE', {}), **(config or {})}
+    batch_size = config.get('BATCH_SIZE', 20)
+    insert_chunk = config.get('INSERT_CHUNK', 10)
+    max_rounds = config.get('MAX_ROUNDS', 10)
+    max_idle_rounds = config.get('MAX_IDLE_ROUNDS', 2)
+    avoid_limit = config.get('AVOID_LIMIT', 50)
+
+    totals = {'inserted': 0, 'duplicates': 0, 'invalid': 0, 'malformed': 0, 'rounds': 0}
+    seen_questions: List[str] = []
+    idle_rounds = 0
+
+    def flush(pending, round_no):
+        ingested = bulk_ingest(session, pending)
+        session.commit()
+        totals['inserted'] += len(ingested['inserted'])
+        totals['duplicates'] += len(ingested['duplicates'])
+        seen_questions.extend(item['question'] for item in pending)
+        pending.clear()
+        return {
+            'round': round_no,
+            'inserted': len(ingested['inserted']),
+            'duplicates': len(ingested['duplicates']),
+            'total': totals['inserted'],
+            'entries': [serialize_row(row) for row in ingested['inserted']]
+        }
+
+    try:
+        while totals['inserted'] < target and totals['rounds'] < max_rounds and idle_rounds < max_idle_rounds:
+            totals['rounds'] += 1
+            round_no = totals['rounds']
+            inserted_before = totals['inserted']
+            # 多要一些以抵消重复和格式错误
+            count = min(batch_size, max(1, int((target - totals['inserted']) * 1.2) + 1))
+            messages = build_messages(category, count, seen_questions[-avoid_limit:])
+
+            parser = JSONObjectStream()
+            pending = []
+            chunks = chat_completion(messages, model=model, temperature=config.get('TEMPERATURE', 0.9),
+                                     max_tokens=config.get('MAX_TOKENS', 4000), stream=True, cache=False)
+            try:
+                for chunk in chunks:
+                    for obj in parser.feed(chunk.get('content') or ''):
+                        item, reason = to_item(obj, category)
+                        if reason:
+                            totals['invalid'] += 1
+                            continue
+                        pending.append(item)
+                        # 写入块不超过剩余需要的条目数，避免超出目标
+                        if len(pending) >= min(insert_chunk, target - totals['inserted']):
+                            yield flush(pending, round_no)
+                            if totals['inserted'] >= target:
+                                break
+                    if totals['inserted'] >= target:
+                        break
+            finally:
+                # 达到目标后提前结束流式响应，不再为多余的输出付费
+                if hasattr(chunks, 'close'):
+                    chunks.close()
+
+            if pending and totals['inserted'] < target:
+                yield flush(pending, round_no)
+            totals['malformed'] += parser.malformed
+            idle_rounds = idle_rounds + 1 if totals['inserted'] == inserted_before else 0
+    finally:
+        if totals['inserted']:
+            # 将新条目同步到随机采样索引
+            from app.services.sampling_index import sampling_index
+            sampling_index.refresh(session, force=True)
+
+    logger.info(f"生成流水线完成: {category} 目标 {target}，新增 {totals['inserted']}，"
+                f"重复 {totals['duplicates']}，无效 {totals['invalid'] + totals['malformed']}，{totals['rounds']} 轮")
+    yield {'done': True, 'category': category, 'target': target,
+           'reached': totals['inserted'] >= target, **totals}
@@ -0,0 +1,315 @@
+"""
+LLM服务路由模块 - 在一组等价模型之间按延迟和健康状况选择服务
+
+- 每个服务记录最近若干次调用的延迟和成败，计算 p50/p95 延迟和错误率
+- 请求发往当前最快的健康服务；超过延迟阈值仍未返回时向第二个服务发出对冲请求，取先成功的结果
+- 连续失败达到阈值的服务熔断一段时间，冷却后放行一个探测请求，成功则恢复
+- 只有连接错误、超时、429和5xx计为服务失败；请求本身有误的4xx不计入健康统计也不切换服务，
+  等其他进行中的请求结束后（仍可能成功）返回给调用方
+"""
+
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, List, Optional
+
+from app.utils.logger import get_logger
+
+logger = get_logger('llm_router')
+
+# 使用路由模式的模型名前缀，如 "group:default"
+GROUP_PREFIX = "group:"
+
+
+def is_group_model(model: str) -> bool:
+    """判断模型名是否指向一个等价模型组"""
+    return model.startswith(GROUP_PREFIX)
+
+
+def is_client_error(error: Exception) -> bool:
+    """错误是否由调用方的请求本身引起（而不是服务故障）"""
+    from app.services.llm_service import APIError
+    return isinstance(error, APIError) and error.is_client_error
+
+
+class ProviderHealth:
+    """单个服务的滚动延迟、错误率统计和熔断状态"""
+
+    def __init__(self, window: int = 30, failure_threshold: int = 5, open_seconds: float = 30.0):
+        """
+        Args:
+            window: 统计最近多少次调用
+            failure_threshold: 连续失败多少次后熔断
+            open_seconds: 熔断持续时间（秒），之后放行一个探测请求
+        """
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self._latencies = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _percentile(self, fraction: float) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    @property
+    def p50(self) -> Optional[float]:
+        with self._lock:
+            return self._percentile(0.5)
+
+    @property
+    def p95(self) -> Optional[float]:
+        with self._lock:
+            return self._percentile(0.95)
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._outcomes:
+                return 0.0
+            return 1 - sum(self._outcomes) / len(self._outcomes)
+
+    @property
+    def state(self) -> str:
+        """熔断状态：closed 正常，open 熔断中，half_open 冷却结束等待探测"""
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                return "open"
+            return "half_open"
+
+    def acquire(self) -> bool:
+        """
+        判断是否可以向该服务发送请求
+
+        熔断冷却结束后只放行一个探测请求，其结果决定恢复还是继续熔断
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.open_seconds or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def release(self):
+        """结束一次不计入统计的调用（请求本身有误），释放探测名额"""
+        with self._lock:
+            self._probing = False
+
+    def record(self, latency: float, success: bool):
+        """记录一次调用的延迟和结果"""
+        with self._lock:
+            self._outcomes.append(1 if success else 0)
+            self._probing = False
+            if success:
+                self._latencies.append(latency)
+                self._consecutive_failures = 0
+                self._opened_at = None
+                return
+            self._consecutive_failures += 1
+            if self._opened_at is not None or self._consecutive_failures >= self.failure_threshold:
+                # 探测失败或连续失败达到阈值时（重新）熔断
+                self._opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """获取统计快照"""
+        p50, p95 = self.p50, self.p95
+        with self._lock:
+            samples = len(self._outcomes)
+            consecutive_failures = self._consecutive_failures
+        return {
+            "state": self.state,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "samples": samples,
+            "consecutive_failures": consecutive_failures,
+        }
+
+
+class LLMRouter:
+    """在等价模型组内按延迟和健康状况路由请求，并对慢请求发出对冲请求"""
+
+    def __init__(self, service, config: Dict[str, Any]):
+        """
+        Args:
+            service: LLMService 实例，用于实际调用各服务
+            config: 路由配置，键同 LLM_CONFIG['ROUTING']
+        """
+        self.service = service
+        self.groups: Dict[str, List[str]] = config.get("GROUPS", {})
+        self.hedge = config.get("HEDGE", True)
+        self.hedge_after = config.get("HEDGE_AFTER")
+        self.hedge_min = config.get("HEDGE_MIN", 1.0)
+        self._health_args = {
+            "window": config.get("WINDOW", 30),
+            "failure_threshold": config.get("FAILURE_THRESHOLD", 5),
+            "open_seconds": config.get("OPEN_SECONDS", 30.0),
+        }
+        self._health: Dict[str, ProviderHealth] = {}
+        self._stats = {"requests": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=config.get("MAX_WORKERS", 16),
+                                            thread_name_prefix="llm-router")
+
+    def health(self, provider: str) -> ProviderHealth:
+        """获取服务的健康统计，按需创建"""
+        with self._lock:
+            health = self._health.get(provider)
+            if health is None:
+                health = self._health[provider] = ProviderHealth(**self._health_args)
+            return health
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def candidates(self, group: str) -> List[str]:
+        """
+        返回组内可用模型，按优先级排序
+
+        未熔断的服务在前，其中按 p50 延迟升序（没有样本的服务优先，以便获得样本），
+        延迟相同时保持配置顺序
+        """
+        if group not in self.groups:
+            from app.services.llm_service import ModelNotSupportedError
+            raise ModelNotSupportedError(f"未配置的模型组: {group}")
+
+        ranked = []
+        for order, model in enumerate(self.groups[group]):
+            provider = self.service.service_for_model(model)
+            if not self.service.api_keys.get(provider):
+                continue
+            health = self.health(provider)
+            p50 = health.p50
+            ranked.append(((health.state == "open", p50 is not None, p50 or 0.0, order), model))
+        return [model for _, model in sorted(ranked)]
+
+    def _hedge_delay(self, provider: str) -> float:
+        """主请求等待多久后发出对冲请求：固定阈值，或主服务的 p95 延迟（不低于 HEDGE_MIN）"""
+        if self.hedge_after is not None:
+            return self.hedge_after
+        p95 = self.health(provider).p95
+        return max(self.hedge_min, p95) if p95 is not None else self.hedge_min
+
+    def _call(self, model: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        """调用单个模型并记录延迟和结果"""
+        health = self.health(self.service.service_for_model(model))
+        start = time.perf_counter()
+        try:
+            result = self.service._limited_chat_completion({**request, "model": model})
+        except Exception as e:
+            if is_client_error(e):
+                health.release()
+            else:
+                health.record(time.perf_counter() - start, False)
+            raise
+        health.record(time.perf_counter() - start, True)
+        return result
+
+    def _next_model(self, models: List[str]) -> Optional[str]:
+        """从候选列表中取出下一个允许发送请求的模型"""
+        while models:
+            model = models.pop(0)
+            if self.health(self.service.service_for_model(model)).acquire():
+                return model
+        return None
+
+    def chat_completion(self, group: str, stream: bool = False, **request) -> Any:
+        """
+        在模型组内完成一次聊天请求
+
+        Args:
+            group: 模型组名
+            stream: 是否流式响应；流式请求只选择最快的健康服务，不做对冲
+            request: chat_completion 的其余参数
+
+        Returns:
+            与 LLMService.chat_completion 相同
+        """
+        self._count("requests")
+        models = self.candidates(group)
+        model = self._next_model(models)
+        if model is None:
+            from app.services.llm_service import APIError
+            raise APIError(f"模型组 {group} 中没有可用的服务")
+
+        if stream:
+            health = self.health(self.service.service_for_model(model))
+            start = time.perf_counter()
+            try:
+                result = self.service.chat_completion(model=model, stream=True, **request)
+            except Exception as e:
+                if is_client_error(e):
+                    health.release()
+                else:
+                    health.record(time.perf_counter() - start, False)
+                raise
+            # 以开始返回的时间近似延迟
+            health.record(time.perf_counter() - start, True)
+            return result
+
+        pending = {self._executor.submit(self._call, model, request): model}
+        hedge_at = time.monotonic() + self._hedge_delay(self.service.service_for_model(model))
+        last_error = None
+        client_error = None
+
+        while pending:
+            timeout = None
+            if self.hedge and models and len(pending) == 1 and client_error is None:
+                timeout = max(0.0, hedge_at - time.monotonic())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # 主请求超过阈值仍未返回，向下一个服务发出对冲请求
+                hedge_model = self._next_model(models)
+                if hedge_model is not None:
+                    self._count("hedged")
+                    logger.info(f"{pending[next(iter(pending))]} 超过对冲阈值，向 {hedge_model} 发出对冲请求")
+                    pending[self._executor.submit(self._call, hedge_model, request)] = hedge_model
+                continue
+
+            for future in done:
+                finished_model = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if is_client_error(e):
+                        # 请求本身有误，换服务也不会成功；不再对冲和转移，
+                        # 但仍等待其他进行中的请求（对冲请求可能先于主请求被拒绝）
+                        client_error = client_error or e
+                        continue
+                    last_error = e
+                    logger.warning(f"{finished_model} 调用失败: {str(e)}")
+                    continue
+                if finished_model != model:
+                    self._count("hedge_wins")
+                return result
+
+            # 全部进行中的请求都已失败时立即转向下一个服务
+            if not pending:
+                if client_error is not None:
+                    raise client_error
+                fallback = self._next_model(models)
+                if fallback is not None:
+                    self._count("failovers")
+                    pending[self._executor.submit(self._call, fallback, request)] = fallback
+                    hedge_at = time.monotonic() + self._hedge_delay(self.service.service_for_model(fallback))
+
+        raise last_error
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取路由计数和各服务的健康统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            providers = dict(self._health)
+        stats["providers"] = {provider: health.snapshot() for provider, health in providers.items()}
+        return stats
@@ -9,14 +9,64 @@ LLM服务模块 - 提供对多种大型语言模型的访问
 
 import os
 import json
+import time
+import random
+import sqlite3
+import hashlib
+import threading
 import requests
-from typing import Dict, Any, Optional, List, Union
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from typing import Dict, Any, Optional, List, Union, Iterator, Tuple
+from app.services.llm_router import LLMRouter, GROUP_PREFIX, is_group_model
+from app.services.rate_limiter import rate_limiter, RateLimitExceeded, validate_limits
 
 # 默认参数
 DEFAULT_TEMPERATURE = 0.7
 DEFAULT_MAX_TOKENS = 1000
 DEFAULT_TOP_P = 0.9
 
+# 默认API端点
+DEFAULT_API_URLS = {
+    "deepseek": "https://api.deepseek.com/v1/chat/completions",
+    "openrouter": "https://openrouter.ai/api/v1/chat/completions",
+    "qianwen": "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation",
+}
+
+# 默认HTTP参数
+DEFAULT_HTTP_CONFIG = {
+    "POOL_SIZE": 20,
+    "CONNECT_TIMEOUT": 5,
+    "READ_TIMEOUT": 120,
+    "MAX_RETRIES": 3,
+    "BACKOFF_BASE": 0.5,
+    "BACKOFF_MAX": 10,
+}
+
+# 需要重试的HTTP状态码：服务明确表示未处理该请求（其余5xx时生成可能已执行，重发会重复计费）
+RETRY_STATUS_CODES = {429, 503}
+# 虽为4xx但说明服务或账号不可用（而不是请求本身有误）的状态码
+PROVIDER_CLIENT_STATUS_CODES = {401, 403, 408, 429}
+
+# 默认批量请求参数
+DEFAULT_BATCH_CONFIG = {
+    "MAX_WORKERS": 40,
+    "MAX_PROMPTS": 50,
+    "PROVIDER_CONCURRENCY": {"deepseek": 20, "openrouter": 20, "qianwen": 10},
+}
+
+# 默认响应缓存参数
+DEFAULT_CACHE_CONFIG = {
+    "ENABLED": True,
+    "MEMORY_ENTRIES": 256,
+    "DB_PATH": os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                            "data", "llm_cache.db"),
+    "TTL": 24 * 3600,
+    "MAX_DB_BYTES": 50 * 1024 * 1024,
+}
+
 class LLMServiceError(Exception):
     """LLM服务错误基类"""
     pass
@@ -26,25 +76,283 @@ class AuthenticationError(LLMServiceError):
     pass
 
 class APIError(LLMServiceError):
-    """API调用错误"""
-    pass
+    """API调用错误，status_code 为上游返回的HTTP状态码（如有）"""
+    
+    def __init__(self, message: str = "", status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+    
+    @property
+    def is_client_error(self) -> bool:
+        """上游因请求本身（参数错误、上下文过长等）拒绝，换一个服务重试也不会成功，与服务健康无关"""
+        return self.status_code is not None and 400 <= self.status_code < 500 \
+            and self.status_code not in PROVIDER_CLIENT_STATUS_CODES
+
+def _response_status(error: requests.exceptions.RequestException) -> Optional[int]:
+    """请求异常对应的HTTP状态码，连接错误和超时为None"""
+    return error.response.status_code if error.response is not None else None
 
 class ModelNotSupportedError(LLMServiceError):
     """模型不支持错误"""
     pass
 
+class _InflightCall:
+    """正在进行中的上游请求，供相同请求的并发调用者等待其结果"""
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+    
+    def wait(self) -> str:
+        self.event.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class LLMResponseCache:
+    """
+    LLM响应缓存
+    
+    两级缓存：进程内LRU + 带TTL和容量上限的SQLite持久层。
+    相同请求并发到达时只发起一次上游调用，其余调用者等待并共享结果。
+    """
+    
+    def __init__(self, memory_entries: int = 256, db_path: Optional[str] = None,
+                 ttl: float = 24 * 3600, max_db_bytes: int = 50 * 1024 * 1024):
+        """
+        Args:
+            memory_entries: 内存LRU的最大条目数
+            db_path: SQLite缓存文件路径，为空时只使用内存层
+            ttl: 缓存有效期（秒）
+            max_db_bytes: SQLite层缓存内容的总字节数上限，超出时淘汰最久未访问的条目
+        """
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self.max_db_bytes = max_db_bytes
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._inflight: Dict[str, _InflightCall] = {}
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "coalesced": 0, "stores": 0, "evictions": 0}
+        
+        self._db = None
+        if db_path:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed_at ON llm_cache (accessed_at)")
+    
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], temperature: float,
+                 max_tokens: int, top_p: float) -> str:
+        """根据请求参数的规范化JSON生成缓存键"""
+        canonical = json.dumps(
+            {"model": model, "messages": messages, "temperature": temperature,
+             "max_tokens": max_tokens, "top_p": top_p},
+            sort_keys=True, ensure_ascii=False, separators=(",", ":")
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存，未命中或已过期时返回None"""
+        value, source = self._lookup(key)
+        self._count(source)
+        return json.loads(value) if value is not None else None
+    
+    def _lookup(self, key: str) -> Tuple[Optional[str], str]:
+        """
+        依次查找内存和磁盘缓存，不更新命中计数
+        
+        Returns:
+            (缓存的JSON文本或None, 计数名 'memory_hits' | 'db_hits' | 'misses')
+        """
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                if cached[1] > now:
+                    self._memory.move_to_end(key)
+                    return cached[0], "memory_hits"
+                del self._memory[key]
+        
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            if row is not None:
+                self._remember(key, row[0], row[1])
+                return row[0], "db_hits"
+        
+        return None, "misses"
+    
+    def _remember(self, key: str, value: str, expires_at: float):
+        """写入内存LRU"""
+        with self._lock:
+            self._memory[key] = (value, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+    
+    def set(self, key: str, result: Dict[str, Any]):
+        """写入两级缓存"""
+        value = json.dumps(result, ensure_ascii=False)
+        now = time.time()
+        expires_at = now + self.ttl
+        self._remember(key, value, expires_at)
+        self._count("stores")
+        
+        if self._db is None:
+            return
+        size = len(value.encode("utf-8"))
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, expires_at, now)
+            )
+            evicted = self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,)).rowcount
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            # 超出容量时按最久未访问的顺序淘汰
+            while total > self.max_db_bytes:
+                row = self._db.execute(
+                    "SELECT key, size FROM llm_cache ORDER BY accessed_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    break
+                self._db.execute("DELETE FROM llm_cache WHERE key = ?", (row[0],))
+                total -= row[1]
+                evicted += 1
+        if evicted:
+            self._count("evictions", evicted)
+    
+    def get_or_compute(self, key: str, compute) -> Dict[str, Any]:
+        """
+        读取缓存，未命中时调用compute获取结果并写入缓存
+        
+        相同key的并发调用只有第一个会执行compute，其余等待其结果
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InflightCall()
+            else:
+                self._stats["coalesced"] += 1
+        
+        if not leader:
+            return json.loads(call.wait())
+        
+        try:
+            # 上一个leader可能在本次 get() 之后、取得锁之前写入了缓存并退出，再查一次避免重复的上游请求；
+            # 本次调用已在 get() 中计数，这里不再计数
+            cached, _ = self._lookup(key)
+            if cached is not None:
+                call.result = cached
+                return json.loads(cached)
+            result = compute()
+            self.set(key, result)
+            call.result = json.dumps(result, ensure_ascii=False)
+            return result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.event.set()
+    
+    def get_stats(self) -> Dict[str, int]:
+        """获取命中、未命中、合并请求和淘汰计数"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        if self._db is not None:
+            with self._db_lock:
+                stats["db_entries"], stats["db_bytes"] = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+                ).fetchone()
+        return stats
+
 class LLMService:
     """LLM服务类，提供对多种大型语言模型的统一访问接口"""
     
-    def __init__(self, api_keys: Dict[str, str] = None):
+    def __init__(self,
+                 api_keys: Dict[str, str] = None,
+                 api_urls: Dict[str, str] = None,
+                 http_config: Dict[str, Any] = None,
+                 cache_config: Dict[str, Any] = None,
+                 provider_limits: Dict[str, Optional[Dict[str, float]]] = None):
         """
         初始化LLM服务
         
         Args:
             api_keys: 包含各服务API密钥的字典，格式为 {'service_name': 'api_key'}
+            api_urls: 覆盖各服务API端点的字典，格式为 {'service_name': 'url'}
+            http_config: 覆盖连接池、超时和重试参数的字典，键同 LLM_CONFIG['HTTP']
+            cache_config: 覆盖响应缓存参数的字典，键同 LLM_CONFIG['CACHE']
+            provider_limits: 覆盖各服务出站限流的字典，键同 RATE_LIMIT_CONFIG['PROVIDER_LIMITS']，值为None时不限流
         """
         from app.config import LLM_CONFIG
         
+        # API端点与HTTP参数：默认值 < 配置文件 < 传入参数
+        self.api_urls = {**DEFAULT_API_URLS, **LLM_CONFIG.get("API_URLS", {}), **(api_urls or {})}
+        self.http_config = {**DEFAULT_HTTP_CONFIG, **LLM_CONFIG.get("HTTP", {}), **(http_config or {})}
+        
+        # 每个服务一个带连接池的长连接会话，按需创建
+        self._sessions: Dict[str, requests.Session] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        
+        # 批量请求：每个服务一个大小等于其并发上限的线程池，等待中的请求只占用该服务自己的队列；
+        # 模型组请求由路由器选择服务，使用单独的线程池。信号量同时限制路由器发往各服务的请求
+        self.batch_config = {**DEFAULT_BATCH_CONFIG, **LLM_CONFIG.get("BATCH", {})}
+        self._batch_executor: Optional[ThreadPoolExecutor] = None
+        self._provider_executors: Dict[str, ThreadPoolExecutor] = {}
+        self._provider_semaphores = {
+            service: threading.BoundedSemaphore(limit)
+            for service, limit in self.batch_config["PROVIDER_CONCURRENCY"].items()
+        }
+        
+        # 出站限流：各服务的令牌桶由默认限流器保存，可在多个实例和进程间共享
+        self.rate_limiter = rate_limiter
+        self.provider_limits = provider_limits or {}
+        validate_limits(self.provider_limits)
+        
+        # 等价模型组路由（模型名为 group:xxx 时使用），按需创建
+        self.routing_config = LLM_CONFIG.get("ROUTING", {})
+        self._router = None
+        
+        # 响应缓存
+        cache_config = {**DEFAULT_CACHE_CONFIG, **LLM_CONFIG.get("CACHE", {}), **(cache_config or {})}
+        self.cache = None
+        if cache_config["ENABLED"]:
+            self.cache = LLMResponseCache(
+                memory_entries=cache_config["MEMORY_ENTRIES"],
+                db_path=cache_config["DB_PATH"],
+                ttl=cache_config["TTL"],
+                max_db_bytes=cache_config["MAX_DB_BYTES"]
+            )
+        
         # 优先使用传入的API密钥，其次使用配置文件中的API密钥，最后使用环境变量
         self.api_keys = api_keys or {}
         
@@ -64,6 +372,119 @@ class LLMService:
         if 'qianwen' not in self.api_keys and os.environ.get('QIANWEN_API_KEY'):
             self.api_keys['qianwen'] = os.environ.get('QIANWEN_API_KEY')
     
+    def _get_session(self, service: str) -> requests.Session:
+        """获取服务的长连接会话（连接池按 POOL_SIZE 复用连接）"""
+        session = self._sessions.get(service)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(service)
+                if session is None:
+                    pool_size = self.http_config["POOL_SIZE"]
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+                    session = requests.Session()
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._sessions[service] = session
+                    self._stats[service] = {"requests": 0, "retries": 0, "errors": 0, "throttled": 0}
+        return session
+    
+    def _count(self, service: str, name: str):
+        """累加服务的统计计数"""
+        with self._lock:
+            self._stats[service][name] += 1
+    
+    def _backoff_delay(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """计算第attempt次重试前的等待时间：优先使用Retry-After，否则为带完全抖动的指数退避"""
+        backoff_max = self.http_config["BACKOFF_MAX"]
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), backoff_max)
+        return random.uniform(0, min(backoff_max, self.http_config["BACKOFF_BASE"] * (2 ** attempt)))
+    
+    @staticmethod
+    def _failed_before_send(error: requests.exceptions.RequestException) -> bool:
+        """判断请求异常是否发生在请求发出之前（连接超时、DNS解析失败、连接被拒绝），只有这类错误可以安全重发"""
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        if not isinstance(error, requests.exceptions.ConnectionError):
+            return False
+        reason = error.args[0] if error.args else None
+        if isinstance(reason, MaxRetryError):
+            reason = reason.reason
+        return isinstance(reason, NewConnectionError)
+    
+    def _acquire_provider_token(self, service: str):
+        """发出请求前获取服务的出站令牌，等待超过上限时抛出APIError"""
+        if self.rate_limiter is None:
+            return
+        limit = self.provider_limits.get(service, self.rate_limiter.provider_limits.get(service))
+        if not limit:
+            return
+        try:
+            self.rate_limiter.acquire_provider(service, limit)
+        except RateLimitExceeded as e:
+            self._count(service, "throttled")
+            raise APIError(f"{service} 请求过于频繁，请在 {e.retry_after:.1f} 秒后重试", status_code=429)
+    
+    def _post(self, service: str, api_url: str, payload: Dict[str, Any], headers: Dict[str, str],
+              stream: bool = False) -> requests.Response:
+        """
+        通过服务的长连接会话发送POST请求，按退避策略重试
+        
+        生成请求不是幂等的，只重试服务确定没有处理的情况：429/503响应和请求发出前的连接错误。
+        读取超时和请求发出后断开的连接直接抛给调用方，避免重复生成和重复计费。
+        
+        Returns:
+            状态码为2xx的响应
+            
+        Raises:
+            requests.exceptions.RequestException: 不可重试的错误，或重试耗尽后仍失败
+        """
+        session = self._get_session(service)
+        timeout = (self.http_config["CONNECT_TIMEOUT"], self.http_config["READ_TIMEOUT"])
+        max_retries = self.http_config["MAX_RETRIES"]
+        
+        attempt = 0
+        while True:
+            self._acquire_provider_token(service)
+            self._count(service, "requests")
+            response = None
+            try:
+                response = session.post(api_url, json=payload, headers=headers, timeout=timeout, stream=stream)
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= max_retries:
+                    response.raise_for_status()  # 如果响应状态码不是2xx，抛出异常
+                    return response
+                response.close()
+            except requests.exceptions.RequestException as e:
+                if response is not None or not self._failed_before_send(e) or attempt >= max_retries:
+                    self._count(service, "errors")
+                    raise
+            
+            time.sleep(self._backoff_delay(attempt, response))
+            attempt += 1
+            self._count(service, "retries")
+    
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取各服务的请求、重试和连接池统计
+        
+        Returns:
+            {'service_name': {'requests', 'retries', 'errors', 'throttled', 'pool': {'connections', 'pooled_requests'}}}
+        """
+        stats = {}
+        with self._lock:
+            for service, session in self._sessions.items():
+                pool_stats = {"connections": 0, "pooled_requests": 0}
+                for adapter in set(session.adapters.values()):
+                    for key in adapter.poolmanager.pools.keys():
+                        pool = adapter.poolmanager.pools[key]
+                        # 已建立的连接总数和经由连接池发出的请求数
+                        pool_stats["connections"] += pool.num_connections
+                        pool_stats["pooled_requests"] += pool.num_requests
+                stats[service] = {**self._stats[service], "pool": pool_stats}
+        return stats
+    
     def _check_api_key(self, service: str) -> str:
         """检查API密钥是否存在"""
         if service not in self.api_keys or not self.api_keys[service]:
@@ -76,7 +497,8 @@ class LLMService:
                         temperature: float = DEFAULT_TEMPERATURE,
                         max_tokens: int = DEFAULT_MAX_TOKENS,
                         top_p: float = DEFAULT_TOP_P,
-                        stream: bool = False) -> Dict[str, Any]:
+                        stream: bool = False,
+                        cache: bool = True) -> Dict[str, Any]:
         """
         统一的聊天完成接口
         
@@ -87,21 +509,187 @@ class LLMService:
             max_tokens: 最大生成token数
             top_p: top-p采样参数
             stream: 是否使用流式响应
+            cache: 是否使用响应缓存
             
         Returns:
-            包含生成内容的字典
+            包含生成内容的字典；stream=True 时返回增量片段的迭代器，
+            各服务的片段统一为 {"content": "...", "finish_reason": None 或 "stop" 等, "model": "..."}
         """
-        # 根据模型名称确定使用哪个服务
+        if is_group_model(model):
+            return self.router.chat_completion(
+                model[len(GROUP_PREFIX):], messages=messages, temperature=temperature,
+                max_tokens=max_tokens, top_p=top_p, stream=stream, cache=cache
+            )
+        
+        if not cache or self.cache is None:
+            return self._dispatch_chat_completion(messages, model, temperature, max_tokens, top_p, stream)
+        
+        key = self.cache.make_key(model, messages, temperature, max_tokens, top_p)
+        if stream:
+            # 流式请求：命中时回放缓存内容，未命中时边转发边收集，完整结束后写入缓存
+            cached = self.cache.get(key)
+            if cached is not None:
+                return self._replay_stream(cached, model)
+            chunks = self._dispatch_chat_completion(messages, model, temperature, max_tokens, top_p, True)
+            return self._record_stream(key, chunks, model)
+        
+        return self.cache.get_or_compute(
+            key,
+            lambda: self._dispatch_chat_completion(messages, model, temperature, max_tokens, top_p, False)
+        )
+    
+    @staticmethod
+    def _replay_stream(result: Dict[str, Any], model: str) -> Iterator[Dict[str, Any]]:
+        """把缓存的完整响应作为单个增量片段回放"""
+        choice = (result.get("choices") or [{}])[0]
+        content = (choice.get("message") or {}).get("content") or ""
+        yield {"content": content, "finish_reason": choice.get("finish_reason", "stop"),
+               "model": result.get("model", model)}
+    
+    def _record_stream(self, key: str, chunks: Iterator[Dict[str, Any]], model: str) -> Iterator[Dict[str, Any]]:
+        """转发增量片段，流正常结束后把拼接的完整内容写入缓存"""
+        parts = []
+        finish_reason = None
+        response_model = model
+        try:
+            for chunk in chunks:
+                parts.append(chunk.get("content") or "")
+                finish_reason = chunk.get("finish_reason") or finish_reason
+                response_model = chunk.get("model") or response_model
+                yield chunk
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+        
+        if finish_reason:
+            self.cache.set(key, {
+                "choices": [{"message": {"role": "assistant", "content": "".join(parts)},
+                             "finish_reason": finish_reason}],
+                "model": response_model
+            })
+    
+    @staticmethod
+    def service_for_model(model: str) -> str:
+        """根据模型名称返回对应的服务名"""
         if model.startswith("deepseek"):
+            return "deepseek"
+        if model.startswith("openrouter:"):
+            return "openrouter"
+        if model.startswith("qianwen"):
+            return "qianwen"
+        raise ModelNotSupportedError(f"不支持的模型: {model}")
+    
+    def _get_batch_executor(self, model: str) -> ThreadPoolExecutor:
+        """
+        获取执行该模型批量请求的线程池，按需创建
+        
+        单个服务的请求只进入该服务的线程池（大小等于其并发上限），某个服务排队或变慢时
+        不会占用其他服务的线程；模型组和未配置并发上限的服务使用共享线程池
+        """
+        service = None if is_group_model(model) else self.service_for_model(model)
+        limit = self.batch_config["PROVIDER_CONCURRENCY"].get(service) if service else None
+        if not limit:
+            if self._batch_executor is None:
+                with self._lock:
+                    if self._batch_executor is None:
+                        self._batch_executor = ThreadPoolExecutor(
+                            max_workers=self.batch_config["MAX_WORKERS"], thread_name_prefix="llm-batch"
+                        )
+            return self._batch_executor
+        executor = self._provider_executors.get(service)
+        if executor is None:
+            with self._lock:
+                executor = self._provider_executors.get(service)
+                if executor is None:
+                    executor = self._provider_executors[service] = ThreadPoolExecutor(
+                        max_workers=limit, thread_name_prefix=f"llm-batch-{service}"
+                    )
+        return executor
+    
+    @property
+    def router(self) -> LLMRouter:
+        """等价模型组路由器，按需创建"""
+        if self._router is None:
+            with self._lock:
+                if self._router is None:
+                    self._router = LLMRouter(self, self.routing_config)
+        return self._router
+    
+    def _limited_chat_completion(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """在服务的并发限制内执行一次非流式聊天完成"""
+        model = request.get("model", "deepseek-chat")
+        if is_group_model(model):
+            # 模型组由路由器对实际调用的服务分别限制并发
+            return self.chat_completion(**request)
+        service = self.service_for_model(model)
+        semaphore = self._provider_semaphores.get(service)
+        if semaphore is None:
+            return self.chat_completion(**request)
+        with semaphore:
+            return self.chat_completion(**request)
+    
+    def iter_batch_completion(self, requests_list: List[Dict[str, Any]]) -> Iterator[Tuple[int, Any, Optional[Exception]]]:
+        """
+        并发执行一批聊天完成请求，按完成顺序产出结果
+        
+        Args:
+            requests_list: 请求列表，每个元素为 chat_completion 的关键字参数（不含 stream）
+            
+        Returns:
+            (序号, 结果, 异常) 的迭代器，成功时异常为None，失败时结果为None；
+            迭代器关闭时取消尚未开始的请求
+        """
+        futures = {}
+        for index, request in enumerate(requests_list):
+            try:
+                executor = self._get_batch_executor(request.get("model", "deepseek-chat"))
+            except ModelNotSupportedError as e:
+                future = Future()
+                future.set_exception(e)
+            else:
+                future = executor.submit(self._limited_chat_completion, request)
+            futures[future] = index
+        try:
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    yield index, future.result(), None
+                except Exception as e:
+                    yield index, None, e
+        finally:
+            for future in futures:
+                future.cancel()
+    
+    def batch_chat_completion(self, requests_list: List[Dict[str, Any]]) -> List[Tuple[Any, Optional[Exception]]]:
+        """
+        并发执行一批聊天完成请求，总耗时约等于其中最慢的一次调用
+        
+        Returns:
+            与请求顺序一致的 (结果, 异常) 列表
+        """
+        results: List[Tuple[Any, Optional[Exception]]] = [(None, None)] * len(requests_list)
+        for index, result, error in self.iter_batch_completion(requests_list):
+            results[index] = (result, error)
+        return results
+    
+    def _dispatch_chat_completion(self,
+                                  messages: List[Dict[str, str]],
+                                  model: str,
+                                  temperature: float,
+                                  max_tokens: int,
+                                  top_p: float,
+                                  stream: bool) -> Dict[str, Any]:
+        """根据模型名称把请求分派给对应的服务"""
+        # 根据模型名称确定使用哪个服务
+        service = self.service_for_model(model)
+        if service == "deepseek":
             return self._deepseek_chat_completion(messages, model, temperature, max_tokens, top_p, stream)
-        elif model.startswith("openrouter:"):
+        elif service == "openrouter":
             # 从openrouter:model-name格式中提取实际模型名称
             actual_model = model.split(":", 1)[1]
             return self._openrouter_chat_completion(messages, actual_model, temperature, max_tokens, top_p, stream)
-        elif model.startswith("qianwen"):
-            return self._qianwen_chat_completion(messages, model, temperature, max_tokens, top_p, stream)
         else:
-            raise ModelNotSupportedError(f"不支持的模型: {model}")
+            return self._qianwen_chat_completion(messages, model, temperature, max_tokens, top_p, stream)
     
     def _deepseek_chat_completion(self, 
                                  messages: List[Dict[str, str]], 
@@ -122,12 +710,12 @@ class LLMService:
             stream: 是否使用流式响应
             
         Returns:
-            包含生成内容的字典
+            包含生成内容的字典，stream=True 时返回增量片段的迭代器
         """
         api_key = self._check_api_key('deepseek')
         
         # DeepSeek API端点
-        api_url = "https://api.deepseek.com/v1/chat/completions"
+        api_url = self.api_urls["deepseek"]
         
         # 准备请求数据
         payload = {
@@ -146,11 +734,12 @@ class LLMService:
         }
         
         try:
-            response = requests.post(api_url, json=payload, headers=headers)
-            response.raise_for_status()  # 如果响应状态码不是200，抛出异常
+            response = self._post('deepseek', api_url, payload, headers, stream=stream)
+            if stream:
+                return self._iter_openai_stream(response, model)
             return response.json()
         except requests.exceptions.RequestException as e:
-            raise APIError(f"DeepSeek API调用失败: {str(e)}")
+            raise APIError(f"DeepSeek API调用失败: {str(e)}", status_code=_response_status(e))
     
     def _openrouter_chat_completion(self, 
                                    messages: List[Dict[str, str]], 
@@ -171,12 +760,12 @@ class LLMService:
             stream: 是否使用流式响应
             
         Returns:
-            包含生成内容的字典
+            包含生成内容的字典，stream=True 时返回增量片段的迭代器
         """
         api_key = self._check_api_key('openrouter')
         
         # OpenRouter API端点
-        api_url = "https://openrouter.ai/api/v1/chat/completions"
+        api_url = self.api_urls["openrouter"]
         
         # 准备请求数据
         payload = {
@@ -197,11 +786,12 @@ class LLMService:
         }
         
         try:
-            response = requests.post(api_url, json=payload, headers=headers)
-            response.raise_for_status()
+            response = self._post('openrouter', api_url, payload, headers, stream=stream)
+            if stream:
+                return self._iter_openai_stream(response, model)
             return response.json()
         except requests.exceptions.RequestException as e:
-            raise APIError(f"OpenRouter API调用失败: {str(e)}")
+            raise APIError(f"OpenRouter API调用失败: {str(e)}", status_code=_response_status(e))
     
     def _qianwen_chat_completion(self, 
                                 messages: List[Dict[str, str]], 
@@ -222,12 +812,12 @@ class LLMService:
             stream: 是否使用流式响应
             
         Returns:
-            包含生成内容的字典
+            包含生成内容的字典，stream=True 时返回增量片段的迭代器
         """
         api_key = self._check_api_key('qianwen')
         
         # 千问API端点
-        api_url = "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation"
+        api_url = self.api_urls["qianwen"]
         
         # 千问API使用不同的模型名称映射
         model_mapping = {
@@ -259,9 +849,15 @@ class LLMService:
             "Authorization": f"Bearer {api_key}"
         }
         
+        if stream:
+            # 千问通过请求头开启SSE，incremental_output 让每个事件只包含新增内容
+            headers["X-DashScope-SSE"] = "enable"
+            payload["parameters"]["incremental_output"] = True
+        
         try:
-            response = requests.post(api_url, json=payload, headers=headers)
-            response.raise_for_status()
+            response = self._post('qianwen', api_url, payload, headers, stream=stream)
+            if stream:
+                return self._iter_qianwen_stream(response, actual_model)
             
             # 千问API响应格式转换为OpenAI格式
             qianwen_response = response.json()
@@ -280,8 +876,75 @@ class LLMService:
                 }
             return qianwen_response
         except requests.exceptions.RequestException as e:
-            raise APIError(f"千问API调用失败: {str(e)}")
+            raise APIError(f"千问API调用失败: {str(e)}", status_code=_response_status(e))
 
+    @staticmethod
+    def _iter_sse_data(response: requests.Response) -> Iterator[str]:
+        """
+        逐个读取SSE事件的data字段
+        
+        按到达的数据块增量读取，不等待完整响应；迭代结束或被关闭时释放连接。
+        """
+        response.encoding = "utf-8"
+        data_lines = []
+        try:
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if not line:
+                    # 空行表示一个事件结束
+                    if data_lines:
+                        yield "\n".join(data_lines)
+                        data_lines = []
+                    continue
+                if line.startswith(":"):
+                    # 注释行（如OpenRouter的保活消息）
+                    continue
+                if line.startswith("data:"):
+                    data_lines.append(line[5:].lstrip(" "))
+            if data_lines:
+                yield "\n".join(data_lines)
+        finally:
+            response.close()
+    
+    def _iter_openai_stream(self, response: requests.Response, model: str) -> Iterator[Dict[str, Any]]:
+        """将OpenAI格式（DeepSeek/OpenRouter）的流式响应转换为统一的增量片段"""
+        for data in self._iter_sse_data(response):
+            if data.strip() == "[DONE]":
+                return
+            try:
+                chunk = json.loads(data)
+            except ValueError:
+                continue
+            if "error" in chunk:
+                raise APIError(f"流式响应错误: {chunk['error']}")
+            for choice in chunk.get("choices", []):
+                content = (choice.get("delta") or {}).get("content") or ""
+                finish_reason = choice.get("finish_reason")
+                if content or finish_reason:
+                    yield {"content": content, "finish_reason": finish_reason, "model": chunk.get("model", model)}
+    
+    def _iter_qianwen_stream(self, response: requests.Response, model: str) -> Iterator[Dict[str, Any]]:
+        """将千问的流式响应转换为统一的增量片段"""
+        for data in self._iter_sse_data(response):
+            try:
+                chunk = json.loads(data)
+            except ValueError:
+                continue
+            if "code" in chunk and "output" not in chunk:
+                raise APIError(f"流式响应错误: {chunk.get('code')}: {chunk.get('message', '')}")
+            output = chunk.get("output") or {}
+            if "choices" in output:
+                choice = output["choices"][0] if output["choices"] else {}
+                content = (choice.get("message") or {}).get("content") or ""
+                finish_reason = choice.get("finish_reason")
+            else:
+                content = output.get("text") or ""
+                finish_reason = output.get("finish_reason")
+            # 千问在生成过程中以字符串 "null" 表示未结束
+            if finish_reason == "null":
+                finish_reason = None
+            if content or finish_reason:
+                yield {"content": content, "finish_reason": finish_reason, "model": model}
+    
     def get_available_models(self) -> Dict[str, List[str]]:
         """
         获取可用的模型列表
@@ -319,6 +982,28 @@ def chat_completion(messages, model="deepseek-chat", **kwargs):
     """便捷函数，使用默认服务实例进行聊天完成"""
     return default_llm_service.chat_completion(messages, model, **kwargs)
 
+def iter_batch_completion(requests_list):
+    """便捷函数，使用默认服务实例并发执行一批请求，按完成顺序产出 (序号, 结果, 异常)"""
+    return default_llm_service.iter_batch_completion(requests_list)
+
+def batch_chat_completion(requests_list):
+    """便捷函数，使用默认服务实例并发执行一批请求，按请求顺序返回 (结果, 异常) 列表"""
+    return default_llm_service.batch_chat_completion(requests_list)
+
 def get_available_models():
     """便捷函数，获取可用模型列表"""
     return default_llm_service.get_available_models()
+
+def get_stats():
+    """便捷函数，获取默认服务实例的请求、重试和连接池统计"""
+    return default_llm_service.get_stats()
+
+def get_routing_stats():
+    """便捷函数，获取默认服务实例的模型组路由统计，未使用过路由时返回None"""
+    router = default_llm_service._router
+    return router.get_stats() if router is not None else None
+
+def get_cache_stats():
+    """便捷函数，获取默认服务实例的响应缓存统计，缓存未启用时返回None"""
+    cache = default_llm_service.cache
+    return cache.get_stats() if cache is not None else None
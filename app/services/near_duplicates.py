@@ -0,0 +1,368 @@
+"""
+近似重复检测模块 - 基于MinHash签名和LSH分桶
+
+content_hash 只能发现完全相同的条目，标点、全角/半角或句末“。”不同的条目会被当作不同条目保存：
+- 规范化：NFKC（全角转半角）、转小写、去掉标点、空白、符号和控制字符
+- 签名：规范化后的问题和答案的字符n-gram集合的MinHash签名，保存在 entry_signatures 表
+- 分桶：签名切成若干band，每个band的哈希作为桶键保存在 lsh_buckets 表，
+  查询时只比较至少有一个band相同的候选条目，不必与全表比较
+- 写入：开启写入时签名（sign_on_write）后，所有经 insert_rows 写入的条目（/api/add、/api/import、
+  LLM流水线、批量表单、init_db --incremental、爬虫数据库写入）在同一事务中保存签名
+- 同步：为尚未签名的已有条目补算签名，由 tools/near_duplicates.py 离线执行，不在请求中执行
+
+签名之间相同位置的比例是Jaccard相似度的无偏估计，达到阈值即视为近似重复。
+"""
+
+import time
+import random
+import hashlib
+import unicodedata
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+
+from app.utils.logger import get_logger
+
+logger = get_logger('near_duplicates')
+
+# 2^31-1，签名的每个值都小于它，可用 uint32 保存
+MERSENNE_PRIME = (1 << 31) - 1
+
+# 每个 IN 查询的参数个数
+LOOKUP_CHUNK_SIZE = 500
+
+# 同一个桶中条目过多时（多为极短的文本）只与桶内相邻条目比较，避免平方级的比较次数
+MAX_BUCKET_PAIRS = 100
+
+
+def normalize_text(value: str) -> str:
+    """NFKC规范化、转小写，去掉标点（P）、空白（Z）、符号（S）和控制字符（C）"""
+    value = unicodedata.normalize('NFKC', value).lower()
+    return ''.join(ch for ch in value if unicodedata.category(ch)[0] not in 'PZSC')
+
+
+def shingle_hashes(question: str, answer: str, ngram: int) -> Set[int]:
+    """规范化后的问题和答案的字符n-gram哈希集合，问题和答案之间的n-gram不会跨界"""
+    hashes = set()
+    for part in (normalize_text(question), normalize_text(answer)):
+        if not part:
+            continue
+        if len(part) <= ngram:
+            hashes.add(zlib.crc32(part.encode()))
+            continue
+        for start in range(len(part) - ngram + 1):
+            hashes.add(zlib.crc32(part[start:start + ngram].encode()))
+    return hashes
+
+
+class MinHasher:
+    """用 (a * x + b) mod p 形式的哈希函数族计算MinHash签名"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.permutations = [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+                             for _ in range(num_perm)]
+
+    def signature(self, hashes: Set[int]) -> array:
+        """n-gram哈希集合的签名，集合为空时返回空签名"""
+        if not hashes:
+            return array('I')
+        values = [value % MERSENNE_PRIME for value in hashes]
+        return array('I', [min((a * value + b) % MERSENNE_PRIME for value in values)
+                           for a, b in self.permutations])
+
+
+def similarity(left: array, right: array) -> float:
+    """两个签名相同位置的比例，即Jaccard相似度的估计值"""
+    if not left or len(left) != len(right):
+        return 0.0
+    return sum(1 for x, y in zip(left, right) if x == y) / len(left)
+
+
+def load_signature(data: bytes) -> array:
+    signature = array('I')
+    signature.frombytes(data)
+    return signature
+
+
+class UnionFind:
+    """按条目ID合并近似重复簇"""
+
+    def __init__(self):
+        self.parent: Dict[int, int] = {}
+
+    def find(self, item: int) -> int:
+        self.parent.setdefault(item, item)
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, left: int, right: int):
+        left, right = self.find(left), self.find(right)
+        if left != right:
+            # 以较小的ID（较早的条目）为根
+            if right < left:
+                left, right = right, left
+            self.parent[right] = left
+
+    def groups(self) -> List[List[int]]:
+        groups: Dict[int, List[int]] = {}
+        for item in self.parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return [sorted(members) for members in groups.values() if len(members) > 1]
+
+
+def _compute_rows(args) -> List[Tuple[int, bytes, List[int]]]:
+    """子进程中计算一批条目的签名和桶键"""
+    index_options, entries = args
+    index = NearDuplicateIndex(**index_options)
+    return [(entry_id, *index.compute(question, answer)) for entry_id, question, answer in entries]
+
+
+class NearDuplicateIndex:
+    """条目的MinHash签名和LSH分桶"""
+
+    def __init__(self, ngram: int = 2, num_perm: int = 64, bands: int = 16, threshold: float = 0.8, seed: int = 1,
+                 sign_on_write: bool = False):
+        """
+        初始化近似重复索引
+
+        Args:
+            ngram: 字符n-gram长度
+            num_perm: 签名长度，必须能被 bands 整除
+            bands: LSH band数
+            threshold: 视为近似重复的最低相似度
+            seed: 生成哈希函数的随机种子
+            sign_on_write: 是否在写入条目时同时保存签名
+        """
+        if num_perm % bands:
+            raise ValueError(f'NUM_PERM ({num_perm}) must be divisible by BANDS ({bands})')
+        self.ngram = ngram
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.seed = seed
+        self.sign_on_write = sign_on_write
+        self.hasher = MinHasher(num_perm, seed)
+
+    @property
+    def options(self) -> Dict[str, Any]:
+        return {'ngram': self.ngram, 'num_perm': self.num_perm, 'bands': self.bands,
+                'threshold': self.threshold, 'seed': self.seed}
+
+    def signature(self, question: str, answer: str) -> array:
+        return self.hasher.signature(shingle_hashes(question, answer, self.ngram))
+
+    def band_keys(self, signature: array) -> List[int]:
+        """每个band的桶键（有符号64位整数），空签名没有桶键"""
+        if not signature:
+            return []
+        keys = []
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            digest = hashlib.blake2b(bytes([band]) + chunk, digest_size=8).digest()
+            keys.append(int.from_bytes(digest, 'big', signed=True))
+        return keys
+
+    def compute(self, question: str, answer: str) -> Tuple[bytes, List[int]]:
+        """返回 (签名字节, 桶键列表)"""
+        signature = self.signature(question, answer)
+        return signature.tobytes(), self.band_keys(signature)
+
+    def compute_rows(self, rows: Iterable[Dict[str, Any]]) -> List[Tuple[bytes, List[int]]]:
+        """计算待写入条目的签名和桶键，在插入（取得写锁）之前调用"""
+        return [self.compute(row['question'], row['answer']) for row in rows]
+
+    def add(self, session, entry_ids: List[int], computed: List[Tuple[bytes, List[int]]]):
+        """保存 compute_rows() 的结果，与条目在同一事务中提交"""
+        self._save(session, [(entry_id, signature, keys) for entry_id, (signature, keys) in zip(entry_ids, computed)])
+
+    def sync(self, session, batch_size: int = 1000, workers: int = 1, commit: bool = True) -> int:
+        """
+        为尚未签名的条目计算并保存签名和桶键
+
+        Args:
+            session: SQLAlchemy会话
+            batch_size: 每批读取和写入的条目数
+            workers: 计算签名的进程数，1表示在当前进程中计算
+            commit: 是否每批提交；为False时由调用方在同一事务中提交
+
+        Returns:
+            新增签名的条目数
+        """
+        from app.models import DataEntry, EntrySignature
+
+        # 写入时签名会留下未签名的空隙（签名关闭期间写入的条目），不能只看最大签名ID
+        last_id = 0
+        synced = 0
+        start_time = time.perf_counter()
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            while True:
+                entries = session.query(DataEntry.id, DataEntry.question, DataEntry.answer) \
+                    .outerjoin(EntrySignature, EntrySignature.entry_id == DataEntry.id) \
+                    .filter(DataEntry.id > last_id, EntrySignature.entry_id.is_(None)) \
+                    .order_by(DataEntry.id).limit(batch_size * max(workers, 1)).all()
+                if not entries:
+                    break
+                if executor:
+                    parts = [entries[start:start + batch_size] for start in range(0, len(entries), batch_size)]
+                    rows = [row for part in executor.map(_compute_rows, [(self.options, part) for part in parts])
+                            for row in part]
+                else:
+                    rows = _compute_rows((self.options, entries))
+                self._save(session, rows)
+                if commit:
+                    session.commit()
+                synced += len(rows)
+                last_id = entries[-1][0]
+        finally:
+            if executor:
+                executor.shutdown()
+        if synced >= batch_size:
+            logger.info(f"已为 {synced} 个条目生成签名，耗时 {time.perf_counter() - start_time:.1f}s")
+        return synced
+
+    def _save(self, session, rows: List[Tuple[int, bytes, List[int]]]):
+        if not rows:
+            return
+        # 其他进程可能同时同步了相同的条目
+        session.execute(text('INSERT OR IGNORE INTO entry_signatures (entry_id, signature) VALUES (:id, :sig)'),
+                        [{'id': entry_id, 'sig': signature} for entry_id, signature, _ in rows])
+        buckets = [{'key': key, 'id': entry_id} for entry_id, _, keys in rows for key in keys]
+        if buckets:
+            session.execute(text('INSERT OR IGNORE INTO lsh_buckets (band_key, entry_id) VALUES (:key, :id)'),
+                            buckets)
+
+    def clear(self, session):
+        """删除所有签名和桶键，不提交"""
+        from app.models import EntrySignature, LshBucket
+
+        session.query(LshBucket).delete()
+        session.query(EntrySignature).delete()
+
+    def _load_signatures(self, session, entry_ids: Iterable[int]) -> Dict[int, array]:
+        from app.models import EntrySignature
+
+        entry_ids = list(entry_ids)
+        signatures = {}
+        for start in range(0, len(entry_ids), LOOKUP_CHUNK_SIZE):
+            chunk = entry_ids[start:start + LOOKUP_CHUNK_SIZE]
+            rows = session.query(EntrySignature.entry_id, EntrySignature.signature) \
+                .filter(EntrySignature.entry_id.in_(chunk)).all()
+            signatures.update((entry_id, load_signature(data)) for entry_id, data in rows)
+        return signatures
+
+    def find(self, session, question: str, answer: str, threshold: Optional[float] = None,
+             signature: Optional[array] = None) -> List[Tuple[int, float]]:
+        """
+        查找与给定问题和答案近似重复的已有条目
+
+        Args:
+            signature: 已计算的签名，为空时根据问题和答案计算
+
+        Returns:
+            按相似度从高到低排列的 (条目ID, 相似度) 列表
+        """
+        from app.models import DataEntry, LshBucket
+
+        threshold = self.threshold if threshold is None else threshold
+        if signature is None:
+            signature = self.signature(question, answer)
+        keys = self.band_keys(signature)
+        if not keys:
+            return []
+        candidates = {entry_id for (entry_id,) in
+                      session.query(LshBucket.entry_id).filter(LshBucket.band_key.in_(keys)).distinct()}
+        matches = [(entry_id, similarity(signature, candidate))
+                   for entry_id, candidate in self._load_signatures(session, candidates).items()]
+        matches = [(entry_id, score) for entry_id, score in matches if score >= threshold]
+        if matches:
+            # 签名可能属于已删除的条目
+            existing = {entry_id for (entry_id,) in
+                        session.query(DataEntry.id).filter(DataEntry.id.in_([m[0] for m in matches]))}
+            matches = [match for match in matches if match[0] in existing]
+        return sorted(matches, key=lambda match: (-match[1], match[0]))
+
+    def check(self, session, items: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        检查一批待写入的条目，与已有条目以及本批之前的条目比较
+
+        Returns:
+            与items顺序一致的列表，近似重复时为 {'similar_id' 或 'similar_index', 'similarity'}，否则为None
+        """
+        results: List[Optional[Dict[str, Any]]] = []
+        batch_buckets: Dict[int, List[int]] = {}
+        batch_signatures: List[array] = []
+        for position, item in enumerate(items):
+            signature = self.signature(item['question'], item['answer'])
+            batch_signatures.append(signature)
+            match = None
+            found = self.find(session, item['question'], item['answer'], signature=signature)
+            if found:
+                match = {'similar_id': found[0][0], 'similarity': found[0][1]}
+            else:
+                keys = self.band_keys(signature)
+                candidates = {other for key in keys for other in batch_buckets.get(key, [])}
+                best = max(((similarity(signature, batch_signatures[other]), other) for other in candidates),
+                           default=None)
+                if best and best[0] >= self.threshold:
+                    match = {'similar_index': best[1], 'similarity': best[0]}
+                for key in keys:
+                    batch_buckets.setdefault(key, []).append(position)
+            results.append(match)
+        return results
+
+    def clusters(self, session, threshold: Optional[float] = None) -> List[List[int]]:
+        """
+        对全表的近似重复条目聚类（调用前先 sync）
+
+        同桶的条目两两比较签名，相似度达到阈值的合并为一簇。
+
+        Returns:
+            簇列表，每簇为升序的条目ID列表，按簇大小降序排列
+        """
+        threshold = self.threshold if threshold is None else threshold
+        buckets = [sorted(int(entry_id) for entry_id in members.split(',')) for (members,) in session.execute(text(
+            'SELECT group_concat(entry_id) FROM lsh_buckets GROUP BY band_key HAVING COUNT(*) > 1'
+        ))]
+        # 只加载至少与一个条目同桶的签名
+        signatures = self._load_signatures(session, {entry_id for ids in buckets for entry_id in ids})
+        groups = UnionFind()
+        compared = set()
+        for ids in buckets:
+            if len(ids) <= MAX_BUCKET_PAIRS:
+                pairs = ((ids[i], ids[j]) for i in range(len(ids)) for j in range(i + 1, len(ids)))
+            else:
+                pairs = zip(ids, ids[1:])
+            for pair in pairs:
+                if pair in compared:
+                    continue
+                compared.add(pair)
+                left, right = pair
+                if left in signatures and right in signatures \
+                        and similarity(signatures[left], signatures[right]) >= threshold:
+                    groups.union(left, right)
+        return sorted(groups.groups(), key=lambda members: (-len(members), members[0]))
+
+
+def _create_default_index() -> NearDuplicateIndex:
+    from app.config import NEAR_DUPLICATE_CONFIG
+    return NearDuplicateIndex(ngram=NEAR_DUPLICATE_CONFIG.get("NGRAM", 2),
+                              num_perm=NEAR_DUPLICATE_CONFIG.get("NUM_PERM", 64),
+                              bands=NEAR_DUPLICATE_CONFIG.get("BANDS", 16),
+                              threshold=NEAR_DUPLICATE_CONFIG.get("THRESHOLD", 0.8),
+                              seed=NEAR_DUPLICATE_CONFIG.get("SEED", 1),
+                              sign_on_write=NEAR_DUPLICATE_CONFIG.get("ADD_CHECK", "off") != 'off')
+
+
+# 默认实例
+near_duplicate_index = _create_default_index()
@@ -0,0 +1,217 @@
+"""
+限流模块 - 令牌桶
+
+- 入站：每个API密钥在每个路由类别上一个令牌桶，由 require_api_key 检查
+- 出站：每个LLM服务一个令牌桶，由 LLMService 在发出请求前等待
+- 令牌桶状态默认保存在进程内，也可以保存在SQLite中供多个工作进程共享
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from collections import namedtuple
+from typing import Dict, Optional, Tuple
+
+# 单次检查的结果
+# allowed: 是否放行；limit: 桶容量；remaining: 剩余令牌数；
+# reset_after: 桶补满所需秒数；retry_after: 被拒绝时需要等待的秒数
+RateLimitResult = namedtuple('RateLimitResult', ['allowed', 'limit', 'remaining', 'reset_after', 'retry_after'])
+
+
+class RateLimitExceeded(Exception):
+    """令牌不足且等待时间超过上限"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def validate_limits(limits: Dict[str, Optional[Dict[str, float]]]):
+    """
+    检查令牌桶配置：CAPACITY 至少为1，RATE 必须为正数（否则被拒绝的请求永远等不到令牌）
+
+    Raises:
+        ValueError: 配置无效，值为None（不限流）的条目跳过
+    """
+    for name, limit in limits.items():
+        if limit is None:
+            continue
+        if not limit.get("CAPACITY", 0) >= 1:
+            raise ValueError(f"限流配置 {name} 的 CAPACITY 必须不小于1: {limit.get('CAPACITY')}")
+        if not limit.get("RATE", 0) > 0:
+            raise ValueError(f"限流配置 {name} 的 RATE 必须为正数，不限流请删除该条目: {limit.get('RATE')}")
+
+
+def _refill(tokens: float, updated_at: float, now: float, capacity: float, rate: float) -> float:
+    """计算按时间补充后的令牌数"""
+    return min(capacity, tokens + max(0.0, now - updated_at) * rate)
+
+
+def _take(tokens: float, capacity: float, rate: float, cost: float) -> Tuple[bool, float, RateLimitResult]:
+    """
+    尝试从补充后的桶中取出cost个令牌
+
+    Returns:
+        (是否放行, 取出后的令牌数, 检查结果)
+    """
+    allowed = tokens >= cost
+    if allowed:
+        tokens -= cost
+        retry_after = 0.0
+    else:
+        retry_after = (cost - tokens) / rate
+    reset_after = (capacity - tokens) / rate
+    return allowed, tokens, RateLimitResult(allowed, int(capacity), int(tokens), reset_after, retry_after)
+
+
+class MemoryBucketStore:
+    """进程内的令牌桶状态"""
+
+    def __init__(self, max_buckets: int = 100000):
+        self.max_buckets = max_buckets
+        # key -> (令牌数, 更新时间)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, capacity: float, rate: float, cost: float = 1.0) -> RateLimitResult:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = _refill(tokens, updated_at, now, capacity, rate)
+            _, tokens, result = _take(tokens, capacity, rate, cost)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_buckets:
+                self._prune(now)
+        return result
+
+    def _prune(self, now: float):
+        """删除闲置足够久、已经补满的桶（调用方持有锁）"""
+        stale = [key for key, (_, updated_at) in self._buckets.items() if now - updated_at > 3600]
+        for key in stale:
+            del self._buckets[key]
+
+
+class SQLiteBucketStore:
+    """保存在SQLite中的令牌桶状态，多个进程共享同一个文件"""
+
+    def __init__(self, db_path: str, busy_timeout_ms: int = 5000):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None,
+                                   timeout=busy_timeout_ms / 1000)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def consume(self, key: str, capacity: float, rate: float, cost: float = 1.0) -> RateLimitResult:
+        # 多进程共享时使用墙上时间；BEGIN IMMEDIATE 保证读-改-写在进程间是原子的
+        with self._lock:
+            now = time.time()
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT tokens, updated_at FROM rate_buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens = _refill(row[0], row[1], now, capacity, rate) if row else capacity
+                _, tokens, result = _take(tokens, capacity, rate, cost)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                    (key, tokens, now)
+                )
+                self._writes += 1
+                if self._writes % 10000 == 0:
+                    self._db.execute("DELETE FROM rate_buckets WHERE updated_at < ?", (now - 3600,))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return result
+
+
+class RateLimiter:
+    """按路由类别和LLM服务配置的令牌桶限流器"""
+
+    def __init__(self, store, limits: Dict[str, Dict[str, float]],
+                 provider_limits: Dict[str, Dict[str, float]] = None, provider_max_wait: float = 10.0):
+        """
+        Args:
+            store: MemoryBucketStore 或 SQLiteBucketStore
+            limits: 路由类别 -> {'CAPACITY', 'RATE'}，必须包含 default
+            provider_limits: LLM服务名 -> {'CAPACITY', 'RATE'}，未列出的服务不限流
+            provider_max_wait: 服务令牌不足时最多等待的秒数
+
+        Raises:
+            ValueError: 令牌桶配置无效
+        """
+        if "default" not in limits:
+            raise ValueError("限流配置 LIMITS 必须包含 default")
+        validate_limits(limits)
+        validate_limits(provider_limits or {})
+        self.store = store
+        self.limits = limits
+        self.provider_limits = provider_limits or {}
+        self.provider_max_wait = provider_max_wait
+
+    def check(self, identity: str, route_class: str = 'default') -> RateLimitResult:
+        """
+        为调用方在路由类别上消耗一个令牌
+
+        Args:
+            identity: 调用方标识，如 'key:12'
+            route_class: 路由类别，未配置时使用 default
+        """
+        if route_class not in self.limits:
+            route_class = 'default'
+        limit = self.limits[route_class]
+        return self.store.consume(f"{route_class}:{identity}", limit["CAPACITY"], limit["RATE"])
+
+    def acquire_provider(self, provider: str, limit: Optional[Dict[str, float]] = None):
+        """
+        为发往LLM服务的请求获取一个令牌，令牌不足时等待
+
+        Args:
+            provider: 服务名
+            limit: 覆盖配置中的 {'CAPACITY', 'RATE'}
+
+        Raises:
+            RateLimitExceeded: 需要等待的时间超过 provider_max_wait
+        """
+        limit = limit or self.provider_limits.get(provider)
+        if not limit:
+            return
+        deadline = time.monotonic() + self.provider_max_wait
+        while True:
+            result = self.store.consume(f"provider:{provider}", limit["CAPACITY"], limit["RATE"])
+            if result.allowed:
+                return
+            if time.monotonic() + result.retry_after > deadline:
+                raise RateLimitExceeded(f"{provider} 出站请求超过限流", result.retry_after)
+            time.sleep(result.retry_after)
+
+
+def _create_default_limiter() -> Optional[RateLimiter]:
+    from app.config import RATE_LIMIT_CONFIG
+    if not RATE_LIMIT_CONFIG.get("ENABLED", True):
+        return None
+    if RATE_LIMIT_CONFIG.get("STORE", "memory") == "sqlite":
+        from app.config import SQLITE_CONFIG
+        store = SQLiteBucketStore(RATE_LIMIT_CONFIG["DB_PATH"], SQLITE_CONFIG.get("BUSY_TIMEOUT_MS", 5000))
+    else:
+        store = MemoryBucketStore()
+    return RateLimiter(
+        store,
+        limits=RATE_LIMIT_CONFIG.get("LIMITS", {"default": {"CAPACITY": 60, "RATE": 1.0}}),
+        provider_limits=RATE_LIMIT_CONFIG.get("PROVIDER_LIMITS", {}),
+        provider_max_wait=RATE_LIMIT_CONFIG.get("PROVIDER_MAX_WAIT", 10.0),
+    )
+
+
+# 默认实例，限流未启用时为None
+rate_limiter = _create_default_limiter()
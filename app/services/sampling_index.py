@@ -0,0 +1,147 @@
+"""
+随机采样索引模块 - 为 /api/random 提供O(count)的随机抽样
+
+在进程内为每个类别维护一个基于数组的条目ID列表：
+- 应用启动时从数据库构建
+- 写入路径提交后以及采样时，按 id > 已知最大ID 增量同步新条目
+
+SQLite同一时刻只有一个写事务，自增ID按提交顺序可见，因此增量同步不会遗漏条目。
+"""
+
+import random
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.utils.logger import get_logger
+
+logger = get_logger('sampling_index')
+
+
+class SamplingIndex:
+    """按类别划分的条目ID采样索引"""
+
+    def __init__(self, refresh_interval: float = 1.0):
+        """
+        初始化采样索引
+
+        Args:
+            refresh_interval: 两次增量同步之间的最小间隔（秒），0表示每次采样都同步
+        """
+        self.refresh_interval = refresh_interval
+        self._ids: Dict[str, array] = {}
+        self._max_id = 0
+        self._last_refresh = 0.0
+        self._built = False
+        self._lock = threading.Lock()
+
+    @property
+    def built(self) -> bool:
+        """索引是否已构建"""
+        return self._built
+
+    def _append(self, rows: Iterable[Tuple[int, str]]):
+        """追加 (id, category) 行，调用方需持有锁"""
+        for entry_id, category in rows:
+            ids = self._ids.get(category)
+            if ids is None:
+                ids = self._ids[category] = array('q')
+            ids.append(entry_id)
+            self._max_id = entry_id
+
+    def build(self, session):
+        """
+        从数据库全量构建索引
+
+        Args:
+            session: SQLAlchemy会话
+        """
+        from app.models import DataEntry
+
+        rows = session.query(DataEntry.id, DataEntry.category).order_by(DataEntry.id).yield_per(10000)
+        with self._lock:
+            self._ids = {}
+            self._max_id = 0
+            self._append(rows)
+            self._built = True
+            self._last_refresh = time.monotonic()
+        logger.info(f"随机采样索引已构建: {self.size()} 个条目, {len(self._ids)} 个类别")
+
+    def refresh(self, session, force: bool = False):
+        """
+        增量同步 id 大于已知最大ID的条目（其他进程或脚本写入的数据）
+
+        Args:
+            session: SQLAlchemy会话
+            force: 是否忽略同步间隔强制同步
+        """
+        from app.models import DataEntry
+
+        if not self._built:
+            return
+
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return
+        self._last_refresh = now
+
+        rows = session.query(DataEntry.id, DataEntry.category) \
+            .filter(DataEntry.id > self._max_id) \
+            .order_by(DataEntry.id).all()
+        if rows:
+            with self._lock:
+                # 并发同步时只追加仍未收录的部分
+                self._append(row for row in rows if row[0] > self._max_id)
+
+    def size(self, category: Optional[str] = None) -> int:
+        """返回索引中的条目数量"""
+        if category:
+            ids = self._ids.get(category)
+            return len(ids) if ids is not None else 0
+        return sum(len(ids) for ids in self._ids.values())
+
+    def sample(self, count: int, category: Optional[str] = None) -> List[int]:
+        """
+        无放回地随机抽取条目ID
+
+        Args:
+            count: 需要的数量，超过可用数量时返回全部
+            category: 类别，为空时在所有类别中均匀抽取
+
+        Returns:
+            条目ID列表
+        """
+        with self._lock:
+            if category:
+                ids = self._ids.get(category)
+                if not ids:
+                    return []
+                return [ids[i] for i in random.sample(range(len(ids)), min(count, len(ids)))]
+
+            # 把各类别数组视为一个拼接后的虚拟数组，按全局位置抽样
+            buckets = [ids for ids in self._ids.values() if ids]
+            total = sum(len(ids) for ids in buckets)
+            positions = random.sample(range(total), min(count, total))
+            offsets = []
+            start = 0
+            for ids in buckets:
+                offsets.append(start)
+                start += len(ids)
+
+            result = []
+            for pos in positions:
+                for i in range(len(buckets) - 1, -1, -1):
+                    if pos >= offsets[i]:
+                        result.append(buckets[i][pos - offsets[i]])
+                        break
+            return result
+
+
+def _create_default_index() -> SamplingIndex:
+    from app.config import SAMPLING_INDEX_CONFIG
+    return SamplingIndex(refresh_interval=SAMPLING_INDEX_CONFIG.get("REFRESH_INTERVAL", 1.0))
+
+
+# 默认实例
+sampling_index = _create_default_index()
@@ -0,0 +1,276 @@
+"""
+全文搜索模块 - 基于SQLite FTS5的问题/答案搜索
+
+- data_entries_fts 为外部内容（external content）的FTS5虚拟表，只保存索引，不重复保存文本
+- 使用 trigram 分词器：按连续3个字符建立索引，中文不需要分词即可做子串搜索
+- data_entries 上的触发器在插入、删除和修改时同步索引；表被重建（触发器随之丢失）时自动重建索引
+- 结果按 bm25 相关度排序（问题的权重高于答案），用 (score, id) 游标分页
+- bm25 需要为每个匹配的条目计算得分，匹配数超过 max_ranked 时（常见词，相关度区分不大）
+  改为按ID顺序返回，每页只读取需要的条目
+
+trigram 无法匹配少于3个字符的词，这类词改用 LIKE 过滤；
+整个查询都少于3个字符（或FTS5不可用）时回退到 LIKE 扫描，按ID排序。
+"""
+
+import json
+import time
+import base64
+import binascii
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.utils.logger import get_logger
+from app.utils.pagination import InvalidCursorError
+
+logger = get_logger('search_index')
+
+FTS_TABLE = 'data_entries_fts'
+
+# trigram 分词器能匹配的最短词长
+MIN_TERM_LENGTH = 3
+
+TRIGGERS = {
+    'data_entries_fts_ai': f"""
+        CREATE TRIGGER data_entries_fts_ai AFTER INSERT ON data_entries BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, question, answer) VALUES (new.id, new.question, new.answer);
+        END""",
+    'data_entries_fts_ad': f"""
+        CREATE TRIGGER data_entries_fts_ad AFTER DELETE ON data_entries BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, question, answer)
+            VALUES ('delete', old.id, old.question, old.answer);
+        END""",
+    'data_entries_fts_au': f"""
+        CREATE TRIGGER data_entries_fts_au AFTER UPDATE OF question, answer ON data_entries BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, question, answer)
+            VALUES ('delete', old.id, old.question, old.answer);
+            INSERT INTO {FTS_TABLE} (rowid, question, answer) VALUES (new.id, new.question, new.answer);
+        END""",
+}
+
+
+def encode_cursor(score: float, entry_id: int) -> str:
+    """将 (相关度, ID) 编码为不透明游标"""
+    payload = json.dumps([score, entry_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """
+    解析游标
+
+    Returns:
+        (score, id) 元组
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        score, entry_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return float(score), int(entry_id)
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise InvalidCursorError(f'Invalid cursor: {cursor}') from e
+
+
+def split_terms(query: str) -> Tuple[List[str], List[str]]:
+    """
+    按空白拆分查询词
+
+    Returns:
+        (可用trigram索引的词, 需要用LIKE匹配的短词)
+    """
+    terms = list(dict.fromkeys(query.split()))
+    return ([term for term in terms if len(term) >= MIN_TERM_LENGTH],
+            [term for term in terms if len(term) < MIN_TERM_LENGTH])
+
+
+def match_expression(terms: List[str]) -> str:
+    """每个词作为一个短语（双引号转义），多个短语之间为AND"""
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def like_pattern(term: str) -> str:
+    """子串匹配的LIKE模式，转义通配符"""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+class SearchIndex:
+    """data_entries 的FTS5全文索引"""
+
+    def __init__(self, enabled: bool = True, question_weight: float = 2.0, answer_weight: float = 1.0,
+                 max_ranked: int = 10000):
+        """
+        初始化搜索索引
+
+        Args:
+            enabled: 是否启用FTS5索引，关闭时只使用 LIKE 搜索
+            question_weight: 问题列的 bm25 权重
+            answer_weight: 答案列的 bm25 权重
+            max_ranked: 按相关度排序的最大匹配数，超过时按ID顺序返回
+        """
+        self.enabled = enabled
+        self.question_weight = question_weight
+        self.answer_weight = answer_weight
+        self.max_ranked = max_ranked
+        self._available = False
+
+    @property
+    def available(self) -> bool:
+        """FTS5索引是否可用"""
+        return self._available
+
+    def ensure(self, engine) -> bool:
+        """
+        创建FTS5表和同步触发器，新建表或补建触发器后从 data_entries 重建索引
+
+        Returns:
+            索引是否可用
+        """
+        self._available = False
+        if not self.enabled or engine.dialect.name != 'sqlite':
+            return False
+
+        with engine.begin() as connection:
+            existing = {row[0] for row in connection.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE 'data_entries_fts%'"
+            )}
+            try:
+                connection.exec_driver_sql(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                    f"question, answer, content='data_entries', content_rowid='id', tokenize='trigram')"
+                )
+            except OperationalError as e:
+                # SQLite未编译FTS5，或版本低于3.34不支持 trigram 分词器
+                logger.warning(f"FTS5全文索引不可用，搜索将使用 LIKE: {e}")
+                return False
+
+            missing = [name for name in TRIGGERS if name not in existing]
+            for name in missing:
+                connection.exec_driver_sql(TRIGGERS[name])
+            if FTS_TABLE not in existing or missing:
+                # 新建的索引为空；触发器缺失说明 data_entries 被重建过，索引已过期
+                start = time.perf_counter()
+                connection.exec_driver_sql(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+                logger.info(f"全文索引已重建，耗时 {time.perf_counter() - start:.2f}s")
+
+        self._available = True
+        return True
+
+    def drop_triggers(self, engine):
+        """
+        删除同步触发器，用于大批量写入
+
+        之后调用 ensure() 会重新创建触发器并从 data_entries 重建索引，比逐行维护索引快。
+        """
+        if engine.dialect.name != 'sqlite':
+            return
+        with engine.begin() as connection:
+            for name in TRIGGERS:
+                connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS {name}')
+        self._available = False
+
+    def search(self, session, query: str, category: Optional[str] = None, cursor: Optional[str] = None,
+               limit: int = 20) -> Dict[str, Any]:
+        """
+        搜索问题和答案中包含查询词的条目
+
+        Args:
+            session: SQLAlchemy会话
+            query: 查询字符串，空白分隔的多个词之间为AND
+            category: 可选的类别过滤
+            cursor: 上一页返回的 next 游标
+            limit: 每页条目数
+
+        Returns:
+            {'items': [(DataEntry, score), ...], 'next': 游标或None, 'mode': 'fts' | 'like', 'ranked': bool}
+            score 越小越相关，未按相关度排序时 score 均为0
+
+        Raises:
+            InvalidCursorError: 游标无法解析
+        """
+        from app.models import DataEntry
+
+        fts_terms, like_terms = split_terms(query)
+        if not fts_terms and not like_terms:
+            return {'items': [], 'next': None, 'mode': 'like', 'ranked': False}
+        if not self._available:
+            like_terms = fts_terms + like_terms
+            fts_terms = []
+
+        after_score, after_id = decode_cursor(cursor) if cursor else (None, None)
+        params: Dict[str, Any] = {'limit': limit + 1}
+        conditions = []
+        if category:
+            conditions.append('e.category = :category')
+            params['category'] = category
+        for index, term in enumerate(like_terms):
+            conditions.append(f"(e.question LIKE :like{index} ESCAPE '\\' OR e.answer LIKE :like{index} ESCAPE '\\')")
+            params[f'like{index}'] = like_pattern(term)
+
+        if fts_terms:
+            mode = 'fts'
+            params['match'] = match_expression(fts_terms)
+            # 只读取行号判断匹配数是否超过排序上限，不计算得分
+            matches = session.execute(text(
+                f"SELECT COUNT(*) FROM (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match LIMIT :cap)"
+            ), {'match': params['match'], 'cap': self.max_ranked + 1}).scalar()
+            ranked = matches <= self.max_ranked
+
+        if fts_terms and not ranked:
+            if cursor:
+                conditions.append(f'{FTS_TABLE}.rowid > :after_id')
+                params['after_id'] = after_id
+            sql = (f"SELECT e.id AS id, 0.0 AS score "
+                   f"FROM {FTS_TABLE} JOIN data_entries e ON e.id = {FTS_TABLE}.rowid "
+                   f"WHERE {FTS_TABLE} MATCH :match")
+            if conditions:
+                sql += ' AND ' + ' AND '.join(conditions)
+            sql += f" ORDER BY {FTS_TABLE}.rowid LIMIT :limit"
+        elif fts_terms:
+            params.update({'question_weight': self.question_weight, 'answer_weight': self.answer_weight})
+            inner = (f"SELECT e.id AS id, bm25({FTS_TABLE}, :question_weight, :answer_weight) AS score "
+                     f"FROM {FTS_TABLE} JOIN data_entries e ON e.id = {FTS_TABLE}.rowid "
+                     f"WHERE {FTS_TABLE} MATCH :match")
+            if conditions:
+                inner += ' AND ' + ' AND '.join(conditions)
+            sql = f"SELECT id, score FROM ({inner})"
+            if cursor:
+                sql += " WHERE score > :after_score OR (score = :after_score AND id > :after_id)"
+                params.update({'after_score': after_score, 'after_id': after_id})
+            sql += " ORDER BY score, id LIMIT :limit"
+        else:
+            mode = 'like'
+            ranked = False
+            if cursor:
+                conditions.append('e.id > :after_id')
+                params['after_id'] = after_id
+            sql = "SELECT e.id AS id, 0.0 AS score FROM data_entries e"
+            if conditions:
+                sql += ' WHERE ' + ' AND '.join(conditions)
+            sql += " ORDER BY e.id LIMIT :limit"
+
+        rows = session.execute(text(sql), params).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        entries = {entry.id: entry for entry in
+                   session.query(DataEntry).filter(DataEntry.id.in_([row[0] for row in rows])).all()} if rows else {}
+        items = [(entries[entry_id], score) for entry_id, score in rows if entry_id in entries]
+        return {
+            'items': items,
+            'next': encode_cursor(rows[-1][1], rows[-1][0]) if rows and has_more else None,
+            'mode': mode,
+            'ranked': ranked
+        }
+
+
+def _create_default_index() -> SearchIndex:
+    from app.config import SEARCH_CONFIG
+    return SearchIndex(enabled=SEARCH_CONFIG.get("ENABLED", True),
+                       question_weight=SEARCH_CONFIG.get("QUESTION_WEIGHT", 2.0),
+                       answer_weight=SEARCH_CONFIG.get("ANSWER_WEIGHT", 1.0),
+                       max_ranked=SEARCH_CONFIG.get("MAX_RANKED", 10000))
+
+
+# 默认实例
+search_index = _create_default_index()
@@ -1,42 +1,95 @@
 """
 认证和授权工具
 """
-import re
+import math
 from functools import wraps
-from flask import request, jsonify, abort
-from app.models import ApiKey
-from datetime import datetime
-from app import db
-from app.config import LOCAL_NETWORK_IPS
-from app.utils.logger import get_logger
+from flask import g, request, jsonify, abort, after_this_request
+from app.config import LOCAL_NETWORK_IPS, RATE_LIMIT_CONFIG
+from app.services.api_key_cache import api_key_cache
+from app.services.rate_limiter import rate_limiter
+from app.utils.ip_matcher import IPAllowlist
+from app.utils.logger import get_logger, log_sampled
 
 logger = get_logger('auth')
 
+# 启动时预编译本地网络允许列表
+local_network_allowlist = IPAllowlist(LOCAL_NETWORK_IPS)
+
 # 检查请求是否来自本地网络
 def is_local_request():
     """
     检查请求是否来自本地网络/本地主机
     
     根据config.py中的LOCAL_NETWORK_IPS配置检查请求IP是否在允许的本地网络范围内
-    支持精确匹配和正则表达式模式匹配
+    支持精确匹配、CIDR网段和正则表达式模式匹配
     """
     client_ip = request.remote_addr
     
     # 检查IP是否在允许列表中
-    for ip_pattern in LOCAL_NETWORK_IPS:
-        # 如果是精确匹配
-        if client_ip == ip_pattern:
-            return True
-        # 如果是正则表达式模式
-        try:
-            if re.match(ip_pattern, client_ip):
-                return True
-        except re.error:
-            # 如果正则表达式无效，则跳过该模式
-            continue
-    logger.warning(f"拒绝来自非本地网络的请求: {client_ip}")
+    if local_network_allowlist.contains(client_ip):
+        return True
+    log_sampled(logger, ('non_local_request', client_ip), f"拒绝来自非本地网络的请求: {client_ip}")
     return False
 
+def route_class():
+    """根据当前请求的端点确定限流使用的路由类别"""
+    route_classes = RATE_LIMIT_CONFIG.get('ROUTE_CLASSES', {})
+    return route_classes.get(request.endpoint) or route_classes.get(request.blueprint) or 'default'
+
+def rate_limit_headers(result):
+    """生成 X-RateLimit-* 响应头"""
+    return {
+        'X-RateLimit-Limit': str(result.limit),
+        'X-RateLimit-Remaining': str(result.remaining),
+        'X-RateLimit-Reset': str(math.ceil(result.reset_after))
+    }
+
+def check_rate_limit(identity, route=None):
+    """
+    对当前请求执行限流检查
+    
+    Args:
+        identity: 限流主体，如 key:1 或 ip:127.0.0.1
+        route: 路由类别，默认由当前端点确定
+    
+    Returns:
+        被限流时返回429响应，否则返回None并在响应中附加 X-RateLimit-* 头
+        （同一请求检查多个类别时，附加最后一次检查的结果）
+    """
+    if rate_limiter is None:
+        return None
+    
+    result = rate_limiter.check(identity, route or route_class())
+    headers = rate_limit_headers(result)
+    if not result.allowed:
+        headers['Retry-After'] = str(math.ceil(result.retry_after))
+        log_sampled(logger, ('rate_limited', identity), f"请求被限流: {identity} {request.endpoint}")
+        # 之前的检查已注册附加响应头时，改为附加被拒绝类别的结果
+        g.rate_limit_headers = headers
+        return jsonify({'error': 'Rate limit exceeded'}), 429, headers
+    
+    if 'rate_limit_headers' not in g:
+        @after_this_request
+        def add_headers(response):
+            response.headers.update(g.rate_limit_headers)
+            return response
+    g.rate_limit_headers = headers
+    return None
+
+def charge_rate_limit(route):
+    """
+    对已通过 require_api_key 的请求再按指定路由类别扣除令牌，如按任务类型限流
+    
+    Returns:
+        被限流时返回429响应，否则返回None
+    """
+    key_id = g.get('api_key_id')
+    if key_id is not None:
+        return check_rate_limit(f'key:{key_id}', route)
+    if RATE_LIMIT_CONFIG.get('EXEMPT_LOCAL', True):
+        return None
+    return check_rate_limit(f'ip:{request.remote_addr}', route)
+
 # API密钥验证装饰器
 def require_api_key(f):
     """API密钥验证装饰器，用于API端点"""
@@ -45,6 +98,11 @@ def require_api_key(f):
         # 检查请求是否来自本地网络
         if is_local_request():
             # 对本地网络请求跳过API密钥验证
+            g.api_key_id = None
+            if not RATE_LIMIT_CONFIG.get('EXEMPT_LOCAL', True):
+                limited = check_rate_limit(f'ip:{request.remote_addr}')
+                if limited:
+                    return limited
             return f(*args, **kwargs)
         
         # 对非本地请求，要求API密钥
@@ -53,14 +111,20 @@ def require_api_key(f):
         if not api_key:
             return jsonify({'error': 'API key is required'}), 401
         
-        # 检查API密钥是否存在且有效
-        key = ApiKey.query.filter_by(key=api_key, is_active=True).first()
-        if not key:
+        # 检查API密钥是否存在且有效（优先命中内存缓存）
+        key_id = api_key_cache.verify(api_key)
+        if key_id is None:
             return jsonify({'error': 'Invalid or inactive API key'}), 401
         
-        # 更新最后使用时间戳
-        key.last_used_at = datetime.utcnow()
-        db.session.commit()
+        g.api_key_id = key_id
+        
+        # 按密钥和路由类别限流
+        limited = check_rate_limit(f'key:{key_id}')
+        if limited:
+            return limited
+        
+        # 记录使用情况，由后台线程批量更新最后使用时间戳和请求计数
+        api_key_cache.record_usage(key_id)
         
         return f(*args, **kwargs)
     return decorated_function
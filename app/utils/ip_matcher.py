@@ -0,0 +1,93 @@
+"""
+IP允许列表匹配工具
+
+启动时把允许列表预编译为三类规则：
+- 精确IP地址：哈希集合查找
+- CIDR网段：按前缀长度分组的网络地址集合，查找次数只与不同前缀长度的个数有关
+- 正则表达式：合并为一个预编译的正则
+并用LRU缓存每个客户端IP的判定结果。
+"""
+import re
+import ipaddress
+from functools import lru_cache
+from app.utils.logger import get_logger
+
+logger = get_logger('ip_matcher')
+
+class IPAllowlist:
+    """预编译的IP允许列表"""
+
+    def __init__(self, patterns, cache_size=4096):
+        """
+        Args:
+            patterns: 允许列表，元素可以是精确IP、CIDR网段（如 '10.0.0.0/8'）或正则表达式
+            cache_size: 判定结果LRU缓存的大小
+        """
+        self.exact = set()
+        # (版本, 前缀长度) -> 网络地址整数集合
+        self.networks = {}
+        regexes = []
+
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if not pattern:
+                continue
+            try:
+                self.exact.add(str(ipaddress.ip_address(pattern)))
+                continue
+            except ValueError:
+                pass
+            if '/' in pattern:
+                try:
+                    network = ipaddress.ip_network(pattern, strict=False)
+                    key = (network.version, network.prefixlen)
+                    self.networks.setdefault(key, set()).add(int(network.network_address))
+                    continue
+                except ValueError:
+                    pass
+            try:
+                regexes.append(re.compile(pattern))
+            except re.error:
+                # 如果正则表达式无效，则跳过该模式
+                logger.warning(f"忽略无效的IP匹配模式: {pattern}")
+
+        self.regex = None
+        if regexes:
+            try:
+                self.regex = re.compile('|'.join(f'(?:{regex.pattern})' for regex in regexes))
+            except re.error:
+                # 合并后的正则无法编译（如包含反向引用）时逐个匹配
+                self.regex = None
+        self.regexes = regexes
+        self.contains = lru_cache(maxsize=cache_size)(self._contains)
+
+    def _contains(self, client_ip):
+        """判断IP是否在允许列表中（无缓存）"""
+        if not client_ip:
+            return False
+        if client_ip in self.exact:
+            return True
+
+        try:
+            address = ipaddress.ip_address(client_ip)
+        except ValueError:
+            address = None
+
+        if address is not None:
+            # IPv4映射的IPv6地址（::ffff:a.b.c.d）按IPv4地址匹配
+            if address.version == 6 and address.ipv4_mapped:
+                address = address.ipv4_mapped
+            if str(address) in self.exact:
+                return True
+            value = int(address)
+            max_prefix = address.max_prefixlen
+            for (version, prefixlen), network_addresses in self.networks.items():
+                if version != address.version:
+                    continue
+                mask = ((1 << prefixlen) - 1) << (max_prefix - prefixlen)
+                if value & mask in network_addresses:
+                    return True
+
+        if self.regex is not None:
+            return self.regex.match(client_ip) is not None
+        return any(regex.match(client_ip) for regex in self.regexes)
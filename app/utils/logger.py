@@ -2,11 +2,15 @@
 日志工具模块
 """
 import os
-import logging
-from logging.handlers import RotatingFileHandler
 import sys
+import time
+import queue
+import atexit
+import logging
+import threading
 import traceback
-from app.config import LOG_LEVEL, LOG_DIR
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+from app.config import LOG_LEVEL, LOG_DIR, LOG_FILE_NAME, LOG_SAMPLE_INTERVAL
 
 # 确保日志目录存在
 def ensure_log_dir_exists(log_dir=LOG_DIR):
@@ -14,10 +18,51 @@ def ensure_log_dir_exists(log_dir=LOG_DIR):
         os.makedirs(log_dir)
     return log_dir
 
+# 共享的日志输出管道：所有记录器把日志记录放入队列，
+# 由后台 QueueListener 线程统一写到控制台和同一个滚动日志文件，请求线程不会阻塞在磁盘IO上
+_log_queue = queue.SimpleQueue()
+_queue_handler = QueueHandler(_log_queue)
+_queue_listener = None
+_listener_lock = threading.Lock()
+
+def _start_queue_listener(log_dir=LOG_DIR):
+    """启动共享的后台日志写入线程（只启动一次）"""
+    global _queue_listener
+    with _listener_lock:
+        if _queue_listener is not None:
+            return _queue_listener
+
+        log_dir = ensure_log_dir_exists(log_dir)
+
+        # 创建格式化器
+        formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d:%(funcName)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+
+        # 创建控制台处理器
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(formatter)
+
+        # 创建文件处理器 (每个文件最大10MB，保留5个备份)
+        file_handler = RotatingFileHandler(
+            os.path.join(log_dir, LOG_FILE_NAME),
+            maxBytes=10*1024*1024,  # 10MB
+            backupCount=5,
+            encoding='utf-8'
+        )
+        file_handler.setFormatter(formatter)
+
+        _queue_listener = QueueListener(_log_queue, console_handler, file_handler, respect_handler_level=True)
+        _queue_listener.start()
+        # 进程退出时写完队列中剩余的日志
+        atexit.register(_queue_listener.stop)
+        return _queue_listener
+
 # 配置日志记录器
 def setup_logger(name='puzzle', log_level=LOG_LEVEL, log_dir=LOG_DIR):
     """
-    设置日志记录器，同时输出到控制台和文件
+    设置日志记录器，通过共享队列同时输出到控制台和文件
 
     Args:
         name: 日志记录器名称
@@ -27,8 +72,7 @@ def setup_logger(name='puzzle', log_level=LOG_LEVEL, log_dir=LOG_DIR):
     Returns:
         配置好的日志记录器
     """
-    # 确保日志目录存在
-    log_dir = ensure_log_dir_exists(log_dir)
+    _start_queue_listener(log_dir)
 
     # 创建日志记录器
     logger = logging.getLogger(name)
@@ -38,25 +82,9 @@ def setup_logger(name='puzzle', log_level=LOG_LEVEL, log_dir=LOG_DIR):
     if logger.handlers:
         return logger
 
-    # 创建格式化器
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d:%(funcName)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-
-    # 创建控制台处理器
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-
-    # 创建文件处理器 (每个文件最大10MB，保留5个备份)
-    file_handler = RotatingFileHandler(
-        os.path.join(log_dir, f'{name}.log'),
-        maxBytes=10*1024*1024,  # 10MB
-        backupCount=5
-    )
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    logger.addHandler(_queue_handler)
+    # 已由共享管道输出，避免经父记录器重复输出
+    logger.propagate = False
 
     return logger
 
@@ -75,15 +103,51 @@ def get_logger(module_name=None):
         配置好的日志记录器
     """
     if module_name is None:
-        # 获取调用者的模块名称
-        import inspect
-        frame = inspect.stack()[1]
-        module = inspect.getmodule(frame[0])
-        module_name = module.__name__ if module else 'unknown'
+        # 直接读取调用者栈帧的全局变量，不构建完整的调用栈
+        module_name = sys._getframe(1).f_globals.get('__name__', 'unknown')
 
     # 创建或获取日志记录器
     return setup_logger(f'puzzle.{module_name}')
 
+# 采样状态：key -> (窗口开始时间, 被抑制的条数)
+_sample_state = {}
+_sample_lock = threading.Lock()
+# 采样键数量上限，防止大量不同键（如随机IP）占用内存
+_SAMPLE_STATE_LIMIT = 10000
+
+def log_sampled(logger, key, message, level=logging.WARNING, interval=None):
+    """
+    按时间窗口采样记录高频日志
+
+    同一个key在一个时间窗口内只记录第一条，窗口结束后的下一条会附带被抑制的条数。
+
+    Args:
+        logger: 日志记录器
+        key: 采样键，相同键的日志共享时间窗口
+        message: 日志消息
+        level: 日志级别，默认为WARNING
+        interval: 时间窗口（秒），默认使用配置中的LOG_SAMPLE_INTERVAL，0表示不采样
+    """
+    if interval is None:
+        interval = LOG_SAMPLE_INTERVAL
+    if not interval or interval <= 0:
+        logger.log(level, message, stacklevel=2)
+        return
+
+    now = time.monotonic()
+    with _sample_lock:
+        window_start, suppressed = _sample_state.get(key, (None, 0))
+        if window_start is not None and now - window_start < interval:
+            _sample_state[key] = (window_start, suppressed + 1)
+            return
+        if len(_sample_state) >= _SAMPLE_STATE_LIMIT:
+            _sample_state.clear()
+        _sample_state[key] = (now, 0)
+
+    if suppressed:
+        message = f"{message} (过去 {interval} 秒内另有 {suppressed} 条相同日志被抑制)"
+    logger.log(level, message, stacklevel=2)
+
 def log_exception(logger, message="An exception occurred", exc_info=None, level=logging.ERROR):
     """
     记录异常信息，包括完整的堆栈跟踪
@@ -0,0 +1,87 @@
+"""
+基于游标（keyset）的分页工具
+
+按 (created_at, id) 倒序分页，每页只需要一次走索引的范围查询，
+不再需要 COUNT(*) 和 OFFSET，因此深页与第一页的开销相同。
+"""
+import json
+import base64
+import binascii
+from datetime import datetime
+from sqlalchemy import tuple_
+from app.models import DataEntry
+
+class InvalidCursorError(ValueError):
+    """游标无法解析"""
+    pass
+
+def encode_cursor(entry, direction):
+    """
+    将条目的排序键编码为不透明游标
+
+    Args:
+        entry: 作为边界的条目
+        direction: 'next' 表示取该条目之后（更旧）的条目，'prev' 表示取之前（更新）的条目
+    """
+    payload = json.dumps([entry.created_at.isoformat(), entry.id, direction], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    解析游标
+
+    Returns:
+        (created_at, id, direction) 元组
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, entry_id, direction = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if direction not in ('next', 'prev'):
+            raise ValueError(direction)
+        return datetime.fromisoformat(created_at), int(entry_id), direction
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise InvalidCursorError(f'Invalid cursor: {cursor}') from e
+
+def keyset_paginate(query, cursor=None, per_page=20):
+    """
+    按 (created_at, id) 倒序对查询进行游标分页
+
+    Args:
+        query: DataEntry 查询（可已带过滤条件）
+        cursor: encode_cursor 生成的游标，为空时返回第一页
+        per_page: 每页条目数
+
+    Returns:
+        {'items': [...], 'next': 游标或None, 'prev': 游标或None}
+    """
+    sort_key = tuple_(DataEntry.created_at, DataEntry.id)
+    direction = 'next'
+
+    if cursor:
+        created_at, entry_id, direction = decode_cursor(cursor)
+        if direction == 'next':
+            query = query.filter(sort_key < (created_at, entry_id))
+        else:
+            query = query.filter(sort_key > (created_at, entry_id))
+
+    if direction == 'next':
+        query = query.order_by(DataEntry.created_at.desc(), DataEntry.id.desc())
+    else:
+        query = query.order_by(DataEntry.created_at.asc(), DataEntry.id.asc())
+
+    # 多取一条用于判断当前方向上是否还有更多数据
+    items = query.limit(per_page + 1).all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+
+    if direction == 'next':
+        has_next, has_prev = has_more, bool(cursor)
+    else:
+        items.reverse()
+        has_next, has_prev = True, has_more
+
+    return {
+        'items': items,
+        'next': encode_cursor(items[-1], 'next') if items and has_next else None,
+        'prev': encode_cursor(items[0], 'prev') if items and has_prev else None
+    }
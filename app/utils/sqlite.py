@@ -0,0 +1,62 @@
+"""
+SQLite连接工具
+"""
+from sqlalchemy import event, inspect
+from app.config import SQLITE_CONFIG
+from app.utils.logger import get_logger
+
+logger = get_logger('sqlite')
+
+def configure_sqlite_engine(engine):
+    """
+    为SQLite引擎的每个新连接设置日志模式和忙等待超时
+
+    WAL模式允许读操作与分块提交的批量导入并发进行，
+    busy_timeout让写操作在锁被占用时等待而不是立即失败。
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    journal_mode = SQLITE_CONFIG.get('JOURNAL_MODE')
+    busy_timeout = SQLITE_CONFIG.get('BUSY_TIMEOUT_MS')
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if journal_mode:
+                cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+            if busy_timeout:
+                cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout)}')
+        finally:
+            cursor.close()
+
+    logger.info(f"SQLite engine configured: journal_mode={journal_mode}, busy_timeout={busy_timeout}ms")
+
+def add_missing_columns(engine, tables):
+    """
+    为已存在的表补加模型中新增的列（ALTER TABLE ADD COLUMN 只修改表结构定义，不重写数据）
+
+    仅支持可为空或带标量默认值的列。
+
+    Returns:
+        新增的 "表.列" 名称列表
+    """
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as connection:
+        for table in tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+                if column.default is not None and column.default.is_scalar:
+                    ddl += f' DEFAULT {column.default.arg!r}'
+                connection.exec_driver_sql(ddl)
+                logger.info(f"Added column {table.name}.{column.name}")
+                added.append(f'{table.name}.{column.name}')
+    return added
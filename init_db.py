@@ -1,10 +1,22 @@
 """
 数据库初始化脚本
+
+从 origin_data 目录流式加载语料：多进程并行解析，按块去重并用 executemany 写入，逐块提交。
+
+用法：
+    python init_db.py             # 数据库为空时加载语料
+    python init_db.py --rebuild   # 清空条目表后重新加载
+    python init_db.py --incremental  # 只导入上次导入之后追加到文件中的记录
 """
 import os
-import re
+import sys
+import argparse
 from app import create_app, db
-from app.models import DataEntry
+from app.config import INGEST_CONFIG
+from app.models import DataEntry, ImportState
+from app.services.corpus_loader import load_corpus, CATEGORY_MAPPING
+from app.services.near_duplicates import near_duplicate_index
+from app.services.search_index import search_index
 from app.utils.logger import get_logger, log_exception
 
 # 获取当前模块的日志记录器
@@ -13,66 +25,18 @@ logger = get_logger()
 # 数据文件目录
 DATA_DIR = "origin_data"
 
-# 类别映射（文件名到类别的映射）
-CATEGORY_MAPPING = {
-    "riddle.txt": "riddle",
-    "joke.txt": "joke",
-    "idiom.txt": "idiom",
-    "brain_teaser.txt": "brain_teaser"
-}
-
-def load_data_from_files():
-    """从文件中加载数据"""
-    data = []
-
-    # 检查数据目录是否存在
-    if not os.path.exists(DATA_DIR):
-        logger.warning(f"数据目录 {DATA_DIR} 不存在")
-        return data
-
-    # 遍历数据目录中的所有文件
-    for filename in os.listdir(DATA_DIR):
-        if filename in CATEGORY_MAPPING:
-            category = CATEGORY_MAPPING[filename]
-            file_path = os.path.join(DATA_DIR, filename)
-
-            try:
-                # 读取文件内容
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-
-                # 分割条目
-                entries = content.split('---')
-
-                for entry in entries:
-                    entry = entry.strip()
-                    if not entry:
-                        continue
-
-                    # 解析问题和答案
-                    match = re.search(r'问题：(.*?)[\r\n]+答案:(.*)', entry, re.DOTALL)
-                    if match:
-                        question = match.group(1).strip()
-                        answer = match.group(2).strip()
-
-                        if question and answer:
-                            data.append({
-                                "question": question,
-                                "answer": answer,
-                                "category": category
-                            })
-                    else:
-                        logger.warning(f"无法解析条目: {entry[:50]}...")
-
-                logger.info(f"从 {filename} 加载了 {len(entries)} 个条目")
-            except Exception as e:
-                logger.error(f"加载文件 {filename} 时出错: {str(e)}")
-
-    logger.info(f"总共加载了 {len(data)} 个条目")
-    return data
-
-def init_db():
-    """初始化数据库"""
+def rebuild_table():
+    """删除并重建条目表，比逐行删除快，也会重置自增ID；同时清空导入状态和近似重复签名"""
+    DataEntry.__table__.drop(db.engine, checkfirst=True)
+    DataEntry.__table__.create(db.engine)
+    ImportState.query.delete()
+    # 重置后的ID会被新条目重用，旧签名必须清除
+    near_duplicate_index.clear(db.session)
+    db.session.commit()
+    logger.info("已重建条目表")
+
+def init_db(rebuild=False, incremental=False, chunk_size=None, workers=None, data_dir=DATA_DIR):
+    """初始化数据库，返回进程退出码"""
     try:
         app = create_app()
         with app.app_context():
@@ -80,49 +44,69 @@ def init_db():
             db.create_all()
             logger.info("数据库表已创建或已存在")
 
-            # 检查数据库是否为空
             try:
-                entry_count = DataEntry.query.count()
-                if entry_count == 0:
-                    logger.info("正在从文件加载数据初始化数据库...")
-
-                    # 从文件加载数据
-                    data = load_data_from_files()
-
-                    if not data:
-                        logger.warning("没有找到数据文件或数据文件为空")
-                        return
-
-                    # 添加数据
-                    added_count = 0
-                    for item in data:
-                        # 为问题和答案生成哈希
-                        content_hash = DataEntry.generate_hash(item["question"], item["answer"])
-
-                        # 检查条目是否已存在
-                        existing = DataEntry.query.filter_by(content_hash=content_hash).first()
-                        if not existing:
-                            entry = DataEntry(
-                                question=item["question"],
-                                answer=item["answer"],
-                                category=item["category"],
-                                content_hash=content_hash
-                            )
-                            db.session.add(entry)
-                            added_count += 1
-
-                    db.session.commit()
-                    logger.info(f"已添加 {added_count} 个条目")
-                else:
-                    logger.info(f"数据库已包含 {entry_count} 个条目，跳过初始化。")
+                if rebuild:
+                    rebuild_table()
+                elif not incremental:
+                    # 检查数据库是否为空
+                    entry_count = DataEntry.query.count()
+                    if entry_count > 0:
+                        logger.info(f"数据库已包含 {entry_count} 个条目，跳过初始化。使用 --incremental 导入新增记录或 --rebuild 重新加载")
+                        return 0
+
+                logger.info(f"正在从 {data_dir} 加载数据初始化数据库...")
+                sign_on_write = near_duplicate_index.sign_on_write
+                if not incremental:
+                    # 全量加载时不逐行维护全文索引和近似重复签名，加载完成后一次性重建
+                    search_index.drop_triggers(db.engine)
+                    near_duplicate_index.sign_on_write = False
+                try:
+                    stats = load_corpus(db.session, data_dir,
+                                        chunk_size=chunk_size or INGEST_CONFIG.get("CHUNK_SIZE", 1000),
+                                        workers=workers, incremental=incremental)
+                finally:
+                    if not incremental:
+                        search_index.ensure(db.engine)
+                        near_duplicate_index.sign_on_write = sign_on_write
+                if sign_on_write and not incremental:
+                    near_duplicate_index.sync(db.session, workers=workers or os.cpu_count() or 1)
+                if not stats['files']:
+                    logger.warning(f"数据目录 {data_dir} 中没有找到数据文件（{', '.join(CATEGORY_MAPPING)}）")
+                    return 0
+
+                if stats['inserted']:
+                    # 将新条目同步到随机采样索引
+                    from app.services.sampling_index import sampling_index
+                    sampling_index.refresh(db.session, force=True)
+
+                logger.info(f"各文件导入方式: {stats['modes']}，各类别解析条目数: {stats['categories']}")
+                print(f"parsed {stats['parsed']} records from {stats['files']} files in {stats['seconds']:.2f}s "
+                      f"({stats['records_per_second']:.0f} records/s): inserted {stats['inserted']}, "
+                      f"duplicates {stats['duplicates']}, unparsable {stats['skipped']}")
+                return 0
             except Exception:
                 # 记录异常信息，包括完整的堆栈跟踪
                 log_exception(logger, "检查或添加数据时出错")
                 db.session.rollback()
+                return 1
     except Exception:
         # 记录异常信息，包括完整的堆栈跟踪
-        logger.error("初始化数据库时出错")
-        # log_exception(logger, "初始化数据库时出错")
+        log_exception(logger, "初始化数据库时出错")
+        return 1
+
+def main():
+    parser = argparse.ArgumentParser(description='从语料文件初始化数据库')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--rebuild', action='store_true', help='清空条目表后重新加载所有语料')
+    mode.add_argument('--incremental', action='store_true',
+                      help='只解析上次导入之后追加的记录，文件被截断或改写时从头校验')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help=f"每个事务写入的条目数（默认 {INGEST_CONFIG.get('CHUNK_SIZE', 1000)}）")
+    parser.add_argument('--workers', type=int, default=None, help='解析进程数，默认为CPU核数，1表示不使用子进程')
+    parser.add_argument('--data-dir', default=DATA_DIR, help=f'语料目录（默认 {DATA_DIR}）')
+    args = parser.parse_args()
+    return init_db(rebuild=args.rebuild, incremental=args.incremental, chunk_size=args.chunk_size,
+                   workers=args.workers, data_dir=args.data_dir)
 
 if __name__ == "__main__":
-    init_db()
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+数据库迁移脚本
+
+为已有数据库在线补加模型中新增的列、补建索引（不重建表），并执行 ANALYZE 更新统计信息。
+
+用法：
+    python migrate_db.py          # 补加缺失的列、补建缺失的索引并执行 ANALYZE
+    python migrate_db.py --check  # 用 EXPLAIN QUERY PLAN 检查热点查询是否走索引
+"""
+import re
+import sys
+import time
+import argparse
+from datetime import datetime
+from types import SimpleNamespace
+from sqlalchemy import event, inspect
+from app import create_app, db
+from app.models import DataEntry, ApiKey, Job, ImportState, EntrySignature, LshBucket
+from app.utils.logger import get_logger, log_exception
+from app.utils.sqlite import add_missing_columns
+
+# 获取当前模块的日志记录器
+logger = get_logger()
+
+# 需要迁移的模型
+MODELS = [DataEntry, ApiKey, Job, ImportState, EntrySignature, LshBucket]
+
+# 执行计划中表示全表扫描或额外排序的步骤
+FULL_SCAN_PATTERN = re.compile(r'^SCAN (TABLE )?data_entries$')
+TEMP_SORT_PATTERN = re.compile(r'USE TEMP B-TREE FOR ORDER BY')
+
+def add_missing_indexes():
+    """补建缺失的索引，返回新建的索引名列表"""
+    inspector = inspect(db.engine)
+    created = []
+    for model in MODELS:
+        table = model.__table__
+        if not inspector.has_table(table.name):
+            # 新表由 create_all 连同索引一起创建
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            start = time.perf_counter()
+            index.create(bind=db.engine, checkfirst=True)
+            logger.info(f"已创建索引 {index.name}，耗时 {time.perf_counter() - start:.2f}s")
+            created.append(index.name)
+    return created
+
+def analyze():
+    """执行 ANALYZE 更新查询规划器的统计信息"""
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql('ANALYZE')
+    logger.info("ANALYZE 完成")
+
+def capture_selects(func):
+    """执行func并捕获其发出的SELECT语句及参数"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return statements
+
+def hot_queries():
+    """返回 (名称, 执行热点查询的函数) 列表，查询均来自实际的业务代码路径"""
+    from app.services.bulk_ingest import find_existing_hashes
+    from app.utils.pagination import keyset_paginate, encode_cursor
+
+    boundary = SimpleNamespace(created_at=datetime.utcnow(), id=2 ** 31)
+    next_cursor = encode_cursor(boundary, 'next')
+    prev_cursor = encode_cursor(boundary, 'prev')
+
+    return [
+        ('browse first page', lambda: keyset_paginate(DataEntry.query)),
+        ('browse next page', lambda: keyset_paginate(DataEntry.query, cursor=next_cursor)),
+        ('browse category first page', lambda: keyset_paginate(DataEntry.query.filter_by(category='riddle'))),
+        ('browse category next page',
+         lambda: keyset_paginate(DataEntry.query.filter_by(category='riddle'), cursor=next_cursor)),
+        ('browse category prev page',
+         lambda: keyset_paginate(DataEntry.query.filter_by(category='riddle'), cursor=prev_cursor)),
+        ('category count', lambda: DataEntry.query.filter_by(category='riddle').count()),
+        ('content_hash lookup', lambda: find_existing_hashes(db.session, ['0' * 32, '1' * 32])),
+    ]
+
+def check_query_plans():
+    """
+    检查热点查询的执行计划
+
+    Returns:
+        是否全部走索引
+    """
+    ok = True
+    with db.engine.connect() as connection:
+        for name, func in hot_queries():
+            for statement, parameters in capture_selects(func):
+                plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+                details = [row[-1] for row in plan]
+                bad = [d for d in details if FULL_SCAN_PATTERN.match(d) or TEMP_SORT_PATTERN.search(d)]
+                status = 'FAIL' if bad else 'OK'
+                print(f"[{status}] {name}: {' | '.join(details)}")
+                if bad:
+                    ok = False
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description='数据库迁移：补建索引并更新统计信息')
+    parser.add_argument('--check', action='store_true', help='检查热点查询的执行计划，不做修改')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        try:
+            if args.check:
+                return 0 if check_query_plans() else 1
+
+            added = add_missing_columns(db.engine, [model.__table__ for model in MODELS])
+            if added:
+                logger.info(f"共新增 {len(added)} 个列: {', '.join(added)}")
+
+            created = add_missing_indexes()
+            if created:
+                logger.info(f"共新建 {len(created)} 个索引: {', '.join(created)}")
+            else:
+                logger.info("所有索引均已存在")
+            analyze()
+            return 0
+        except Exception:
+            log_exception(logger, "数据库迁移失败")
+            return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
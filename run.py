@@ -1,10 +1,21 @@
 """
 应用入口点
 """
+import os
 from app import create_app
+from app.config import JOB_QUEUE_CONFIG
+from app.services.api_key_cache import api_key_cache
+from app.services.job_queue import job_queue
 
 app = create_app()
 
+# 只在处理请求的进程中启动后台线程（API密钥使用情况写回、任务工作线程）；
+# 调试模式下重载器的父进程只监视文件变化
+if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    api_key_cache.start(app)
+    if JOB_QUEUE_CONFIG.get("START_WORKERS", True):
+        job_queue.start(app)
+
 if __name__ == '__main__':
     # 使用0.0.0.0作为主机以允许外部访问API接口
     # Web管理界面通过装饰器限制只能从本地访问
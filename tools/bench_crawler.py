@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+爬虫吞吐基准测试脚本
+
+启动本地测试站点（tools/crawl_fixture.py），对比：
+- 串行抓取、每个请求新建连接的 requests.get（旧实现）
+- 不同工作线程数的爬虫引擎（共享长连接会话）
+- 页面缓存：首次抓取、条件请求重新验证（304）和只读缓存的离线重新提取
+- 站点并发能力受限时引擎的自适应限速（超过容量的请求返回503）
+
+用法：
+    python tools/bench_crawler.py --pages 10 --items 20 --latency 0.02
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import requests
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+from crawl_engine import Politeness
+from crawl_fixture import FixtureSite
+from page_cache import PageCache
+from riddle_crawler import HEADERS, RiddleCrawler, decode_page, list_page_url, parse_detail_page, parse_list_page
+
+
+def crawl_serial(base_url):
+    """旧实现：逐页串行抓取，每个请求单独建立连接"""
+    etmy_url = f"{base_url}/etmy/"
+    riddles = 0
+    fetched = 0
+    page = 1
+    while True:
+        response = requests.get(list_page_url(etmy_url, page), headers=HEADERS, timeout=10)
+        fetched += 1
+        items = parse_list_page(decode_page(response), base_url) if response.status_code == 200 else []
+        if not items:
+            break
+        for question, detail_url in items:
+            detail = requests.get(detail_url, headers=HEADERS, timeout=10)
+            fetched += 1
+            if detail.status_code == 200 and parse_detail_page(decode_page(detail)):
+                riddles += 1
+        page += 1
+    return riddles, fetched
+
+
+def report(title, riddles, fetched, seconds, extra=''):
+    print(f"{title:<28} riddles={riddles:<5} pages={fetched:<5} {seconds:6.2f}s  {fetched / seconds:7.1f} pages/s {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='爬虫吞吐基准测试')
+    parser.add_argument('--pages', type=int, default=10, help='有谜语的列表页数')
+    parser.add_argument('--items', type=int, default=20, help='每个列表页的谜语数')
+    parser.add_argument('--latency', type=float, default=0.02, help='测试站点每个响应的延迟（秒）')
+    parser.add_argument('--workers', default='1,4,8,16', help='要测试的工作线程数，逗号分隔')
+    parser.add_argument('--capacity', type=int, default=4, help='限速阶段测试站点的并发容量')
+    args = parser.parse_args()
+
+    site = FixtureSite(args.pages, args.items, args.latency).start()
+    expected = args.pages * args.items
+    print(f"fixture: {args.pages} list pages x {args.items} riddles, {args.latency * 1000:.0f}ms latency, "
+          f"{expected} riddles expected")
+
+    start = time.perf_counter()
+    riddles, fetched = crawl_serial(site.base_url)
+    report('serial requests.get', riddles, fetched, time.perf_counter() - start)
+
+    for workers in [int(value) for value in args.workers.split(',')]:
+        crawler = RiddleCrawler(site.base_url, prefetch=2)
+        stats = crawler.crawl(workers=workers, politeness=Politeness(max_concurrency=workers, initial_concurrency=workers))
+        report(f'engine workers={workers}', len(crawler.riddles), stats['fetched'], stats['seconds'])
+
+    cache_dir = tempfile.mkdtemp(prefix='bench_page_cache_')
+    try:
+        cache = PageCache(cache_dir)
+        workers = max(int(value) for value in args.workers.split(','))
+        phases = [('cache: cold', False), ('cache: revalidate (304)', False), ('cache: offline replay', True)]
+        for title, offline in phases:
+            if title.startswith('cache: revalidate'):
+                # 模拟站点更新了少量详情页
+                site.revisions.update({riddle_id: 2 for riddle_id in range(1, 6)})
+            crawler = RiddleCrawler(site.base_url, prefetch=2, revalidate=True)
+            stats = crawler.crawl(workers=workers, cache=cache, offline=offline,
+                                  politeness=Politeness(max_concurrency=workers, initial_concurrency=workers))
+            report(title, len(crawler.riddles), stats['fetched'] + stats['not_modified'], stats['seconds'],
+                   f"(304s={stats['not_modified']}, unchanged details={crawler.unchanged})")
+        cache_stats = cache.get_stats()
+        print(f"page cache: {cache_stats['pages']} pages, {cache_stats['objects']} objects, "
+              f"{cache_stats['bytes'] / 1024:.0f} KiB on disk")
+        cache.close()
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    site.capacity = args.capacity
+    site.requests['rejected'] = 0
+    crawler = RiddleCrawler(site.base_url, prefetch=2)
+    stats = crawler.crawl(workers=16, politeness=Politeness(max_concurrency=16, initial_concurrency=16))
+    host = next(iter(stats['hosts'].values()))
+    report(f'capacity={args.capacity}, workers=16', len(crawler.riddles), stats['fetched'], stats['seconds'],
+           f"(503s={site.requests['rejected']}, retried={stats['retried']}, failed={stats['failed']}, "
+           f"final limit={host['limit']})")
+    site.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+LLM批量请求基准测试脚本
+
+启动一个本地的OpenAI格式测试桩服务（每个请求固定延迟），对比：
+- 逐个调用 chat_completion（客户端顺序调用 /api/llm/generate 的情形）
+- LLMService.batch_chat_completion 并发执行
+
+并发执行的总耗时应接近 ceil(提示数 / 服务并发上限) 次单次调用的耗时。
+
+用法：
+    python tools/bench_llm_batch.py --prompts 20 --response-delay 0.5
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+
+
+def make_stub_handler(response_delay):
+    """创建测试桩请求处理器，记录同时处理中的请求数峰值"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+        lock = threading.Lock()
+        active = 0
+        peak = 0
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            with StubHandler.lock:
+                StubHandler.active += 1
+                StubHandler.peak = max(StubHandler.peak, StubHandler.active)
+            time.sleep(response_delay)
+            with StubHandler.lock:
+                StubHandler.active -= 1
+            body = json.dumps({
+                'model': request.get('model', 'stub'),
+                'choices': [{'message': {'role': 'assistant', 'content': 'ok'}, 'finish_reason': 'stop'}],
+                'usage': {}
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LLM批量请求基准测试')
+    parser.add_argument('--prompts', type=int, default=20, help='提示数')
+    parser.add_argument('--response-delay', type=float, default=0.5, help='测试桩每个请求的处理延迟（秒）')
+    parser.add_argument('--concurrency', type=int, default=None, help='覆盖deepseek的并发上限')
+    args = parser.parse_args()
+
+    handler = make_stub_handler(args.response_delay)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/v1/chat/completions'
+
+    from app.services.llm_service import LLMService
+    service = LLMService(api_keys={'deepseek': 'stub'}, api_urls={'deepseek': url},
+                         cache_config={'ENABLED': False}, provider_limits={'deepseek': None})
+    if args.concurrency:
+        # 并发上限同时决定该服务批量线程池的大小（线程池在第一次批量请求时创建）
+        service.batch_config['PROVIDER_CONCURRENCY'] = {**service.batch_config['PROVIDER_CONCURRENCY'],
+                                                        'deepseek': args.concurrency}
+        service._provider_semaphores['deepseek'] = threading.BoundedSemaphore(args.concurrency)
+    requests_list = [{'messages': [{'role': 'user', 'content': f'prompt {i}'}], 'model': 'deepseek-chat'}
+                     for i in range(args.prompts)]
+
+    start = time.perf_counter()
+    for request in requests_list:
+        service.chat_completion(**request)
+    sequential_s = time.perf_counter() - start
+
+    handler.peak = 0
+    start = time.perf_counter()
+    results = service.batch_chat_completion(requests_list)
+    batch_s = time.perf_counter() - start
+    failed = sum(1 for _, error in results if error is not None)
+
+    server.shutdown()
+
+    print(f"prompts={args.prompts}, response_delay={args.response_delay * 1000:.0f}ms, "
+          f"deepseek concurrency={service._provider_semaphores['deepseek']._initial_value}")
+    print(f"{'mode':<12} | {'total s':>8} | {'peak in-flight':>14}")
+    print(f"{'sequential':<12} | {sequential_s:>8.2f} | {1:>14}")
+    print(f"{'batch':<12} | {batch_s:>8.2f} | {handler.peak:>14}")
+    print(f"speedup: {sequential_s / batch_s:.1f}x, failed: {failed}")
+
+
+if __name__ == '__main__':
+    main()
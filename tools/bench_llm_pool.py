@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+LLM连接复用基准测试脚本
+
+启动一个本地的OpenAI格式测试桩服务，对比：
+- 每次调用都新建连接的 requests.post（旧实现）
+- LLMService 的长连接会话（新实现）
+
+测试桩可以为每个新连接增加固定延迟，用来模拟真实服务的TCP+TLS握手开销。
+
+用法：
+    python tools/bench_llm_pool.py --requests 200 --connect-delay 0.03
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+
+
+def make_stub_handler(connect_delay, response_delay):
+    """创建测试桩请求处理器"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # 响应头和响应体分两次写出，关闭Nagle算法以免长连接上出现延迟确认的等待
+        disable_nagle_algorithm = True
+        connections = 0
+
+        def setup(self):
+            super().setup()
+            # 模拟新连接的握手开销
+            StubHandler.connections += 1
+            time.sleep(connect_delay)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            time.sleep(response_delay)
+            body = json.dumps({
+                'model': request.get('model', 'stub'),
+                'choices': [{'message': {'role': 'assistant', 'content': 'ok'}, 'finish_reason': 'stop'}],
+                'usage': {}
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def run_serial(func, count):
+    """串行调用count次，返回平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) * 1000 / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LLM连接复用基准测试')
+    parser.add_argument('--requests', type=int, default=100, help='每种实现的请求次数')
+    parser.add_argument('--connect-delay', type=float, default=0.03, help='测试桩为每个新连接增加的延迟（秒）')
+    parser.add_argument('--response-delay', type=float, default=0.0, help='测试桩每个请求的处理延迟（秒）')
+    args = parser.parse_args()
+
+    handler = make_stub_handler(args.connect_delay, args.response_delay)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/v1/chat/completions'
+
+    from app.services.llm_service import LLMService
+    # 关闭响应缓存和出站限流，只比较连接开销
+    service = LLMService(api_keys={'deepseek': 'stub'}, api_urls={'deepseek': url},
+                         cache_config={'ENABLED': False}, provider_limits={'deepseek': None})
+    messages = [{'role': 'user', 'content': 'ping'}]
+    payload = {'model': 'deepseek-chat', 'messages': messages}
+    headers = {'Authorization': 'Bearer stub'}
+
+    handler.connections = 0
+    bare_ms = run_serial(lambda: requests.post(url, json=payload, headers=headers).json(), args.requests)
+    bare_connections = handler.connections
+
+    handler.connections = 0
+    pooled_ms = run_serial(lambda: service.chat_completion(messages, model='deepseek-chat'), args.requests)
+    pooled_connections = handler.connections
+
+    server.shutdown()
+
+    print(f"requests={args.requests}, connect_delay={args.connect_delay * 1000:.0f}ms, "
+          f"response_delay={args.response_delay * 1000:.0f}ms")
+    print(f"{'mode':<16} | {'avg ms':>8} | {'connections':>11}")
+    print(f"{'requests.post':<16} | {bare_ms:>8.2f} | {bare_connections:>11}")
+    print(f"{'pooled session':<16} | {pooled_ms:>8.2f} | {pooled_connections:>11}")
+    print(f"saved per call: {bare_ms - pooled_ms:.2f}ms")
+    print(f"stats: {json.dumps(service.get_stats(), ensure_ascii=False)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+LLM路由基准测试脚本
+
+为 deepseek / qianwen / openrouter 各启动一个本地测试桩服务，分阶段调整各服务的延迟和错误，
+通过模型组路由发送请求，观察：
+- 请求是否流向当前最快的健康服务
+- 主服务出现长尾延迟时对冲请求能否压低 p95
+- 持续失败（5xx）的服务是否被熔断，冷却后能否恢复
+- 请求本身有误（400）时错误直接返回，不切换服务也不触发熔断
+
+用法：
+    python tools/bench_llm_router.py --requests 40
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+
+
+class StubProvider:
+    """可在运行中调整延迟、长尾概率和失败状态的测试桩服务"""
+
+    def __init__(self, name, qianwen_format=False):
+        self.name = name
+        self.delay = 0.05
+        self.tail_delay = 0.0
+        self.tail_ratio = 0.0
+        self.failing = False
+        # failing 为True时返回的状态码
+        self.failing_status = 503
+        self.calls = 0
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                provider.calls += 1
+                delay = provider.delay
+                if provider.tail_ratio and random.random() < provider.tail_ratio:
+                    delay = provider.tail_delay
+                time.sleep(delay)
+                if provider.failing:
+                    self.send_response(provider.failing_status)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                message = {'role': 'assistant', 'content': provider.name}
+                if qianwen_format:
+                    body = {'output': {'message': message, 'finish_reason': 'stop'}}
+                else:
+                    body = {'model': provider.name, 'choices': [{'message': message, 'finish_reason': 'stop'}]}
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/v1/chat/completions'
+
+
+def run_phase(service, title, count):
+    """串行发送count个请求，输出各服务的命中次数和延迟分位"""
+    winners = Counter()
+    latencies = []
+    errors = 0
+    for i in range(count):
+        start = time.perf_counter()
+        try:
+            result = service.chat_completion([{'role': 'user', 'content': f'{title} {i}'}], model='group:bench')
+            winners[result['choices'][0]['message']['content']] += 1
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+    print(f"\n== {title}")
+    print(f"answered by: {dict(winners)}, errors: {errors}, p50 {p50:.0f}ms, p95 {p95:.0f}ms")
+    states = {name: (stats['state'], stats['p50_ms']) for name, stats in service.router.get_stats()['providers'].items()}
+    print(f"provider state/p50: {states}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LLM路由基准测试')
+    parser.add_argument('--requests', type=int, default=40, help='每个阶段的请求数')
+    parser.add_argument('--hedge-after', type=float, default=0.2, help='对冲阈值（秒）')
+    args = parser.parse_args()
+
+    deepseek = StubProvider('deepseek')
+    qianwen = StubProvider('qianwen', qianwen_format=True)
+    openrouter = StubProvider('openrouter')
+
+    from app.config import LLM_CONFIG
+    from app.services.llm_service import LLMService
+    LLM_CONFIG['ROUTING'] = {
+        **LLM_CONFIG.get('ROUTING', {}),
+        'GROUPS': {'bench': ['deepseek-chat', 'qianwen-plus', 'openrouter:openai/gpt-4o']},
+        'HEDGE_AFTER': args.hedge_after,
+        'FAILURE_THRESHOLD': 3,
+        'OPEN_SECONDS': 1.0,
+    }
+    service = LLMService(
+        api_keys={'deepseek': 'stub', 'qianwen': 'stub', 'openrouter': 'stub'},
+        api_urls={'deepseek': deepseek.url, 'qianwen': qianwen.url, 'openrouter': openrouter.url},
+        http_config={'MAX_RETRIES': 0},
+        cache_config={'ENABLED': False},
+        provider_limits={'deepseek': None, 'qianwen': None, 'openrouter': None}
+    )
+
+    deepseek.delay, qianwen.delay, openrouter.delay = 0.03, 0.08, 0.12
+    run_phase(service, 'baseline: deepseek fastest', args.requests)
+
+    deepseek.delay = 0.25
+    run_phase(service, 'deepseek slows down to 250ms', args.requests)
+
+    qianwen.tail_ratio, qianwen.tail_delay = 0.2, 1.0
+    run_phase(service, 'qianwen gets a 20% 1s tail (hedging)', args.requests)
+
+    qianwen.tail_ratio = 0.0
+    qianwen.failing = True
+    run_phase(service, 'qianwen fails (circuit breaker)', args.requests)
+
+    qianwen.failing = False
+    time.sleep(1.1)
+    run_phase(service, 'qianwen recovers after cooldown', args.requests)
+
+    qianwen.failing, qianwen.failing_status = True, 400
+    run_phase(service, 'qianwen rejects the request with 400 (no failover, breaker stays closed)', args.requests)
+    qianwen.failing = False
+
+    stats = service.router.get_stats()
+    print(f"\nrouter: requests={stats['requests']}, hedged={stats['hedged']}, "
+          f"hedge_wins={stats['hedge_wins']}, failovers={stats['failovers']}")
+    print(f"upstream calls: deepseek={deepseek.calls}, qianwen={qianwen.calls}, openrouter={openrouter.calls}")
+
+
+if __name__ == '__main__':
+    main()
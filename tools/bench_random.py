@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+/api/random 基准测试脚本
+
+在临时SQLite数据库中生成不同规模的数据，对比：
+- ORDER BY RANDOM() LIMIT n（旧实现）
+- 随机采样索引 + WHERE id IN (...)（新实现）
+
+用法：
+    python tools/bench_random.py --sizes 10000 100000 1000000 --count 10
+"""
+
+import os
+import sys
+import time
+import argparse
+import sqlite3
+import tempfile
+from datetime import datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+
+CATEGORIES = ['riddle', 'joke', 'idiom', 'brain_teaser']
+
+
+def populate(db_path, size):
+    """用sqlite3直接批量写入测试数据"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS data_entries (
+            id INTEGER PRIMARY KEY,
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            category VARCHAR(10) NOT NULL,
+            content_hash VARCHAR(32) NOT NULL UNIQUE,
+            created_at DATETIME
+        )
+    """)
+    now = datetime.utcnow().isoformat(sep=' ')
+    rows = ((f"问题{i}", f"答案{i}", CATEGORIES[i % len(CATEGORIES)], f"{i:032x}", now) for i in range(size))
+    conn.executemany(
+        "INSERT INTO data_entries (question, answer, category, content_hash, created_at) VALUES (?, ?, ?, ?, ?)",
+        rows
+    )
+    conn.commit()
+    conn.close()
+
+
+def timeit(func, rounds):
+    """返回单次调用的平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) * 1000 / rounds
+
+
+def run(size, count, rounds, category):
+    """对指定规模的数据运行一次对比"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        populate(db_path, size)
+
+        os.environ['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+        from app import create_app, db
+        from app.models import DataEntry
+
+        build_start = time.perf_counter()
+        app = create_app()
+        build_ms = (time.perf_counter() - build_start) * 1000
+        client = app.test_client()
+        url = f'/api/random/{count}' + (f'?category={category}' if category else '')
+
+        def order_by_random():
+            with app.app_context():
+                query = DataEntry.query
+                if category:
+                    query = query.filter_by(category=category)
+                query.count()
+                query.order_by(db.func.random()).limit(count).all()
+
+        def sampling_index():
+            response = client.get(url)
+            assert response.status_code == 200 and len(response.get_json()) == count
+
+        legacy_ms = timeit(order_by_random, rounds)
+        index_ms = timeit(sampling_index, rounds)
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+    print(f"{size:>10} | {legacy_ms:>18.2f} | {index_ms:>16.2f} | {build_ms:>14.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='/api/random 基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='数据规模')
+    parser.add_argument('--count', type=int, default=10, help='每次请求的条目数')
+    parser.add_argument('--rounds', type=int, default=50, help='每种实现的请求次数')
+    parser.add_argument('--category', default=None, help='可选的类别过滤')
+    args = parser.parse_args()
+
+    print(f"count={args.count}, rounds={args.rounds}, category={args.category or '全部'}")
+    print(f"{'rows':>10} | {'ORDER BY RANDOM ms':>18} | {'sampling index ms':>16} | {'build index ms':>14}")
+    for size in args.sizes:
+        run(size, args.count, args.rounds, args.category)
+
+
+if __name__ == '__main__':
+    main()
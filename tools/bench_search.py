@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+全文搜索基准测试脚本
+
+在临时SQLite数据库中生成不同规模的随机中文条目，对比第一页（20条）搜索结果的耗时：
+- LIKE '%词%' 扫描（问题或答案包含查询词）
+- FTS5 trigram 索引 + bm25 排序（匹配数超过 MAX_RANKED 的常见词按ID顺序返回）
+
+查询分三类：只出现在一条记录中的罕见词、出现在约30%记录中的常见词、以及不存在的词。
+同时报告建立索引的耗时、数据库文件大小，以及索引触发器对批量写入的影响。
+
+用法：
+    python tools/bench_search.py --sizes 100000 1000000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import sqlite3
+import tempfile
+from datetime import datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+
+CATEGORIES = ['riddle', 'joke', 'idiom', 'brain_teaser']
+# 常用汉字区间内的随机字符，避免生成过多重复的三字组合
+CHARSET = [chr(code) for code in range(0x4E00, 0x4E00 + 3000)]
+COMMON_PHRASE = '打一物'
+
+
+def random_text(rng, low, high):
+    return ''.join(rng.choice(CHARSET) for _ in range(rng.randint(low, high)))
+
+
+def populate(db_path, size, seed=42):
+    """用sqlite3直接批量写入测试数据，返回一条记录的问题用于罕见词查询"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS data_entries (
+            id INTEGER PRIMARY KEY,
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            category VARCHAR(10) NOT NULL,
+            content_hash VARCHAR(32) NOT NULL UNIQUE,
+            created_at DATETIME
+        )
+    """)
+    now = datetime.utcnow().isoformat(sep=' ')
+
+    def rows():
+        for i in range(size):
+            question = random_text(rng, 10, 30)
+            if i % 10 < 3:
+                question += f'（{COMMON_PHRASE}）'
+            yield question, random_text(rng, 2, 12), CATEGORIES[i % len(CATEGORIES)], f"{i:032x}", now
+
+    conn.executemany(
+        "INSERT INTO data_entries (question, answer, category, content_hash, created_at) VALUES (?, ?, ?, ?, ?)",
+        rows()
+    )
+    conn.commit()
+    sample = conn.execute("SELECT question FROM data_entries WHERE id = ?", (size // 2,)).fetchone()[0]
+    conn.close()
+    return sample
+
+
+def timeit(func, rounds):
+    """返回单次调用的平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) * 1000 / rounds
+
+
+def run(size, rounds):
+    """对指定规模的数据运行一次对比"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        sample = populate(db_path, size)
+        base_bytes = os.path.getsize(db_path)
+
+        os.environ['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+        from app import create_app, db
+        from app.services.search_index import SearchIndex
+
+        app = create_app()
+        with app.app_context():
+            fts = SearchIndex()
+            like = SearchIndex(enabled=False)
+            start = time.perf_counter()
+            # create_app() 已建立索引，这里强制重建一次以测量耗时
+            db.session.execute(db.text("INSERT INTO data_entries_fts (data_entries_fts) VALUES ('rebuild')"))
+            db.session.commit()
+            build_s = time.perf_counter() - start
+            fts.ensure(db.engine)
+            like.ensure(db.engine)
+            index_bytes = os.path.getsize(db_path) - base_bytes
+
+            queries = [('rare', sample[3:7]), ('common', COMMON_PHRASE), ('missing', '不存在的词语')]
+            for name, query in queries:
+                fts_result = fts.search(db.session, query)
+                like_result = like.search(db.session, query)
+                assert fts_result['mode'] == 'fts' and like_result['mode'] == 'like'
+                like_ms = timeit(lambda: like.search(db.session, query), rounds)
+                fts_ms = timeit(lambda: fts.search(db.session, query), rounds)
+                print(f"{size:>9} | {name:<8} | {len(fts_result['items']):>4} | {str(fts_result['ranked']):<6} | "
+                      f"{like_ms:>10.2f} | {fts_ms:>9.2f} | {like_ms / fts_ms:>7.1f}x")
+
+            # 触发器开销：有索引时追加写入10000条
+            rng = random.Random(7)
+            rows = [{'question': random_text(rng, 10, 30), 'answer': random_text(rng, 2, 12), 'category': 'riddle',
+                     'content_hash': f"f{i:031x}", 'created_at': datetime.utcnow()} for i in range(10000)]
+            from app.services.bulk_ingest import insert_rows
+            start = time.perf_counter()
+            insert_rows(db.session, rows)
+            db.session.commit()
+            insert_ms = (time.perf_counter() - start) * 1000
+
+            db.session.remove()
+            db.engine.dispose()
+
+    print(f"{size:>9} | index build {build_s:.1f}s, index size {index_bytes / 1024 / 1024:.0f} MiB "
+          f"(table {base_bytes / 1024 / 1024:.0f} MiB), insert 10000 rows with triggers {insert_ms:.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='全文搜索基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000], help='数据规模')
+    parser.add_argument('--rounds', type=int, default=20, help='每个查询的执行次数')
+    args = parser.parse_args()
+
+    print(f"first page of 20 results, rounds={args.rounds}")
+    print(f"{'rows':>9} | {'query':<8} | {'hits':>4} | {'ranked':<6} | {'LIKE ms':>10} | {'FTS5 ms':>9} | {'speedup':>8}")
+    for size in args.sizes:
+        run(size, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
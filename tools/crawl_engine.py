@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+爬虫引擎
+
+- 显式的待抓取队列代替递归，深度不受Python递归层数限制
+- 固定数量的工作线程共享一个长连接会话，并发抓取列表页和详情页
+- 每个主机独立限制并发数和请求间隔：响应快且成功时逐步放宽，
+  出错、被限流（429/503）或响应变慢时立即收紧
+- 可选的页面缓存：已缓存的页面发送条件请求，304时使用缓存内容；离线模式只从缓存读取
+- 可定期对待抓取队列（含正在处理的任务）做快照，用于中断后从检查点继续
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 视为服务端过载、需要退避并重试的状态码
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class CrawlTask:
+    """一个待抓取的URL"""
+
+    __slots__ = ('kind', 'url', 'data', 'attempt')
+
+    def __init__(self, kind: str, url: str, data: Optional[Dict[str, Any]] = None, attempt: int = 0):
+        self.kind = kind
+        self.url = url
+        self.data = data or {}
+        self.attempt = attempt
+
+    def __repr__(self):
+        return f'<CrawlTask {self.kind} {self.url}>'
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'kind': self.kind, 'url': self.url, 'data': self.data, 'attempt': self.attempt}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CrawlTask':
+        return cls(data['kind'], data['url'], data.get('data'), data.get('attempt', 0))
+
+
+class Frontier:
+    """
+    待抓取队列
+
+    任务从取出到处理完成之间记为进行中，快照同时包含进行中和排队的任务，
+    因此任意时刻的快照都不会丢失任务（进行中的任务恢复后会重新处理）。
+    关闭后 get() 立即返回None，排队的任务保留在队列中。
+    """
+
+    def __init__(self):
+        self._tasks: deque = deque()
+        self._active: Dict[int, CrawlTask] = {}
+        self._next_token = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def put(self, task: CrawlTask):
+        with self._condition:
+            self._tasks.append(task)
+            self._condition.notify()
+
+    def get(self) -> Optional[Tuple[int, CrawlTask]]:
+        """取出一个任务，返回 (令牌, 任务)；队列关闭时返回None"""
+        with self._condition:
+            while not self._tasks and not self._closed:
+                self._condition.wait()
+            if self._closed:
+                return None
+            task = self._tasks.popleft()
+            self._next_token += 1
+            self._active[self._next_token] = task
+            return self._next_token, task
+
+    def done(self, token: int):
+        """标记任务处理完成"""
+        with self._condition:
+            self._active.pop(token, None)
+            self._condition.notify_all()
+
+    def unfinished(self) -> int:
+        with self._condition:
+            return len(self._tasks) + len(self._active)
+
+    def wait(self, timeout: float) -> bool:
+        """等待所有任务处理完成，返回是否已完成"""
+        with self._condition:
+            if self._tasks or self._active:
+                self._condition.wait(timeout)
+            return not self._tasks and not self._active
+
+    def snapshot(self) -> List[CrawlTask]:
+        """进行中和排队的任务"""
+        with self._condition:
+            return list(self._active.values()) + list(self._tasks)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class HostThrottle:
+    """单个主机的自适应并发上限和请求间隔"""
+
+    def __init__(self, max_concurrency: int = 8, initial_concurrency: int = 2, min_interval: float = 0.0,
+                 max_interval: float = 10.0, slow_seconds: float = 2.0):
+        """
+        Args:
+            max_concurrency: 并发上限的最大值
+            initial_concurrency: 初始并发上限
+            min_interval: 相邻两次请求开始的最小间隔（秒）
+            max_interval: 退避后请求间隔的最大值（秒）
+            slow_seconds: 响应时间超过该值时视为主机变慢
+        """
+        self.max_concurrency = max_concurrency
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.slow_seconds = slow_seconds
+        self.limit = max(1, min(initial_concurrency, max_concurrency))
+        self.interval = min_interval
+        self.active = 0
+        self.successes = 0
+        self.requests = 0
+        self.errors = 0
+        self._next_start = 0.0
+        self._last_backoff = 0.0
+        # 上次出错时的并发数，再次放宽到该值之前需要更长时间的连续成功
+        self._failed_limit = None
+        self._condition = threading.Condition()
+
+    def acquire(self) -> float:
+        """
+        等待并发槽位和请求间隔
+
+        Returns:
+            请求开始时间，归还槽位时传给 release()
+        """
+        with self._condition:
+            while True:
+                wait = self._next_start - time.monotonic()
+                if self.active < self.limit and wait <= 0:
+                    break
+                self._condition.wait(timeout=wait if wait > 0 else None)
+            self.active += 1
+            self.requests += 1
+            started = time.monotonic()
+            self._next_start = started + self.interval
+            return started
+
+    def release(self, started: float, ok: bool, retry_after: Optional[float] = None):
+        """
+        归还槽位并根据本次请求的结果调整限制
+
+        成功且不慢时每累计 limit 次成功把并发上限加一，并缩短请求间隔（加性增），
+        接近上次出错时的并发数时放慢增加速度；
+        失败时并发上限减半、请求间隔加倍（乘性减），服务端给出 Retry-After 时暂停相应时间；
+        变慢时并发上限减一。在上次收紧之前就已发出的请求失败不再重复收紧，
+        避免同一波过载把限制一路降到底。
+        """
+        now = time.monotonic()
+        latency = now - started
+        with self._condition:
+            self.active -= 1
+            if not ok:
+                self.errors += 1
+                self.successes = 0
+                if started >= self._last_backoff:
+                    self._last_backoff = now
+                    self._failed_limit = self.limit
+                    self.limit = max(1, self.limit // 2)
+                    self.interval = min(self.max_interval, max(self.interval * 2, self.min_interval, 0.05))
+                if retry_after:
+                    self._next_start = max(self._next_start, now + min(retry_after, self.max_interval))
+            elif latency > self.slow_seconds:
+                self.successes = 0
+                self.limit = max(1, self.limit - 1)
+            else:
+                self.successes += 1
+                required = self.limit
+                if self._failed_limit is not None and self.limit + 1 >= self._failed_limit:
+                    required *= 10
+                if self.successes >= required:
+                    self.successes = 0
+                    self.limit = min(self.max_concurrency, self.limit + 1)
+                self.interval = max(self.min_interval, self.interval * 0.8)
+                if self.interval < 0.01:
+                    self.interval = self.min_interval
+            self._condition.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                'limit': self.limit,
+                'interval': round(self.interval, 3),
+                'requests': self.requests,
+                'errors': self.errors,
+            }
+
+
+class Politeness:
+    """按主机分配 HostThrottle"""
+
+    def __init__(self, **throttle_options):
+        self._options = throttle_options
+        self._hosts: Dict[str, HostThrottle] = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url: str) -> HostThrottle:
+        host = urlsplit(url).netloc
+        with self._lock:
+            throttle = self._hosts.get(host)
+            if throttle is None:
+                throttle = self._hosts[host] = HostThrottle(**self._options)
+            return throttle
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {host: throttle.get_stats() for host, throttle in hosts.items()}
+
+
+def create_session(pool_size: int, headers: Optional[Dict[str, str]] = None) -> requests.Session:
+    """创建连接池大小与工作线程数匹配的长连接会话"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+class CrawlEngine:
+    """
+    多线程爬虫引擎
+
+    每种任务类型注册一个处理函数 handler(engine, task, response)，response 为抓取结果
+    （请求失败且重试用尽时为None）。处理函数通过 engine.add() 加入新的任务。
+
+    来自缓存的响应带有 from_cache=True；not_modified=True 表示服务端确认页面未修改，
+    处理函数可以跳过解析。
+    """
+
+    def __init__(self, handlers: Dict[str, Callable[['CrawlEngine', CrawlTask, Optional[requests.Response]], None]],
+                 workers: int = 8, session: Optional[requests.Session] = None,
+                 politeness: Optional[Politeness] = None, timeout: float = 10.0, max_retries: int = 2,
+                 headers: Optional[Dict[str, str]] = None, cache=None, offline: bool = False):
+        """
+        Args:
+            handlers: {任务类型: 处理函数}
+            workers: 工作线程数
+            session: 共享会话，默认创建连接池大小为 workers 的会话
+            politeness: 主机限速策略，默认使用 HostThrottle 的默认参数
+            timeout: 单次请求超时（秒）
+            max_retries: 网络错误和过载状态码的最大重试次数
+            headers: 默认会话的请求头
+            cache: 页面缓存（PageCache），为None时不使用缓存
+            offline: 只从缓存读取页面，不访问网络
+        """
+        if offline and cache is None:
+            raise ValueError('Offline mode requires a page cache')
+        self.handlers = handlers
+        self.workers = workers
+        self.session = session or create_session(workers, headers)
+        self.politeness = politeness or Politeness()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.cache = cache
+        self.offline = offline
+        self.stats = {'fetched': 0, 'failed': 0, 'retried': 0, 'bytes': 0, 'not_modified': 0, 'cache_misses': 0}
+        self.frontier = Frontier()
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def add(self, task: CrawlTask) -> bool:
+        """
+        加入待抓取任务，同一URL在一次运行中只抓取一次
+
+        停止后加入的任务留在队列中，随检查点保存。
+
+        Returns:
+            是否加入；URL已加入过时返回False
+        """
+        with self._lock:
+            if task.url in self._seen:
+                return False
+            self._seen.add(task.url)
+        self.frontier.put(task)
+        return True
+
+    def stop(self):
+        """停止取出新任务，正在处理的任务完成后工作线程退出"""
+        self._stopped.set()
+        self.frontier.close()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped.is_set()
+
+    def run(self, *seeds: CrawlTask, checkpoint: Optional[Callable[['CrawlEngine'], None]] = None,
+            checkpoint_interval: float = 30.0) -> Dict[str, Any]:
+        """
+        从种子任务开始抓取，直到队列为空或调用 stop()
+
+        Args:
+            seeds: 初始任务
+            checkpoint: 在主线程中定期调用的检查点函数，结束（包括被中断）时再调用一次
+            checkpoint_interval: 检查点间隔（秒）
+
+        Returns:
+            抓取统计，含各主机当前的并发上限和请求间隔
+        """
+        for task in seeds:
+            self.add(task)
+        threads = [threading.Thread(target=self._run, name=f'crawl-worker-{index}', daemon=True)
+                   for index in range(self.workers)]
+        start = time.perf_counter()
+        last_checkpoint = time.monotonic()
+        for thread in threads:
+            thread.start()
+        try:
+            # 用带超时的等待代替无限期阻塞，以便主线程能响应 KeyboardInterrupt 并定期保存检查点
+            while not self._stopped.is_set() and not self.frontier.wait(0.1):
+                if checkpoint and time.monotonic() - last_checkpoint >= checkpoint_interval:
+                    checkpoint(self)
+                    last_checkpoint = time.monotonic()
+        finally:
+            self.stop()
+            for thread in threads:
+                thread.join()
+            if checkpoint:
+                checkpoint(self)
+        seconds = time.perf_counter() - start
+        return {
+            **self.stats,
+            'seconds': seconds,
+            'pages_per_second': (self.stats['fetched'] + self.stats['not_modified']) / seconds if seconds > 0 else 0.0,
+            'hosts': self.politeness.get_stats(),
+        }
+
+    def fetch(self, url: str) -> requests.Response:
+        """
+        在主机限速下抓取URL；过载状态码视为失败，由调用方决定是否重试
+
+        有缓存时发送条件请求：304返回缓存内容构造的响应，200更新缓存。
+        """
+        entry = self.cache.get(url) if self.cache else None
+        throttle = self.politeness.for_url(url)
+        started = throttle.acquire()
+        response = None
+        try:
+            response = self.session.get(url, timeout=self.timeout,
+                                        headers=self.cache.conditional_headers(entry) if entry else None)
+            if response.status_code == 304 and entry:
+                cached = self.cache.response(entry, not_modified=True)
+                if cached is not None:
+                    self.cache.touch(url)
+                    return cached
+                # 缓存内容丢失，重新完整抓取
+                response = self.session.get(url, timeout=self.timeout)
+            if response.status_code == 200 and self.cache:
+                self.cache.put(url, response.content, response.headers)
+            return response
+        finally:
+            ok = response is not None and response.status_code not in RETRY_STATUS
+            retry_after = None
+            if response is not None and response.headers.get('Retry-After', '').isdigit():
+                retry_after = float(response.headers['Retry-After'])
+            throttle.release(started, ok, retry_after)
+
+    def _replay(self, task: CrawlTask):
+        """离线模式：只从缓存读取页面"""
+        entry = self.cache.get(task.url)
+        response = self.cache.response(entry) if entry else None
+        with self._lock:
+            if response is None:
+                self.stats['cache_misses'] += 1
+            else:
+                self.stats['fetched'] += 1
+                self.stats['bytes'] += len(response.content)
+        self.handlers[task.kind](self, task, response)
+
+    def _process(self, task: CrawlTask):
+        if self.offline:
+            self._replay(task)
+            return
+        try:
+            response = self.fetch(task.url)
+            error = f'status {response.status_code}' if response.status_code in RETRY_STATUS else None
+        except requests.RequestException as e:
+            response, error = None, str(e)
+
+        if error:
+            if self._stopped.is_set():
+                # 停止时不把失败交给处理函数，任务放回队列随检查点保存
+                self.frontier.put(task)
+                return
+            if task.attempt < self.max_retries:
+                with self._lock:
+                    self.stats['retried'] += 1
+                self.frontier.put(CrawlTask(task.kind, task.url, task.data, task.attempt + 1))
+                return
+            print(f"请求失败: {task.url}, {error}")
+            with self._lock:
+                self.stats['failed'] += 1
+            response = None
+        else:
+            with self._lock:
+                if getattr(response, 'not_modified', False):
+                    self.stats['not_modified'] += 1
+                else:
+                    self.stats['fetched'] += 1
+                    self.stats['bytes'] += len(response.content)
+
+        self.handlers[task.kind](self, task, response)
+
+    def _run(self):
+        while True:
+            item = self.frontier.get()
+            if item is None:
+                return
+            token, task = item
+            try:
+                self._process(task)
+            except Exception as e:
+                print(f"处理任务失败: {task}, 错误: {e}")
+            finally:
+                self.frontier.done(token)
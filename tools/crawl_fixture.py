@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+爬虫测试站点
+
+在本地模拟 cmiyu.com 儿童谜语栏目的页面结构（GB18030编码）：
+- /etmy/ 和 /etmy/mytid%7D<n>.html 为列表页，超过最后一页后返回没有谜语的列表页
+- /etmy/<id>.html 为详情页，含谜底和注释
+- 可设置每个响应的延迟，以及超过指定并发数时返回 503 + Retry-After，用来观察爬虫的自适应限速
+- 响应带 ETag 和 Last-Modified，条件请求命中时返回 304；revisions 中的谜语会改变内容
+
+用法：
+    python tools/crawl_fixture.py --port 8000 --pages 50 --latency 0.05
+    python tools/riddle_crawler.py --base-url http://127.0.0.1:8000
+"""
+
+import re
+import time
+import hashlib
+import argparse
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LIST_PATTERN = re.compile(r'^/etmy/(?:mytid%7D(\d+)\.html)?$')
+DETAIL_PATTERN = re.compile(r'^/etmy/(\d+)\.html$')
+
+
+class FixtureSite:
+    """本地谜语测试站点"""
+
+    def __init__(self, pages=20, items_per_page=20, latency=0.0, capacity=None, port=0):
+        """
+        Args:
+            pages: 有谜语的列表页数
+            items_per_page: 每个列表页的谜语数
+            latency: 每个响应的延迟（秒）
+            capacity: 同时处理的请求数上限，超过时返回503；None表示不限制
+            port: 监听端口，0表示随机端口
+        """
+        self.pages = pages
+        self.items_per_page = items_per_page
+        self.latency = latency
+        self.capacity = capacity
+        # {谜语ID: 版本号}，修改版本号模拟详情页内容更新
+        self.revisions = {}
+        self.last_modified = formatdate(time.time(), usegmt=True)
+        self.requests = {'list': 0, 'detail': 0, 'rejected': 0, 'not_modified': 0}
+        self._active = 0
+        self._lock = threading.Lock()
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with site._lock:
+                    site._active += 1
+                    overloaded = site.capacity is not None and site._active > site.capacity
+                try:
+                    if overloaded:
+                        with site._lock:
+                            site.requests['rejected'] += 1
+                        self.respond(503, b'', {'Retry-After': '1'})
+                        return
+                    time.sleep(site.latency)
+                    status, body = site.render(self.path)
+                    if status != 200:
+                        self.respond(status, body, {})
+                        return
+                    etag = '"%s"' % hashlib.md5(body).hexdigest()
+                    if self.headers.get('If-None-Match') == etag:
+                        with site._lock:
+                            site.requests['not_modified'] += 1
+                        self.respond(304, b'', {'ETag': etag})
+                        return
+                    self.respond(200, body, {'Content-Type': 'text/html; charset=gb2312', 'ETag': etag,
+                                             'Last-Modified': site.last_modified})
+                finally:
+                    with site._lock:
+                        site._active -= 1
+
+            def respond(self, status, body, headers):
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def riddle_id(self, page, index):
+        return (page - 1) * self.items_per_page + index + 1
+
+    def render(self, path):
+        """返回 (状态码, GB18030编码的页面)"""
+        match = LIST_PATTERN.match(path)
+        if match:
+            with self._lock:
+                self.requests['list'] += 1
+            page = int(match.group(1) or 1)
+            items = []
+            if page <= self.pages:
+                for index in range(self.items_per_page):
+                    riddle_id = self.riddle_id(page, index)
+                    items.append(f'<li><a href="/etmy/{riddle_id}.html">测试谜面{riddle_id}（打一物）</a></li>')
+            html = (f'<html><head><title>儿童谜语 第{page}页</title></head><body>'
+                    f'<div class="list"><ul>{"".join(items)}</ul></div></body></html>')
+            return 200, html.encode('gb18030')
+
+        match = DETAIL_PATTERN.match(path)
+        if match:
+            with self._lock:
+                self.requests['detail'] += 1
+            riddle_id = int(match.group(1))
+            revision = self.revisions.get(riddle_id)
+            answer = f'测试谜底{riddle_id}' + (f'（第{revision}版）' if revision else '')
+            html = (f'<html><body><div class="md"><h3>谜面：测试谜面{riddle_id}（打一物）</h3>'
+                    f'<h3>谜底：{answer}</h3></div>'
+                    f'<div class="zy"><p>小贴士：第{riddle_id}条测试注释。</p></div></body></html>')
+            return 200, html.encode('gb18030')
+
+        return 404, b''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='爬虫测试站点')
+    parser.add_argument('--port', type=int, default=8000, help='监听端口')
+    parser.add_argument('--pages', type=int, default=20, help='有谜语的列表页数')
+    parser.add_argument('--items', type=int, default=20, help='每个列表页的谜语数')
+    parser.add_argument('--latency', type=float, default=0.05, help='每个响应的延迟（秒）')
+    parser.add_argument('--capacity', type=int, default=None, help='同时处理的请求数上限，超过时返回503')
+    args = parser.parse_args()
+
+    site = FixtureSite(args.pages, args.items, args.latency, args.capacity, args.port)
+    print(f"测试站点已启动: {site.base_url}/etmy/")
+    try:
+        site.server.serve_forever()
+    except KeyboardInterrupt:
+        site.stop()
+
+
+if __name__ == '__main__':
+    main()
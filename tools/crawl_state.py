@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+爬虫断点状态
+
+在一个小的SQLite库中保存：
+- 已访问的详情页URL，每访问一个页面插入一行，不再在结束时整体重写 visited_urls.txt
+- 抓取检查点：待抓取队列、翻页位置和尚未写入语料文件的谜语，整体以一条记录原子替换
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+
+class CrawlStateStore:
+    """爬虫的已访问URL和检查点存储"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS visited (url TEXT PRIMARY KEY) WITHOUT ROWID')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS checkpoints ('
+            'name TEXT PRIMARY KEY, data TEXT NOT NULL, saved_at REAL NOT NULL)'
+        )
+        self._db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self.visited = VisitedStore(self)
+
+    def import_visited_file(self, path: str) -> int:
+        """
+        一次性导入旧版的 visited_urls.txt
+
+        Returns:
+            导入的URL数，已导入过或文件不存在时返回0
+        """
+        if not os.path.exists(path):
+            return 0
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM meta WHERE key = 'visited_file_imported'").fetchone():
+                return 0
+        with open(path, 'r', encoding='utf-8') as f:
+            urls = [(line.strip(),) for line in f if line.strip()]
+        with self._lock:
+            self._db.execute('BEGIN')
+            try:
+                self._db.executemany('INSERT OR IGNORE INTO visited (url) VALUES (?)', urls)
+                self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('visited_file_imported', ?)",
+                                 (os.path.abspath(path),))
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+        return len(urls)
+
+    def save_checkpoint(self, name: str, data: Dict[str, Any]):
+        """保存检查点，替换同名的旧检查点"""
+        blob = json.dumps(data, ensure_ascii=False)
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO checkpoints (name, data, saved_at) VALUES (?, ?, ?)',
+                             (name, blob, time.time()))
+
+    def load_checkpoint(self, name: str) -> Optional[Dict[str, Any]]:
+        """返回检查点内容和保存时间（saved_at），不存在时返回None"""
+        with self._lock:
+            row = self._db.execute('SELECT data, saved_at FROM checkpoints WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            return None
+        data = json.loads(row[0])
+        data['saved_at'] = row[1]
+        return data
+
+    def clear_checkpoint(self, name: str):
+        with self._lock:
+            self._db.execute('DELETE FROM checkpoints WHERE name = ?', (name,))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class VisitedStore:
+    """已访问URL集合，接口与 set 的 in / add / len 一致，供多个工作线程共用"""
+
+    def __init__(self, store: CrawlStateStore):
+        self._store = store
+
+    def __contains__(self, url: str) -> bool:
+        with self._store._lock:
+            return self._store._db.execute('SELECT 1 FROM visited WHERE url = ?', (url,)).fetchone() is not None
+
+    def add(self, url: str):
+        with self._store._lock:
+            self._store._db.execute('INSERT OR IGNORE INTO visited (url) VALUES (?)', (url,))
+
+    def __len__(self):
+        with self._store._lock:
+            return self._store._db.execute('SELECT COUNT(*) FROM visited').fetchone()[0]
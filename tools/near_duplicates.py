@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+近似重复报告脚本
+
+为尚未生成签名的条目计算MinHash签名和LSH桶键（增量），然后对全表聚类，
+列出只在标点、全角/半角、大小写或空白上不同的近似重复条目。
+
+用法：
+    python tools/near_duplicates.py                   # 增量生成签名并输出报告
+    python tools/near_duplicates.py --rebuild         # 清空后重新生成所有签名（修改 NGRAM/NUM_PERM/BANDS/SEED 后）
+    python tools/near_duplicates.py --threshold 0.9 --limit 50
+    python tools/near_duplicates.py --json near_duplicates.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='近似重复条目报告')
+    parser.add_argument('--rebuild', action='store_true', help='清空后重新生成所有签名')
+    parser.add_argument('--threshold', type=float, default=None, help='近似重复的最低相似度（默认使用配置）')
+    parser.add_argument('--limit', type=int, default=20, help='输出的簇数，0表示全部')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='计算签名的进程数')
+    parser.add_argument('--json', metavar='PATH', help='将所有簇以JSON写入文件')
+    args = parser.parse_args()
+
+    from app import create_app, db
+    from app.models import DataEntry
+    from app.services.near_duplicates import near_duplicate_index
+
+    app = create_app()
+    with app.app_context():
+        start = time.perf_counter()
+        if args.rebuild:
+            near_duplicate_index.clear(db.session)
+            db.session.commit()
+        synced = near_duplicate_index.sync(db.session, workers=args.workers)
+        sync_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        clusters = near_duplicate_index.clusters(db.session, threshold=args.threshold)
+        cluster_s = time.perf_counter() - start
+        total = DataEntry.query.count()
+        redundant = sum(len(members) - 1 for members in clusters)
+
+        shown = clusters[:args.limit] if args.limit else clusters
+        entries = {}
+        ids = [entry_id for members in (clusters if args.json else shown) for entry_id in members]
+        for start_index in range(0, len(ids), 500):
+            for entry in DataEntry.query.filter(DataEntry.id.in_(ids[start_index:start_index + 500])):
+                entries[entry.id] = entry
+
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump([[{
+                    'id': entry_id,
+                    'question': entries[entry_id].question,
+                    'answer': entries[entry_id].answer,
+                    'category': entries[entry_id].category
+                } for entry_id in members if entry_id in entries] for members in clusters],
+                    f, ensure_ascii=False, indent=2)
+
+        threshold = near_duplicate_index.threshold if args.threshold is None else args.threshold
+        print(f"条目数: {total}，新生成签名: {synced}（{sync_s:.1f}s），聚类耗时 {cluster_s:.1f}s")
+        print(f"相似度 >= {threshold}: {len(clusters)} 个近似重复簇，{redundant} 个多余条目")
+        for number, members in enumerate(shown, 1):
+            print(f"\n#{number} ({len(members)} 个条目)")
+            for entry_id in members:
+                entry = entries.get(entry_id)
+                if entry:
+                    print(f"  [{entry_id}] {entry.question} | {entry.answer.strip()}".replace('\n', ' '))
+        if len(shown) < len(clusters):
+            print(f"\n... 还有 {len(clusters) - len(shown)} 个簇，使用 --limit 0 查看全部")
+        if args.json:
+            print(f"已将 {len(clusters)} 个簇写入 {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
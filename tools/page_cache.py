@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+爬虫页面缓存
+
+- 页面内容按SHA-256摘要以gzip压缩文件保存在 objects/ 目录下，内容相同的页面只存一份
+- index.db 记录 URL 到内容摘要的映射，以及 ETag / Last-Modified 等重新验证所需的响应头
+- 重新抓取时发送条件请求，服务端返回 304 时直接使用缓存内容
+"""
+
+import os
+import gzip
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+class PageCache:
+    """按URL索引、按内容寻址的页面缓存"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, 'objects')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, 'index.db'), check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS pages ('
+            'url TEXT PRIMARY KEY, digest TEXT NOT NULL, etag TEXT, last_modified TEXT, '
+            'content_type TEXT, fetched_at REAL NOT NULL, validated_at REAL NOT NULL)'
+        )
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], f'{digest}.gz')
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """返回URL的缓存记录（不含内容），不存在时返回None"""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT url, digest, etag, last_modified, content_type, fetched_at, validated_at '
+                'FROM pages WHERE url = ?', (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ('url', 'digest', 'etag', 'last_modified', 'content_type', 'fetched_at', 'validated_at')
+        return dict(zip(keys, row))
+
+    def read(self, entry: Dict[str, Any]) -> Optional[bytes]:
+        """读取缓存记录对应的页面内容，内容文件丢失时返回None"""
+        try:
+            with gzip.open(self._object_path(entry['digest']), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, url: str, body: bytes, headers) -> str:
+        """
+        保存页面内容和重新验证所需的响应头
+
+        Returns:
+            内容摘要
+        """
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再原子替换，并发写入同一内容或中途退出都不会留下不完整的文件
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO pages '
+                '(url, digest, etag, last_modified, content_type, fetched_at, validated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, digest, headers.get('ETag'), headers.get('Last-Modified'),
+                 headers.get('Content-Type'), now, now)
+            )
+        return digest
+
+    def touch(self, url: str):
+        """记录缓存内容刚被服务端确认未修改"""
+        with self._lock:
+            self._db.execute('UPDATE pages SET validated_at = ? WHERE url = ?', (time.time(), url))
+
+    def conditional_headers(self, entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """根据缓存记录生成条件请求头"""
+        headers = {}
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def response(self, entry: Dict[str, Any], not_modified: bool = False) -> Optional[requests.Response]:
+        """
+        用缓存内容构造响应对象，供处理函数按普通响应解析
+
+        响应带有 from_cache=True，not_modified 表示本次条件请求得到了304。
+        """
+        body = self.read(entry)
+        if body is None:
+            return None
+        response = requests.Response()
+        response.status_code = 200
+        response.url = entry['url']
+        response._content = body
+        response.headers = CaseInsensitiveDict({'Content-Type': entry['content_type'] or ''})
+        response.from_cache = True
+        response.not_modified = not_modified
+        return response
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pages, objects = self._db.execute('SELECT COUNT(*), COUNT(DISTINCT digest) FROM pages').fetchone()
+        size = 0
+        for root, _, files in os.walk(self.objects_dir):
+            size += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+        return {'pages': pages, 'objects': objects, 'bytes': size}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
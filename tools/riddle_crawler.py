@@ -1,311 +1,498 @@
-#!/usr/bin/env python3
-# -*- coding: utf-8 -*-
-
-"""
-谜语爬虫脚本
-
-从 http://www.cmiyu.com/etmy/ 网站爬取儿童谜语数据，
-并按照指定格式追加到 origin_data/riddle.txt 文件中
-"""
-
-import os
-import re
-import time
-import random
-import requests
-from bs4 import BeautifulSoup
-
-# 配置
-BASE_URL = "http://www.cmiyu.com"
-ETMY_URL = f"{BASE_URL}/etmy/"
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
-OUTPUT_FILE = os.path.join(PROJECT_ROOT, "origin_data", "riddle.txt")
-VISITED_URLS_FILE = os.path.join(SCRIPT_DIR, "visited_urls.txt")
-
-
-def join_url(base, path):
-    """
-    正确拼接URL，避免出现域名和路径直接连接的问题
-    """
-    if not path:
-        return base
-    
-    # 如果是完整URL，直接返回
-    if path.startswith('http'):
-        return path
-    
-    # 确保base不以/结尾，path以/开头
-    base = base.rstrip('/')
-    if not path.startswith('/'):
-        path = '/' + path
-    
-    return base + path
-
-# 请求头，模拟浏览器访问
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36",
-    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-}
-
-
-def get_page_content(url):
-    """
-    获取页面内容
-    """
-    try:
-        print(f"正在请求: {url}")
-        # 验证URL格式
-        if not url.startswith('http'):
-            print(f"无效的URL格式: {url}")
-            return None
-            
-        response = requests.get(url, headers=HEADERS, timeout=10)
-        # 尝试多种编码方式，解决乱码问题
-        # 先尝试自动检测
-        if response.status_code == 200:
-            # 先尝试 GB2312/GBK 编码（常见的中文编码）
-            response.encoding = "gb18030"  # GB18030 是 GBK 的超集，兼容性更好
-            content = response.text
-            
-            # 如果仍有乱码，可以尝试其他编码
-            if "乱码" in content or "�" in content:
-                response.encoding = "utf-8"
-                content = response.text
-            
-            return content
-        else:
-            print(f"请求失败，状态码: {response.status_code}")
-            return None
-    except Exception as e:
-        print(f"请求异常: {e}")
-        return None
-
-count = 2
-def extract_riddles_from_page(url, visited_urls):
-    global count
-    """
-    从页面中提取谜语数据，使用XPath选择器
-    """
-    if url in visited_urls:
-        print(f"已访问过: {url}, 跳过")
-        return []
-    
-    content = get_page_content(url)
-    if not content:
-        return []
-    visited_urls.add(url) # 标记为已访问
-    
-    soup = BeautifulSoup(content, "html.parser")
-    riddles = []
-    
-    # 使用XPath风格的选择器提取谜语列表
-    miyu_list = soup.select('div.list > ul > li')
-    
-    for miyu in miyu_list:
-        # 提取谜面（问题）
-        question_elem = miyu.select_one('a')
-        if question_elem:
-            question = question_elem.get_text().strip()
-        else:
-            question_elem = miyu.select_one('a > b')
-            if question_elem:
-                question = question_elem.get_text().strip()
-            else:
-                continue
-        
-        # 获取详情页链接
-        info_page = miyu.select_one('a')
-        if info_page and info_page.get('href'):
-            # 访问详情页获取谜底
-            href = info_page.get('href')
-            # 使用join_url函数确保URL正确拼接
-            detail_url = join_url(BASE_URL, href)
-            
-            if detail_url in visited_urls:
-                print(f"详情页已访问过: {detail_url}, 跳过")
-                continue # 跳过这个谜语，因为详情页已处理
-            
-            detail_content = get_page_content(detail_url)
-            if detail_content:
-                visited_urls.add(detail_url) # 标记详情页为已访问
-            
-            if detail_content:
-                detail_soup = BeautifulSoup(detail_content, "html.parser")
-                
-                # 提取谜底（答案）
-                answer_elem = detail_soup.select_one('div.md > h3:nth-of-type(2)')
-                if answer_elem:
-                    answer = answer_elem.get_text().replace('谜底：', '').strip()
-                    
-                    # 提取注释（如果有）
-                    annotation_elem = detail_soup.select_one('div.zy > p')
-                    annotation = ''
-                    if annotation_elem:
-                        annotation = annotation_elem.get_text().strip()
-                    
-                    # 确保问题和答案都不为空
-                    if question and answer:
-                        riddle = {
-                            "question": question,
-                            "answer": answer
-                        }
-                        
-                        # 如果有注释，添加到谜语数据中
-                        if annotation:
-                            riddle["annotation"] = annotation
-                            
-                        riddles.append(riddle)
-    
-    # 处理分页
-    # 使用join_url函数确保URL正确拼接
-    next_url = join_url(ETMY_URL, "/mytid%7D{0}.html".format(count))
-    # 递归获取下一页的谜语
-    try:
-        count = count + 1
-        next_riddles = extract_riddles_from_page(next_url, visited_urls)
-        riddles.extend(next_riddles)
-    except Exception as e:
-        print(f"获取下一页谜语失败: {next_url}, 错误: {e}")
-    
-    return riddles
-
-
-def format_riddle(riddle):
-    """
-    格式化谜语为指定格式
-    """
-    formatted = f"问题：{riddle['question']}\n答案:{riddle['answer']}"
-    
-    # 如果有注释，添加到格式化的谜语中
-    if 'annotation' in riddle and riddle['annotation']:
-        formatted += f"\n注释:{riddle['annotation']}"
-    
-    return formatted
-
-
-def save_riddles_to_file(riddles):
-    """
-    将谜语保存到文件
-    """
-    # 检查文件是否存在，如果不存在则创建
-    if not os.path.exists(OUTPUT_FILE):
-        with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-            f.write("")
-    
-    # 读取现有内容，检查是否有结尾的空行
-    with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
-        content = f.read()
-    
-    # 准备写入新内容
-    with open(OUTPUT_FILE, "a", encoding="utf-8") as f:
-        # 如果文件不为空且最后没有空行，先添加分隔符
-        if content and not content.endswith("\n\n"):
-            if content.endswith("\n"):
-                f.write("---\n")
-            else:
-                f.write("\n---\n")
-        
-        # 写入谜语
-        for i, riddle in enumerate(riddles):
-            f.write(format_riddle(riddle))
-            # 如果不是最后一个谜语，添加分隔符
-            if i < len(riddles) - 1:
-                f.write("\n---\n")
-            else:
-                f.write("\n")
-    
-    print(f"成功保存 {len(riddles)} 条谜语到 {OUTPUT_FILE}")
-
-
-def remove_duplicates(riddles):
-    """
-    移除重复的谜语
-    """
-    # 读取现有文件内容
-    existing_riddles = set()
-    if os.path.exists(OUTPUT_FILE):
-        with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
-            content = f.read()
-            # 分割每个谜语
-            parts = content.split("---")
-            for part in parts:
-                part = part.strip()
-                if part:
-                    # 提取问题和答案
-                    lines = part.split("\n")
-                    if len(lines) >= 2 and lines[0].startswith("问题：") and lines[1].startswith("答案:"):
-                        question = lines[0][3:].strip()
-                        answer = lines[1][3:].strip()
-                        existing_riddles.add((question, answer))
-    
-    # 过滤掉重复的谜语
-    unique_riddles = []
-    for riddle in riddles:
-        if (riddle["question"], riddle["answer"]) not in existing_riddles:
-            unique_riddles.append(riddle)
-            existing_riddles.add((riddle["question"], riddle["answer"]))
-    
-    return unique_riddles
-
-
-def main():
-    """
-    主函数
-    """
-    print("开始爬取儿童谜语数据...")
-    
-    visited_urls = set()
-    # 加载已访问的URL
-    if os.path.exists(VISITED_URLS_FILE):
-        with open(VISITED_URLS_FILE, "r", encoding="utf-8") as f:
-            visited_urls = set(line.strip() for line in f)
-        print(f"从 {VISITED_URLS_FILE} 加载了 {len(visited_urls)} 个已访问的URL")
-
-    try:
-        # 直接从主页开始爬取
-        print(f"开始从 {ETMY_URL} 爬取谜语数据")
-        all_riddles = extract_riddles_from_page(ETMY_URL, visited_urls)
-        
-        if not all_riddles:
-            print("未能爬取到任何谜语数据，请检查网络连接或网站结构是否发生变化")
-            return
-        
-        print(f"共爬取到 {len(all_riddles)} 条谜语")
-        
-        # 移除重复的谜语
-        unique_riddles = remove_duplicates(all_riddles)
-        print(f"去重后剩余 {len(unique_riddles)} 条谜语")
-        
-        # 保存谜语到文件
-        if unique_riddles:
-            save_riddles_to_file(unique_riddles)
-            print("儿童谜语数据爬取完成！")
-        else:
-            print("没有新的谜语数据需要保存")
-    except Exception as e:
-        print(f"爬取过程中发生错误: {e}")
-        print("请检查网络连接或网站结构是否发生变化")
-    finally:
-        # 保存已访问的URL
-        with open(VISITED_URLS_FILE, "w", encoding="utf-8") as f:
-            for url in visited_urls:
-                f.write(url + "\n")
-        print(f"已将 {len(visited_urls)} 个已访问的URL保存到 {VISITED_URLS_FILE}")
-        
-        # 如果有部分数据已爬取，尝试保存
-        if 'all_riddles' in locals() and all_riddles:
-            print(f"尝试保存已爬取的 {len(all_riddles)} 条谜语数据...")
-            try:
-                unique_riddles = remove_duplicates(all_riddles)
-                if unique_riddles:
-                    save_riddles_to_file(unique_riddles)
-                    print(f"成功保存 {len(unique_riddles)} 条谜语数据")
-            except Exception as save_error:
-                print(f"保存数据时发生错误: {save_error}")
-                print("无法保存已爬取的数据")
-
-
-if __name__ == "__main__":
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+谜语爬虫脚本
+
+从 http://www.cmiyu.com/etmy/ 网站爬取儿童谜语数据，
+按照指定格式追加到 origin_data/riddle.txt 文件中，或在抓取过程中直接写入数据库
+
+用法：
+    python tools/riddle_crawler.py --workers 8
+    python tools/riddle_crawler.py --base-url http://127.0.0.1:8000 --max-pages 20  # 抓取本地测试站点
+    python tools/riddle_crawler.py --offline  # 只用页面缓存重新提取，不访问网络
+    python tools/riddle_crawler.py --resume  # 从上次中断的检查点继续
+    python tools/riddle_crawler.py --sink both  # 同时写入数据库和 riddle.txt
+"""
+
+import os
+import argparse
+import threading
+from bs4 import BeautifulSoup
+
+from crawl_engine import CrawlEngine, CrawlTask, Politeness
+from crawl_state import CrawlStateStore
+from page_cache import PageCache
+from riddle_index import RiddleIndex
+
+# 配置
+BASE_URL = "http://www.cmiyu.com"
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+OUTPUT_FILE = os.path.join(PROJECT_ROOT, "origin_data", "riddle.txt")
+VISITED_URLS_FILE = os.path.join(SCRIPT_DIR, "visited_urls.txt")
+PAGE_CACHE_DIR = os.path.join(SCRIPT_DIR, "page_cache")
+RIDDLE_INDEX_FILE = os.path.join(SCRIPT_DIR, "riddle_index.db")
+CRAWL_STATE_FILE = os.path.join(SCRIPT_DIR, "crawl_state.db")
+
+
+def join_url(base, path):
+    """
+    正确拼接URL，避免出现域名和路径直接连接的问题
+    """
+    if not path:
+        return base
+    
+    # 如果是完整URL，直接返回
+    if path.startswith('http'):
+        return path
+    
+    # 确保base不以/结尾，path以/开头
+    base = base.rstrip('/')
+    if not path.startswith('/'):
+        path = '/' + path
+    
+    return base + path
+
+# 请求头，模拟浏览器访问
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+}
+
+
+def decode_page(response):
+    """
+    解码页面内容
+    """
+    # 先尝试 GB2312/GBK 编码（常见的中文编码）
+    response.encoding = "gb18030"  # GB18030 是 GBK 的超集，兼容性更好
+    content = response.text
+
+    # 如果仍有乱码，可以尝试其他编码
+    if "乱码" in content or "�" in content:
+        response.encoding = "utf-8"
+        content = response.text
+
+    return content
+
+
+def list_page_url(etmy_url, page):
+    """
+    第page页列表页的URL，第1页为栏目首页
+    """
+    if page == 1:
+        return etmy_url
+    return join_url(etmy_url, "/mytid%7D{0}.html".format(page))
+
+
+def parse_list_page(content, base_url=BASE_URL):
+    """
+    从列表页中提取 (谜面, 详情页URL) 列表
+    """
+    soup = BeautifulSoup(content, "html.parser")
+    items = []
+    for miyu in soup.select('div.list > ul > li'):
+        link = miyu.select_one('a')
+        if not link:
+            continue
+        question = link.get_text().strip()
+        href = link.get('href')
+        if question and href:
+            # 使用join_url函数确保URL正确拼接
+            items.append((question, join_url(base_url, href)))
+    return items
+
+
+def parse_detail_page(content):
+    """
+    从详情页中提取 (谜底, 注释)，没有谜底时返回None
+    """
+    soup = BeautifulSoup(content, "html.parser")
+    answer_elem = soup.select_one('div.md > h3:nth-of-type(2)')
+    if not answer_elem:
+        return None
+    answer = answer_elem.get_text().replace('谜底：', '').strip()
+    annotation_elem = soup.select_one('div.zy > p')
+    annotation = annotation_elem.get_text().strip() if annotation_elem else ''
+    return answer, annotation
+
+
+class RiddleCrawler:
+    """
+    并发抓取谜语列表页和详情页
+
+    同时预取 prefetch 个列表页；遇到没有谜语的列表页（或请求失败）即停止翻页，
+    该页之后的列表页结果被丢弃。
+
+    revalidate 为True时（使用页面缓存）已访问的详情页也会重新请求，由条件请求判断是否变化，
+    未修改的详情页不再下载，从缓存内容解析。这些谜语仍交给各输出，由输出自己判断是否已保存
+    （文本文件用去重索引，数据库用内容哈希），上次抓取的谜语可能还没写入当前输出。
+
+    checkpoint() / restore() 保存和恢复翻页位置、已抓取的谜语和引擎的待抓取队列。
+
+    on_riddle 在每条谜语解析后（在工作线程中）调用，用于流式写入。
+    """
+
+    def __init__(self, base_url=BASE_URL, visited_urls=None, max_pages=None, prefetch=2, revalidate=False,
+                 on_riddle=None):
+        self.base_url = base_url.rstrip('/')
+        self.etmy_url = f"{self.base_url}/etmy/"
+        self.visited_urls = visited_urls if visited_urls is not None else set()
+        self.max_pages = max_pages
+        self.prefetch = max(1, prefetch)
+        self.revalidate = revalidate
+        self.on_riddle = on_riddle
+        self.stop_page = None
+        self.pages = 0
+        self.unchanged = 0
+        self._riddles = {}
+        self._lock = threading.Lock()
+
+    @property
+    def riddles(self):
+        """按列表页顺序排列的已抓取谜语"""
+        with self._lock:
+            return [self._riddles[key] for key in sorted(self._riddles)]
+
+    def _list_task(self, page):
+        return CrawlTask('list', list_page_url(self.etmy_url, page), {'page': page})
+
+    def _should_fetch_page(self, page):
+        if self.max_pages is not None and page > self.max_pages:
+            return False
+        return self.stop_page is None or page < self.stop_page
+
+    def handle_list(self, engine, task, response):
+        page = task.data['page']
+        items = []
+        if response is not None and response.status_code == 200:
+            items = parse_list_page(decode_page(response), self.base_url)
+
+        with self._lock:
+            if not items:
+                print(f"第 {page} 页没有谜语，停止翻页")
+                if self.stop_page is None or page < self.stop_page:
+                    self.stop_page = page
+                return
+            if not self._should_fetch_page(page):
+                return
+            self.pages += 1
+            next_page = page + self.prefetch
+            schedule_next = self._should_fetch_page(next_page)
+
+        for index, (question, detail_url) in enumerate(items):
+            if not self.revalidate and detail_url in self.visited_urls:
+                print(f"详情页已访问过: {detail_url}, 跳过")
+                continue
+            engine.add(CrawlTask('detail', detail_url, {'question': question, 'page': page, 'index': index}))
+        if schedule_next:
+            engine.add(self._list_task(next_page))
+
+    def handle_detail(self, engine, task, response):
+        if response is None or response.status_code != 200:
+            return
+        parsed = parse_detail_page(decode_page(response))
+        with self._lock:
+            if getattr(response, 'not_modified', False):
+                self.unchanged += 1
+            self.visited_urls.add(task.url)  # 标记详情页为已访问
+            if not parsed:
+                return
+            answer, annotation = parsed
+            question = task.data['question']
+            # 确保问题和答案都不为空
+            if not question or not answer:
+                return
+            riddle = {"question": question, "answer": answer}
+            # 如果有注释，添加到谜语数据中
+            if annotation:
+                riddle["annotation"] = annotation
+            self._riddles[(task.data['page'], task.data['index'])] = riddle
+        if self.on_riddle:
+            self.on_riddle(riddle)
+
+    def checkpoint(self, engine):
+        """
+        当前抓取进度，可JSON序列化
+
+        待抓取队列包含正在处理的任务，恢复后这些任务会重新处理一次。
+        """
+        frontier = [task.to_dict() for task in engine.frontier.snapshot()]
+        with self._lock:
+            return {
+                'base_url': self.base_url,
+                'stop_page': self.stop_page,
+                'pages': self.pages,
+                'unchanged': self.unchanged,
+                'riddles': [[page, index, riddle] for (page, index), riddle in sorted(self._riddles.items())],
+                'frontier': frontier,
+            }
+
+    def restore(self, data):
+        """
+        从检查点恢复进度
+
+        Returns:
+            检查点中的待抓取任务
+        """
+        with self._lock:
+            self.stop_page = data['stop_page']
+            self.pages = data['pages']
+            self.unchanged = data['unchanged']
+            self._riddles = {(page, index): riddle for page, index, riddle in data['riddles']}
+        return [CrawlTask.from_dict(task) for task in data['frontier']]
+
+    def crawl(self, workers=8, resume_from=None, checkpoint=None, checkpoint_interval=30.0, **engine_options):
+        """
+        抓取所有列表页及其详情页
+
+        Args:
+            workers: 工作线程数
+            resume_from: 检查点内容，给出时从检查点继续
+            checkpoint: 保存检查点的函数，参数为 checkpoint() 的结果
+            checkpoint_interval: 检查点间隔（秒）
+
+        Returns:
+            引擎的抓取统计
+        """
+        engine = CrawlEngine({'list': self.handle_list, 'detail': self.handle_detail},
+                             workers=workers, headers=HEADERS, **engine_options)
+        if resume_from is not None:
+            seeds = self.restore(resume_from)
+            if self.on_riddle:
+                # 检查点中的谜语可能还没写入
+                for riddle in self.riddles:
+                    self.on_riddle(riddle)
+        else:
+            last_page = self.prefetch if self.max_pages is None else min(self.prefetch, self.max_pages)
+            seeds = [self._list_task(page) for page in range(1, last_page + 1)]
+        save = None
+        if checkpoint is not None:
+            def save(engine):
+                checkpoint(self.checkpoint(engine))
+        return engine.run(*seeds, checkpoint=save, checkpoint_interval=checkpoint_interval)
+
+
+def format_riddle(riddle):
+    """
+    格式化谜语为指定格式
+    """
+    formatted = f"问题：{riddle['question']}\n答案:{riddle['answer']}"
+    
+    # 如果有注释，添加到格式化的谜语中
+    if 'annotation' in riddle and riddle['annotation']:
+        formatted += f"\n注释:{riddle['annotation']}"
+    
+    return formatted
+
+
+def separator_prefix(path):
+    """
+    返回追加新谜语前需要写入的分隔内容，只读取文件末尾的少量字节
+    """
+    if not os.path.exists(path):
+        return ""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - 64))
+        tail = f.read()
+    if not tail:
+        return ""
+    # 文件已以分隔行结尾时不再重复添加
+    last_line = tail.rstrip(b"\r\n").rsplit(b"\n", 1)[-1]
+    if last_line.strip() == b"---":
+        return "" if tail.endswith(b"\n") else "\n"
+    return "---\n" if tail.endswith(b"\n") else "\n---\n"
+
+
+def save_riddles_to_file(riddles):
+    """
+    将谜语保存到文件
+    """
+    with open(OUTPUT_FILE, "a", encoding="utf-8") as f:
+        # 文件不为空时先添加分隔符
+        f.write(separator_prefix(OUTPUT_FILE))
+
+        # 写入谜语
+        for i, riddle in enumerate(riddles):
+            f.write(format_riddle(riddle))
+            # 如果不是最后一个谜语，添加分隔符
+            if i < len(riddles) - 1:
+                f.write("\n---\n")
+            else:
+                f.write("\n")
+
+    print(f"成功保存 {len(riddles)} 条谜语到 {OUTPUT_FILE}")
+
+
+def save_new_riddles(riddles, index):
+    """
+    用去重索引过滤已保存过的谜语，把新谜语追加到文件并写入索引
+
+    Returns:
+        新保存的谜语数
+    """
+    synced = index.sync()
+    if synced['indexed']:
+        print(f"去重索引从 {OUTPUT_FILE} 补充了 {synced['indexed']} 条谜语（{synced['mode']}）")
+    unique_riddles = index.filter_new(riddles)
+    print(f"去重后剩余 {len(unique_riddles)} 条谜语")
+    if unique_riddles:
+        save_riddles_to_file(unique_riddles)
+        index.add(unique_riddles)
+    return len(unique_riddles)
+
+
+class TextFileSink:
+    """
+    追加到语料文件的输出
+
+    文件在抓取结束后按列表页顺序一次写入，用去重索引跳过已保存过的谜语。
+    """
+
+    def __init__(self, output_file=None, index_file=None):
+        self.output_file = output_file or OUTPUT_FILE
+        self.index_file = index_file or RIDDLE_INDEX_FILE
+
+    def add(self, riddle):
+        pass
+
+    def finish(self, riddles):
+        """
+        Returns:
+            新保存的谜语数
+        """
+        if not riddles:
+            return 0
+        index = RiddleIndex(self.index_file, self.output_file)
+        try:
+            return save_new_riddles(riddles, index)
+        finally:
+            index.close()
+
+    def close(self):
+        pass
+
+
+def create_sinks(names, database_uri=None):
+    """按名称创建输出：text 为 riddle.txt，db 为数据库"""
+    sinks = []
+    if 'db' in names:
+        # 按需导入，只写文本文件时不依赖应用和数据库
+        from riddle_db_sink import DatabaseSink
+        sinks.append(DatabaseSink(database_uri))
+    if 'text' in names:
+        sinks.append(TextFileSink())
+    return sinks
+
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description='爬取儿童谜语数据')
+    parser.add_argument('--base-url', default=BASE_URL, help=f'站点地址（默认 {BASE_URL}）')
+    parser.add_argument('--workers', type=int, default=8, help='并发抓取的线程数')
+    parser.add_argument('--max-pages', type=int, default=None, help='最多抓取的列表页数')
+    parser.add_argument('--prefetch', type=int, default=2, help='同时抓取的列表页数')
+    parser.add_argument('--max-concurrency', type=int, default=8, help='每个主机的最大并发请求数')
+    parser.add_argument('--min-interval', type=float, default=0.0, help='同一主机相邻请求的最小间隔（秒）')
+    parser.add_argument('--cache-dir', default=PAGE_CACHE_DIR, help=f'页面缓存目录（默认 {PAGE_CACHE_DIR}）')
+    parser.add_argument('--no-cache', action='store_true', help='不使用页面缓存，跳过已访问的详情页')
+    parser.add_argument('--offline', action='store_true', help='只从页面缓存重新提取谜语，不访问网络')
+    parser.add_argument('--resume', action='store_true', help='从上次中断时保存的检查点继续')
+    parser.add_argument('--checkpoint-interval', type=float, default=30.0, help='保存检查点的间隔（秒）')
+    parser.add_argument('--sink', choices=['text', 'db', 'both'], default='text',
+                        help='输出：text 追加到 riddle.txt（默认），db 抓取过程中直接写入数据库，both 两者都写')
+    parser.add_argument('--database-uri', default=None, help='--sink db 时写入的数据库，默认与Web应用相同')
+    args = parser.parse_args()
+    if args.offline and args.no_cache:
+        parser.error('--offline 需要页面缓存，不能与 --no-cache 同时使用')
+
+    print("开始爬取儿童谜语数据...")
+
+    state = CrawlStateStore(CRAWL_STATE_FILE)
+    imported = state.import_visited_file(VISITED_URLS_FILE)
+    if imported:
+        print(f"从 {VISITED_URLS_FILE} 导入了 {imported} 个已访问的URL")
+    visited_urls = state.visited
+    print(f"已访问的URL: {len(visited_urls)} 个")
+
+    checkpoint_name = args.base_url.rstrip('/')
+    resume_from = state.load_checkpoint(checkpoint_name)
+    # 不继续时丢弃的检查点中的谜语仍交给输出保存：它们的详情页已标记为已访问，
+    # 不使用页面缓存时本次不会再抓取
+    discarded = []
+    if resume_from is not None and not args.resume:
+        print(f"发现上次中断时保存的检查点（{len(resume_from['riddles'])} 条谜语，"
+              f"{len(resume_from['frontier'])} 个待抓取页面），使用 --resume 继续；本次将重新开始，"
+              f"检查点中的谜语去重后保存")
+        discarded = [riddle for _, _, riddle in resume_from['riddles']]
+        resume_from = None
+    elif resume_from is None and args.resume:
+        print("没有可继续的检查点，重新开始")
+
+    sinks = create_sinks(['text', 'db'] if args.sink == 'both' else [args.sink], args.database_uri)
+
+    def on_riddle(riddle):
+        for sink in sinks:
+            sink.add(riddle)
+
+    for riddle in discarded:
+        on_riddle(riddle)
+
+    cache = None if args.no_cache else PageCache(args.cache_dir)
+    crawler = RiddleCrawler(args.base_url, visited_urls, max_pages=args.max_pages, prefetch=args.prefetch,
+                            revalidate=cache is not None, on_riddle=on_riddle)
+    politeness = Politeness(max_concurrency=args.max_concurrency, min_interval=args.min_interval)
+    completed = False
+    try:
+        source = f"页面缓存 {args.cache_dir}" if args.offline else crawler.etmy_url
+        if resume_from is not None:
+            print(f"从检查点继续：已抓取 {resume_from['pages']} 个列表页、{len(resume_from['riddles'])} 条谜语，"
+                  f"剩余 {len(resume_from['frontier'])} 个待抓取页面")
+        print(f"开始从 {source} 爬取谜语数据")
+        stats = crawler.crawl(workers=args.workers, resume_from=resume_from,
+                              checkpoint=lambda data: state.save_checkpoint(checkpoint_name, data),
+                              checkpoint_interval=args.checkpoint_interval,
+                              politeness=politeness, cache=cache, offline=args.offline)
+        completed = True
+        print(f"抓取 {stats['fetched']} 个页面（未修改 {stats['not_modified']}，失败 {stats['failed']}，"
+              f"重试 {stats['retried']}，缓存未命中 {stats['cache_misses']}），{crawler.pages} 个列表页，"
+              f"耗时 {stats['seconds']:.1f}s，{stats['pages_per_second']:.1f} 页/秒")
+    except KeyboardInterrupt:
+        print("爬取被中断，已保存检查点，可使用 --resume 继续")
+    except Exception as e:
+        print(f"爬取过程中发生错误: {e}")
+        print("请检查网络连接或网站结构是否发生变化，修复后可使用 --resume 继续")
+    finally:
+        if cache is not None:
+            cache.close()
+
+    try:
+        all_riddles = discarded + crawler.riddles
+        if not all_riddles:
+            print("未能爬取到任何谜语数据，请检查网络连接或网站结构是否发生变化")
+        else:
+            print(f"共爬取到 {len(all_riddles)} 条谜语")
+
+        # 移除重复的谜语并保存
+        saved = 0
+        for sink in sinks:
+            saved += sink.finish(all_riddles)
+        if all_riddles:
+            print("儿童谜语数据爬取完成！" if saved else "没有新的谜语数据需要保存")
+        # 谜语已写入，完整结束时检查点不再需要；中断时保留，已保存的谜语在继续时去重
+        if completed:
+            state.clear_checkpoint(checkpoint_name)
+    finally:
+        for sink in sinks:
+            sink.close()
+        state.close()
+
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+爬虫的数据库输出
+
+把抓取到的谜语直接写入 data_entries 表，不必再经 riddle.txt 和 init_db.py 导入：
+- 谜语由后台写入线程按块去重（DataEntry.generate_hash）、executemany 插入并提交，
+  攒满一块或距上次提交超过 flush_interval 秒即提交
+- 与Web应用共用数据库：WAL模式下读不阻塞，写锁被占用时先由 busy_timeout 等待，仍失败则退避重试
+- Web应用的随机采样索引按 id 增量同步其他进程写入的条目，提交后数秒内即可被访问
+"""
+
+import os
+import sys
+import time
+import queue
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app import db, get_database_uri
+from app.models import DataEntry
+from app.services.corpus_loader import CATEGORY_MAPPING, ingest_chunk
+from app.utils.sqlite import configure_sqlite_engine
+
+RIDDLE_CATEGORY = CATEGORY_MAPPING['riddle.txt']
+
+
+def riddle_entry(riddle: Dict[str, str], created_at: datetime) -> Dict[str, Any]:
+    """
+    谜语对应的条目行
+
+    答案与 riddle.txt 导入后的内容一致（注释附在答案后），
+    之后再用 init_db.py --incremental 导入文本文件时，同一谜语会被识别为重复。
+    """
+    answer = riddle['answer']
+    if riddle.get('annotation'):
+        answer += f"\n注释:{riddle['annotation']}"
+    return {
+        'question': riddle['question'],
+        'answer': answer,
+        'category': RIDDLE_CATEGORY,
+        'content_hash': DataEntry.generate_hash(riddle['question'], answer),
+        'created_at': created_at
+    }
+
+
+class DatabaseSink:
+    """在后台线程中把谜语分块写入数据库"""
+
+    def __init__(self, database_uri: Optional[str] = None, chunk_size: int = 200, flush_interval: float = 2.0,
+                 max_retries: int = 5):
+        """
+        Args:
+            database_uri: 数据库URI，默认与Web应用相同
+            chunk_size: 每个事务写入的谜语数
+            flush_interval: 未攒满一块时最长等待多久提交（秒）
+            max_retries: 数据库被锁定时的重试次数
+        """
+        self.database_uri = database_uri or get_database_uri()
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.stats = {'received': 0, 'inserted': 0, 'duplicates': 0, 'commits': 0, 'retries': 0, 'failed': 0}
+
+        if self.database_uri.startswith('sqlite:///'):
+            db_dir = os.path.dirname(self.database_uri.replace('sqlite:///', ''))
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+        self.engine = create_engine(self.database_uri)
+        configure_sqlite_engine(self.engine)
+        # 与 create_app() 一致，数据库为空时创建所有表
+        db.metadata.create_all(self.engine)
+        self._session = Session(self.engine)
+        self._queue: "queue.Queue[Optional[Dict[str, str]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='riddle-db-sink', daemon=True)
+        self._thread.start()
+
+    def add(self, riddle: Dict[str, str]):
+        """提交一条谜语，由后台线程写入"""
+        self._queue.put(riddle)
+
+    def finish(self, riddles=None) -> int:
+        """
+        写入所有已提交的谜语并停止后台线程
+
+        谜语已在抓取过程中逐条提交，riddles 参数只为与文本输出的接口一致。
+
+        Returns:
+            新写入数据库的谜语数
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        print(f"数据库写入 {self.stats['inserted']} 条新谜语（重复 {self.stats['duplicates']}，"
+              f"失败 {self.stats['failed']}，提交 {self.stats['commits']} 次，重试 {self.stats['retries']} 次）")
+        return self.stats['inserted']
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._session.close()
+        self.engine.dispose()
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                riddle = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                riddle = False
+            if riddle is None:
+                self._write(batch)
+                return
+            if riddle:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(riddle)
+            if batch and (len(batch) >= self.chunk_size or time.monotonic() >= deadline):
+                self._write(batch)
+                batch = []
+                deadline = None
+
+    def _write(self, batch):
+        if not batch:
+            return
+        self.stats['received'] += len(batch)
+        rows = [riddle_entry(riddle, datetime.utcnow()) for riddle in batch]
+        for attempt in range(self.max_retries + 1):
+            try:
+                inserted, duplicates = ingest_chunk(self._session, rows)
+                break
+            except OperationalError as e:
+                self._session.rollback()
+                if 'locked' not in str(e) or attempt == self.max_retries:
+                    print(f"写入数据库失败: {e.orig}")
+                    self.stats['failed'] += len(rows)
+                    return
+                self.stats['retries'] += 1
+                time.sleep(0.1 * 2 ** attempt)
+            except Exception as e:
+                self._session.rollback()
+                print(f"写入数据库失败: {e}")
+                self.stats['failed'] += len(rows)
+                return
+        self.stats['inserted'] += inserted
+        self.stats['duplicates'] += duplicates
+        self.stats['commits'] += 1
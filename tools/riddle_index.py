@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+爬虫去重索引
+
+在一个小的SQLite库中保存已写入 riddle.txt 的谜语的 (谜面, 谜底) 哈希：
+- 去重只需按哈希查询，不再每次读取并解析整个 riddle.txt
+- 记录已索引到的文件位置和指纹；文件被其他方式追加时只解析新增部分，被截断或改写时重建索引
+"""
+
+import os
+import sys
+import sqlite3
+from typing import Any, Dict, Iterable, List
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.models import DataEntry
+from app.services.corpus_loader import fingerprint, iter_records
+
+# 每个 IN 查询的参数个数
+LOOKUP_CHUNK_SIZE = 500
+
+
+def riddle_hash(question: str, answer: str) -> str:
+    """谜语的去重哈希，与数据库的 content_hash 算法一致"""
+    return DataEntry.generate_hash(question, answer)
+
+
+class RiddleIndex:
+    """riddle.txt 的持久化哈希索引"""
+
+    def __init__(self, path: str, source_file: str):
+        """
+        Args:
+            path: 索引库路径
+            source_file: 被索引的语料文件
+        """
+        self.path = path
+        self.source_file = source_file
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS hashes (hash TEXT PRIMARY KEY) WITHOUT ROWID')
+        self._db.execute('CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+
+    def _get_state(self) -> Dict[str, str]:
+        return dict(self._db.execute('SELECT key, value FROM state').fetchall())
+
+    def _save_state(self, offset: int):
+        """记录已索引到的文件位置及其指纹"""
+        values = {'offset': str(offset), 'fingerprint': fingerprint(self.source_file, offset)}
+        self._db.executemany('INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)', values.items())
+
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM hashes').fetchone()[0]
+
+    def sync(self) -> Dict[str, Any]:
+        """
+        把语料文件中尚未索引的记录加入索引
+
+        Returns:
+            {'mode': 'unchanged' | 'append' | 'rebuild', 'indexed': 新索引的记录数}
+        """
+        if not os.path.exists(self.source_file):
+            return {'mode': 'unchanged', 'indexed': 0}
+        size = os.path.getsize(self.source_file)
+        state = self._get_state()
+        offset = int(state.get('offset', 0))
+        if state and offset <= size and fingerprint(self.source_file, offset) == state['fingerprint']:
+            if offset == size:
+                return {'mode': 'unchanged', 'indexed': 0}
+            mode = 'append'
+        else:
+            # 首次使用，或文件被截断、改写
+            mode = 'rebuild'
+            offset = 0
+            self._db.execute('DELETE FROM hashes')
+
+        indexed = 0
+        batch = []
+        self._db.execute('BEGIN')
+        try:
+            for parsed, _, record_end in iter_records(self.source_file, offset):
+                if parsed:
+                    question, answer = parsed
+                    # 只取答案的第一行，注释不参与去重
+                    batch.append((riddle_hash(question, answer.split('\n', 1)[0].strip()),))
+                if record_end is not None:
+                    offset = record_end
+                if len(batch) >= LOOKUP_CHUNK_SIZE:
+                    indexed += self._insert(batch)
+                    batch = []
+            indexed += self._insert(batch)
+            # 末尾没有分隔行的记录下次同步时重新解析，重复的哈希会被忽略
+            self._save_state(offset)
+            self._db.execute('COMMIT')
+        except BaseException:
+            self._db.execute('ROLLBACK')
+            raise
+        return {'mode': mode, 'indexed': indexed}
+
+    def _insert(self, rows) -> int:
+        if not rows:
+            return 0
+        before = self._db.total_changes
+        self._db.executemany('INSERT OR IGNORE INTO hashes (hash) VALUES (?)', rows)
+        return self._db.total_changes - before
+
+    def contains(self, hashes: Iterable[str]) -> set:
+        """返回其中已在索引中的哈希"""
+        hashes = list(hashes)
+        found = set()
+        for start in range(0, len(hashes), LOOKUP_CHUNK_SIZE):
+            chunk = hashes[start:start + LOOKUP_CHUNK_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self._db.execute(f'SELECT hash FROM hashes WHERE hash IN ({placeholders})', chunk).fetchall()
+            found.update(row[0] for row in rows)
+        return found
+
+    def filter_new(self, riddles: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """去掉索引中已有的谜语和批内重复的谜语，保持原顺序"""
+        hashed = [(riddle, riddle_hash(riddle['question'], riddle['answer'])) for riddle in riddles]
+        existing = self.contains(content_hash for _, content_hash in hashed)
+        unique = []
+        for riddle, content_hash in hashed:
+            if content_hash not in existing:
+                existing.add(content_hash)
+                unique.append(riddle)
+        return unique
+
+    def add(self, riddles: List[Dict[str, str]]):
+        """
+        记录刚追加到语料文件末尾的谜语
+
+        调用前索引需与文件同步（sync），之后文件末尾即为新的已索引位置。
+        """
+        self._db.execute('BEGIN')
+        try:
+            self._insert([(riddle_hash(riddle['question'], riddle['answer']),) for riddle in riddles])
+            self._save_state(os.path.getsize(self.source_file))
+            self._db.execute('COMMIT')
+        except BaseException:
+            self._db.execute('ROLLBACK')
+            raise
+
+    def close(self):
+        self._db.close()